@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+IndexTTS Enhanced HTTP API 压测工具
+
+按配置的并发数或到达率，从语料文件按文本长度配比抽取文本，压测 /api/tts、/api/tts/file 和 /api/voices，
+统计吞吐、延迟 p50/p95/p99、首字节时间、错误率和实时率（RTF），输出表格和JSON。
+固定 --seed 时请求序列可复现，JSON中记录git提交，可用 --compare 与之前的结果对比。
+
+依赖: pip install httpx
+
+示例:
+    # 8并发闭环压测200个请求
+    python benchmarks/load_test.py --base_url http://localhost:8000 --concurrency 8 --requests 200
+
+    # 每秒2个请求的开环压测（泊松到达），混合接口，保存结果并与基线对比
+    python benchmarks/load_test.py --rate 2 --mix tts:0.6,tts_file:0.3,voices:0.1 \\
+        --output results/new.json --compare results/baseline.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import wave
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:
+    print("❌ 需要安装httpx: pip install httpx")
+    sys.exit(1)
+
+ENDPOINTS = ("tts", "tts_file", "voices")
+
+# 按字数划分的文本长度档位（闭区间，None表示不设上限）
+LENGTH_BUCKETS = {
+    "short": (0, 30),
+    "medium": (31, 120),
+    "long": (121, None),
+}
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.txt")
+
+
+def parse_weights(spec: str, choices) -> Dict[str, float]:
+    """解析 "a:0.7,b:0.3" 形式的权重"""
+    weights = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition(":")
+        name = name.strip()
+        if name not in choices:
+            raise ValueError(f"未知的名称: {name}，可选: {', '.join(choices)}")
+        weights[name] = float(weight) if weight else 1.0
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError(f"权重无效: {spec}")
+    return weights
+
+
+def load_corpus(path: str) -> Dict[str, List[str]]:
+    """读取语料并按长度档位分组"""
+    corpus = {name: [] for name in LENGTH_BUCKETS}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            for name, (low, high) in LENGTH_BUCKETS.items():
+                if len(text) >= low and (high is None or len(text) <= high):
+                    corpus[name].append(text)
+                    break
+    if not any(corpus.values()):
+        raise ValueError(f"语料为空: {path}")
+    return corpus
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """线性插值百分位数"""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def distribution(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "mean": round(sum(values) / len(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def wav_duration(content: bytes) -> Optional[float]:
+    try:
+        with wave.open(io.BytesIO(content)) as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """解析 Server-Timing 响应头，返回各阶段耗时（秒）"""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                try:
+                    stages[name] = float(param[4:]) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class LoadTest:
+    def __init__(self, args, corpus: Dict[str, List[str]], voice_name: str):
+        self.args = args
+        self.corpus = corpus
+        self.voice_name = voice_name
+        self.rng = random.Random(args.seed)
+        self.endpoint_weights = parse_weights(args.mix, ENDPOINTS)
+        self.length_weights = {name: weight for name, weight in parse_weights(args.length_mix, LENGTH_BUCKETS).items()
+                               if corpus[name]}
+        self.tts_params = json.loads(args.tts_params) if args.tts_params else {}
+        self.samples: List[Dict] = []
+
+    def _choose(self, weights: Dict[str, float]) -> str:
+        names = list(weights)
+        return self.rng.choices(names, weights=[weights[name] for name in names])[0]
+
+    def next_request(self) -> tuple:
+        """按配比抽取 (接口, 文本)"""
+        endpoint = self._choose(self.endpoint_weights)
+        if endpoint == "voices":
+            return endpoint, None
+        return endpoint, self.rng.choice(self.corpus[self._choose(self.length_weights)])
+
+    async def _send(self, client: httpx.AsyncClient, endpoint: str, text: Optional[str]) -> Dict:
+        sample = {"endpoint": endpoint, "chars": len(text) if text else 0, "ok": False}
+        if endpoint == "voices":
+            method, path, payload = "GET", "/api/voices", None
+        else:
+            method, path = "POST", "/api/tts/file" if endpoint == "tts_file" else "/api/tts"
+            payload = {"text": text, "voice_name": self.voice_name}
+            payload.update(self.tts_params)
+
+        start_time = time.perf_counter()
+        ttfb = None
+        try:
+            async with client.stream(method, path, json=payload) as response:
+                chunks = []
+                async for chunk in response.aiter_bytes():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start_time
+                    chunks.append(chunk)
+            latency = time.perf_counter() - start_time
+        except httpx.HTTPError as e:
+            sample.update(latency=time.perf_counter() - start_time, error=type(e).__name__)
+            return sample
+
+        body = b"".join(chunks)
+        sample.update(status=response.status_code, latency=latency, ttfb=ttfb if ttfb is not None else latency,
+                      stages=parse_server_timing(response.headers.get("server-timing")))
+        if response.status_code != 200:
+            sample["error"] = f"HTTP {response.status_code}"
+            return sample
+
+        if endpoint == "voices":
+            sample["ok"] = True
+        elif endpoint == "tts_file":
+            sample["ok"] = True
+            sample["audio_seconds"] = wav_duration(body)
+        else:
+            data = json.loads(body)
+            sample["ok"] = bool(data.get("success"))
+            if not sample["ok"]:
+                sample["error"] = "success=false"
+            elif not self.args.no_download and data.get("audio_url"):
+                # 下载音频计算时长（不计入延迟）
+                try:
+                    audio = await client.get(data["audio_url"])
+                    sample["audio_seconds"] = wav_duration(audio.content)
+                except httpx.HTTPError:
+                    pass
+        return sample
+
+    async def _issue(self, client, semaphore, endpoint, text):
+        async with semaphore:
+            self.samples.append(await self._send(client, endpoint, text))
+
+    async def run(self) -> float:
+        """执行压测，返回压测时长（秒）"""
+        args = self.args
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+            for _ in range(args.warmup):
+                await self._send(client, *self.next_request())
+
+            plan = [self.next_request() for _ in range(args.requests)]
+            semaphore = asyncio.Semaphore(args.concurrency)
+            deadline = time.perf_counter() + args.duration if args.duration else None
+            start_time = time.perf_counter()
+
+            if args.rate:
+                # 开环：泊松到达，并发数达到上限时新请求排队等待
+                tasks = []
+                for endpoint, text in plan:
+                    if deadline and time.perf_counter() >= deadline:
+                        break
+                    tasks.append(asyncio.create_task(self._issue(client, semaphore, endpoint, text)))
+                    await asyncio.sleep(self.rng.expovariate(args.rate))
+                await asyncio.gather(*tasks)
+            else:
+                # 闭环：concurrency个客户端各自串行发送
+                queue = iter(plan)
+
+                async def worker():
+                    for endpoint, text in queue:
+                        if deadline and time.perf_counter() >= deadline:
+                            return
+                        self.samples.append(await self._send(client, endpoint, text))
+
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+            return time.perf_counter() - start_time
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    """统计单个接口（或全部）的结果"""
+    ok = [s for s in samples if s["ok"]]
+    rtf = [s["latency"] / s["audio_seconds"] for s in ok if s.get("audio_seconds")]
+    stage_values: Dict[str, List[float]] = {}
+    for s in ok:
+        for name, seconds in s.get("stages", {}).items():
+            stage_values.setdefault(name, []).append(seconds)
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if not s["ok"]:
+            errors[s.get("error", "unknown")] = errors.get(s.get("error", "unknown"), 0) + 1
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0,
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed > 0 else 0,
+        "latency": distribution([s["latency"] for s in ok]),
+        "ttfb": distribution([s["ttfb"] for s in ok]),
+        "rtf": distribution(rtf),
+        "audio_seconds": round(sum(s.get("audio_seconds") or 0 for s in ok), 3),
+        "stages_mean": {name: round(sum(v) / len(v), 4) for name, v in stage_values.items()},
+    }
+
+
+def build_report(args, test: LoadTest, elapsed: float) -> Dict:
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        samples = [s for s in test.samples if s["endpoint"] == endpoint]
+        if samples:
+            endpoints[endpoint] = summarize(samples, elapsed)
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "requests": args.requests,
+            "duration": args.duration,
+            "mix": args.mix,
+            "length_mix": args.length_mix,
+            "corpus": os.path.basename(args.corpus),
+            "tts_params": test.tts_params,
+            "voice_name": test.voice_name,
+            "seed": args.seed,
+        },
+        "elapsed": round(elapsed, 3),
+        "overall": summarize(test.samples, elapsed),
+        "endpoints": endpoints,
+    }
+
+
+def _ms(dist: Optional[Dict], key: str) -> str:
+    return f"{dist[key] * 1000:.0f}" if dist else "-"
+
+
+def format_table(report: Dict) -> str:
+    header = (f"{'endpoint':<10} {'req':>5} {'err%':>6} {'rps':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} "
+              f"{'ttfb50':>7} {'ttfb95':>7} {'rtf50':>6}")
+    lines = [header, "-" * len(header)]
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for name, r in rows:
+        rtf = f"{r['rtf']['p50']:.3f}" if r["rtf"] else "-"
+        lines.append(f"{name:<10} {r['requests']:>5} {r['error_rate'] * 100:>6.1f} {r['throughput_rps']:>7.2f} "
+                     f"{_ms(r['latency'], 'p50'):>7} {_ms(r['latency'], 'p95'):>7} {_ms(r['latency'], 'p99'):>7} "
+                     f"{_ms(r['ttfb'], 'p50'):>7} {_ms(r['ttfb'], 'p95'):>7} {rtf:>6}")
+    if report["overall"]["stages_mean"]:
+        stages = ", ".join(f"{name}={seconds * 1000:.0f}ms"
+                           for name, seconds in report["overall"]["stages_mean"].items())
+        lines.append(f"阶段平均耗时: {stages}")
+    if report["overall"]["errors"]:
+        lines.append(f"错误: {report['overall']['errors']}")
+    return "\n".join(lines)
+
+
+def format_comparison(baseline: Dict, report: Dict) -> str:
+    """与基线结果对比关键指标（变化百分比）"""
+    def delta(old, new):
+        if old in (None, 0) or new is None:
+            return "-"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = [f"对比基线 {baseline.get('label') or ''}@{baseline.get('commit')} -> "
+             f"{report.get('label') or ''}@{report.get('commit')}"]
+    for name in list(report["endpoints"]) + ["overall"]:
+        new = report["overall"] if name == "overall" else report["endpoints"][name]
+        old = baseline["overall"] if name == "overall" else baseline.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        parts = [f"rps {delta(old['throughput_rps'], new['throughput_rps'])}"]
+        for key in ("latency", "ttfb", "rtf"):
+            if old.get(key) and new.get(key):
+                parts.append(f"{key} p50 {delta(old[key]['p50'], new[key]['p50'])} "
+                             f"p95 {delta(old[key]['p95'], new[key]['p95'])}")
+        parts.append(f"err {old['error_rate'] * 100:.1f}% -> {new['error_rate'] * 100:.1f}%")
+        lines.append(f"  {name:<10} " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+async def resolve_voice(args) -> str:
+    if args.voice_name:
+        return args.voice_name
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        response = await client.get("/api/voices")
+        response.raise_for_status()
+        voices = response.json().get("voices", [])
+    if not voices:
+        raise RuntimeError("服务端没有可用音色，请先上传音色或指定 --voice_name")
+    return voices[0]["name"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IndexTTS Enhanced HTTP API 压测")
+    parser.add_argument("--base_url", type=str, default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发数（开环模式下为最大并发）")
+    parser.add_argument("--rate", type=float, default=None, help="到达率（请求/秒），指定后为开环泊松到达")
+    parser.add_argument("--requests", type=int, default=100, help="请求总数")
+    parser.add_argument("--duration", type=float, default=None, help="最长压测秒数，到时不再发出新请求")
+    parser.add_argument("--warmup", type=int, default=2, help="正式压测前的预热请求数（不计入结果）")
+    parser.add_argument("--mix", type=str, default="tts:1", help="接口配比，如 tts:0.6,tts_file:0.3,voices:0.1")
+    parser.add_argument("--length_mix", type=str, default="short:0.5,medium:0.3,long:0.2", help="文本长度配比")
+    parser.add_argument("--corpus", type=str, default=DEFAULT_CORPUS, help="语料文件，每行一段文本")
+    parser.add_argument("--voice_name", type=str, default=None, help="音色名称，默认使用音色列表中的第一个")
+    parser.add_argument("--tts_params", type=str, default='{"cache": false}',
+                        help="附加到TTS请求的JSON参数，默认关闭结果缓存以测量真实合成")
+    parser.add_argument("--no_download", action="store_true", default=False,
+                        help="/api/tts 不下载音频（不计算RTF）")
+    parser.add_argument("--timeout", type=float, default=300, help="单个请求超时秒数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子的请求序列相同")
+    parser.add_argument("--label", type=str, default=None, help="结果标签，如分支名")
+    parser.add_argument("--output", type=str, default=None, help="保存JSON结果的路径")
+    parser.add_argument("--compare", type=str, default=None, help="与之前保存的JSON结果对比")
+    parser.add_argument("--json", action="store_true", default=False, help="只输出JSON")
+    args = parser.parse_args()
+
+    try:
+        corpus = load_corpus(args.corpus)
+        needs_voice = any(endpoint != "voices" for endpoint in parse_weights(args.mix, ENDPOINTS))
+        voice_name = asyncio.run(resolve_voice(args)) if needs_voice else ""
+        test = LoadTest(args, corpus, voice_name)
+    except (ValueError, RuntimeError, OSError, httpx.HTTPError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not args.json:
+        mode = f"开环 {args.rate} req/s" if args.rate else "闭环"
+        print(f"🚀 压测 {args.base_url}: {mode}, 并发 {args.concurrency}, {args.requests} 个请求, 音色 {voice_name}")
+
+    elapsed = asyncio.run(test.run())
+    report = build_report(args, test, elapsed)
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(report))
+        if args.output:
+            print(f"💾 结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(format_comparison(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
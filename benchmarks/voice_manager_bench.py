@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+VoiceManager 规模压测
+
+生成 1k / 10k / 100k 个音色的合成音色库，分别测量 save / delete / list / search /
+get_voice_audio_path / 冷加载 的吞吐（ops/sec）和单次耗时，以及音色库的内存和磁盘占用。
+音色库重构前后各跑一次，用 --compare 对比。
+
+音频文件用硬链接指向同一个很短的wav，只测音色库本身的开销；
+条件mel预计算与音色库规模无关，默认跳过（--with_cond_mel 开启）。
+
+示例:
+    python benchmarks/voice_manager_bench.py --sizes 1000,10000,100000 --output results/voices.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "enhanced"))
+
+from indextts.voice_manager import VoiceManager
+
+ADJECTIVES = ["温柔", "沉稳", "活泼", "清亮", "磁性", "甜美", "低沉", "知性", "阳光", "沙哑"]
+NOUNS = ["女声", "男声", "童声", "主播", "客服", "旁白", "老师", "播音", "解说", "助手"]
+
+
+def silent_wav(seconds: float = 0.05, sample_rate: int = 24000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\0\0" * int(sample_rate * seconds))
+    return buffer.getvalue()
+
+
+def build_registry(voices_dir: str, size: int, source_wav: str, rng: random.Random) -> List[str]:
+    """生成合成音色库（与 save_voice 写入的字段一致），返回音色名称列表"""
+    os.makedirs(voices_dir, exist_ok=True)
+    with open(source_wav, "rb") as f:
+        content = f.read()
+    audio_hash = hashlib.sha256(content).hexdigest()
+    now = time.time()
+
+    voices_db = {}
+    for i in range(size):
+        voice_id = f"voice_{int(now)}_{i}"
+        audio_path = os.path.join(voices_dir, f"{voice_id}.wav")
+        try:
+            os.link(source_wav, audio_path)
+        except OSError:
+            shutil.copyfile(source_wav, audio_path)
+        name = f"{rng.choice(ADJECTIVES)}{rng.choice(NOUNS)}_{i}"
+        voices_db[name] = {
+            "id": voice_id,
+            "name": name,
+            "description": f"{rng.choice(ADJECTIVES)}的{rng.choice(NOUNS)}，编号{i}",
+            "audio_path": audio_path,
+            "created_time": now - i,
+            "duration": 0.05,
+            "sample_rate": 24000,
+            "file_size": len(content),
+            "audio_hash": audio_hash,
+            "cond_mel_path": None,
+        }
+
+    with open(os.path.join(voices_dir, "voices.json"), "w", encoding="utf-8") as f:
+        json.dump(voices_db, f, ensure_ascii=False, indent=2)
+    return list(voices_db)
+
+
+def time_op(func: Callable[[int], object], max_iterations: int, max_seconds: float,
+            succeeded: Optional[Callable[[object], bool]] = None) -> Dict:
+    """重复执行操作直到达到次数或时间上限（至少一次）
+
+    Args:
+        succeeded: 可选，按返回值判断操作是否成功；失败的操作单独计数，不计入耗时统计
+    """
+    durations = []
+    failed = 0
+    first_error = None
+    start_time = time.perf_counter()
+    for i in range(max_iterations):
+        op_start = time.perf_counter()
+        result = func(i)
+        elapsed = time.perf_counter() - op_start
+        if succeeded is None or succeeded(result):
+            durations.append(elapsed)
+        else:
+            failed += 1
+            if first_error is None:
+                first_error = result.get("message") if isinstance(result, dict) else repr(result)
+        if time.perf_counter() - start_time >= max_seconds:
+            break
+    durations.sort()
+    total = sum(durations)
+    stats = {
+        "ops": len(durations),
+        "failed": failed,
+        "ops_per_sec": round(len(durations) / total, 2) if total > 0 else None,
+        "mean_ms": round(total / len(durations) * 1000, 4) if durations else None,
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 4) if durations else None,
+    }
+    if first_error is not None:
+        stats["first_error"] = first_error
+    return stats
+
+
+def _succeeded(result: Dict) -> bool:
+    return bool(result.get("success"))
+
+
+def rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def bench_size(size: int, work_dir: str, source_wav: str, args) -> Dict:
+    rng = random.Random(args.seed)
+    voices_dir = os.path.join(work_dir, f"voices_{size}")
+    build_start = time.perf_counter()
+    names = build_registry(voices_dir, size, source_wav, rng)
+    build_seconds = time.perf_counter() - build_start
+
+    result = {
+        "size": size,
+        "build_seconds": round(build_seconds, 2),
+        "db_file_mb": round(os.path.getsize(os.path.join(voices_dir, "voices.json")) / 1024 / 1024, 2),
+        "ops": {},
+    }
+
+    # 冷加载：每次新建VoiceManager，重新读取voices.json
+    result["ops"]["cold_load"] = time_op(lambda i: VoiceManager(voices_dir), args.max_iterations, args.max_seconds)
+
+    # 内存：加载过程的峰值和加载后音色库常驻的分配量
+    tracemalloc.start()
+    manager = VoiceManager(voices_dir)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["memory"] = {
+        "db_mb": round(current / 1024 / 1024, 2),
+        "load_peak_mb": round(peak / 1024 / 1024, 2),
+        "rss_mb": rss_mb(),
+    }
+    if not args.with_cond_mel:
+        manager._save_cond_mel = lambda audio_path: None
+
+    lookups = [rng.choice(names) for _ in range(1000)]
+    keywords = [rng.choice(ADJECTIVES + NOUNS) for _ in range(100)] + [f"_{rng.randrange(size)}" for _ in range(100)]
+    ops = result["ops"]
+    ops["get_voice_audio_path"] = time_op(
+        lambda i: manager.get_voice_audio_path(lookups[i % len(lookups)]), args.max_iterations * 100, args.max_seconds)
+    ops["list"] = time_op(lambda i: manager.list_voices(), args.max_iterations, args.max_seconds)
+    ops["search"] = time_op(lambda i: manager.search_voices(keywords[i % len(keywords)]),
+                            args.max_iterations, args.max_seconds)
+
+    saved = []
+
+    def save(i):
+        name = f"bench_new_{i}"
+        result = manager.save_voice(source_wav, name, "压测新增音色")
+        if result["success"]:
+            saved.append(name)
+        return result
+
+    ops["save"] = time_op(save, args.max_iterations, args.max_seconds, succeeded=_succeeded)
+
+    # 先删除压测新增的音色，不够时删除原有音色
+    saved_names = set(saved)
+    to_delete = saved + [name for name in names if name not in saved_names]
+    ops["delete"] = time_op(lambda i: manager.delete_voice(to_delete[i]), min(args.max_iterations, len(to_delete)),
+                            args.max_seconds, succeeded=_succeeded)
+
+    if not args.keep:
+        shutil.rmtree(voices_dir, ignore_errors=True)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=current_dir, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+OP_ORDER = ("cold_load", "get_voice_audio_path", "list", "search", "save", "delete")
+
+
+def format_table(report: Dict) -> str:
+    header = f"{'size':>7} {'operation':<22} {'ops':>7} {'failed':>7} {'ops/sec':>12} {'mean_ms':>10} {'p95_ms':>10}"
+    lines = [header, "-" * len(header)]
+    for r in report["results"]:
+        for op in OP_ORDER:
+            stats = r["ops"][op]
+            ops_per_sec = f"{stats['ops_per_sec']:.1f}" if stats["ops_per_sec"] else "-"
+            mean_ms = f"{stats['mean_ms']:.3f}" if stats["mean_ms"] is not None else "-"
+            p95_ms = f"{stats['p95_ms']:.3f}" if stats["p95_ms"] is not None else "-"
+            lines.append(f"{r['size']:>7} {op:<22} {stats['ops']:>7} {stats.get('failed', 0):>7} {ops_per_sec:>12} "
+                         f"{mean_ms:>10} {p95_ms:>10}")
+            if stats.get("first_error"):
+                lines.append(f"{r['size']:>7} ⚠️ {op} 失败 {stats['failed']} 次: {stats['first_error']}")
+        memory = r["memory"]
+        lines.append(f"{r['size']:>7} 内存: 音色库 {memory['db_mb']}MB, 加载峰值 {memory['load_peak_mb']}MB, "
+                     f"RSS {memory['rss_mb']}MB, voices.json {r['db_file_mb']}MB")
+    return "\n".join(lines)
+
+
+def format_comparison(baseline: Dict, report: Dict) -> str:
+    """按规模和操作对比 ops/sec（变化百分比）"""
+    old_results = {r["size"]: r for r in baseline.get("results", [])}
+    lines = [f"对比基线 {baseline.get('commit')} -> {report.get('commit')}（ops/sec 变化）"]
+    for r in report["results"]:
+        old = old_results.get(r["size"])
+        if not old:
+            continue
+        parts = []
+        for op in OP_ORDER:
+            old_value = old["ops"].get(op, {}).get("ops_per_sec")
+            new_value = r["ops"][op]["ops_per_sec"]
+            if old_value and new_value:
+                parts.append(f"{op} {(new_value - old_value) / old_value * 100:+.1f}%")
+        parts.append(f"db {old['memory']['db_mb']}MB -> {r['memory']['db_mb']}MB")
+        lines.append(f"  {r['size']:>7}: " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VoiceManager 规模压测")
+    parser.add_argument("--sizes", type=str, default="1000,10000,100000", help="音色库规模，逗号分隔")
+    parser.add_argument("--max_iterations", type=int, default=200, help="每个操作的最大执行次数")
+    parser.add_argument("--max_seconds", type=float, default=5.0, help="每个操作的最长计时秒数")
+    parser.add_argument("--work_dir", type=str, default=None, help="生成音色库的目录，默认使用临时目录")
+    parser.add_argument("--with_cond_mel", action="store_true", default=False, help="save时预计算条件mel（需要模型依赖）")
+    parser.add_argument("--keep", action="store_true", default=False, help="保留生成的音色库")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", type=str, default=None, help="保存JSON结果的路径")
+    parser.add_argument("--compare", type=str, default=None, help="与之前保存的JSON结果对比")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="voice_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    source_wav = os.path.join(work_dir, "source.wav")
+    with open(source_wav, "wb") as f:
+        f.write(silent_wav())
+
+    results = []
+    try:
+        for size in sizes:
+            print(f"⏱️ 音色库规模 {size} ...")
+            results.append(bench_size(size, work_dir, source_wav, args))
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {"sizes": sizes, "max_iterations": args.max_iterations, "max_seconds": args.max_seconds,
+                   "with_cond_mel": args.with_cond_mel, "seed": args.seed},
+        "results": results,
+    }
+    print(format_table(report))
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(format_comparison(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
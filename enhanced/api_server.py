@@ -1,8 +1,16 @@
+import time
+PROCESS_START_TIME = time.time()
+
+import asyncio
+import functools
 import json
 import os
+import shutil
 import sys
+import tempfile
+import threading
 import uuid
-import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
 import warnings
@@ -14,14 +22,26 @@ sys.path.append(current_dir)
 sys.path.append(os.path.join(current_dir, "indextts"))
 
 import argparse
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import uvicorn
 
-from indextts.infer import IndexTTS
+# 这里只导入轻量模块；torch/transformers等重量级依赖在加载模型时才导入
 from indextts.voice_manager import VoiceManager
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import PRIORITY_CLASSES, SCHEDULE_POLICIES, InferenceJob, estimate_cost
+from indextts.engine_pool import EnginePool, create_engines, resolve_devices
+from indextts.prefork import serve_prefork
+from indextts.result_cache import REF_SUFFIX, ResultCache
+from indextts.import_profile import ImportProfiler
+from indextts.checkpoint_loader import has_checkpoint
+from indextts.static_audio import audio_file_response, content_disposition
+from indextts import metrics
+from indextts.timings import StageTimings, log_timings
+from indextts.audio_encoding import (AUDIO_FORMATS, encode_file, encode_wavs, media_type_for, media_type_for_filename,
+                                     validate_output_format, variant_filename)
 
 # API请求模型
 class TTSRequest(BaseModel):
@@ -38,6 +58,13 @@ class TTSRequest(BaseModel):
     num_beams: int = 3
     repetition_penalty: float = 10.0
     max_mel_tokens: int = 600
+    priority: str = "normal"  # 优先级类别: interactive / normal / batch（priority调度策略下生效）
+    format: str = "wav"  # 输出格式: wav / flac / ogg-opus / mp3 / pcm16
+    sample_rate: Optional[int] = None  # 输出采样率，如 8000 / 16000 / 24000，默认24000
+    cache: bool = True  # 是否使用结果缓存；关闭时 /api/tts/file 在内存中编码返回，不写磁盘
+
+class TTSStreamRequest(TTSRequest):
+    stream_format: str = "wav"  # wav: 流式wav头+PCM, pcm: 裸PCM16, sse: base64分块事件
 
 class TTSResponse(BaseModel):
     success: bool
@@ -45,63 +72,276 @@ class TTSResponse(BaseModel):
     audio_url: Optional[str] = None
     task_id: Optional[str] = None
     duration: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None  # 各阶段耗时（秒）：queue/cache/tokenize/cond/infer/gpt/vocoder/encode/write/total
+
+class JobResponse(BaseModel):
+    success: bool
+    job_id: str
+    state: str
+    progress: int = 0
+    total: int = 0
+    audio_url: Optional[str] = None
+    message: Optional[str] = None
+    created_time: Optional[float] = None
+    started_time: Optional[float] = None
+    finished_time: Optional[float] = None
 
 class VoiceListResponse(BaseModel):
     success: bool
     voices: List[Dict]
 
 # 解析命令行参数
-parser = argparse.ArgumentParser(description="IndexTTS API Server")
-parser.add_argument("--verbose", action="store_true", default=False, help="Enable verbose mode")
-parser.add_argument("--port", type=int, default=8000, help="Port to run the API server on")
-parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to run the API server on")
-parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
-cmd_args = parser.parse_args()
-
-# 检查模型文件
-if not os.path.exists(cmd_args.model_dir):
-    print(f"Model directory {cmd_args.model_dir} does not exist. Please download the model first.")
-    sys.exit(1)
-
-for file in [
-    "bigvgan_generator.pth",
-    "bpe.model", 
-    "gpt.pth",
-    "config.yaml",
-]:
-    file_path = os.path.join(cmd_args.model_dir, file)
-    if not os.path.exists(file_path):
-        print(f"Required file {file_path} does not exist. Please download it.")
-        sys.exit(1)
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="IndexTTS API Server")
+    parser.add_argument("--verbose", action="store_true", default=False, help="Enable verbose mode")
+    parser.add_argument("--port", type=int, default=8000, help="Port to run the API server on")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to run the API server on")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--workers", type=int, default=1, help="Number of pre-forked worker processes sharing the loaded model (CPU only)")
+    parser.add_argument("--threads_per_worker", type=int, default=None, help="Torch threads per worker process (default: cores / workers)")
+    parser.add_argument("--queue_size", type=int, default=8, help="Max number of pending inference jobs per replica before rejecting with 503")
+    parser.add_argument("--pool_size", type=int, default=1, help="Number of IndexTTS replicas in the engine pool")
+    parser.add_argument("--devices", type=str, default=None, help="Comma separated devices for the replicas, e.g. cuda:0,cuda:1 or cpu (default: auto)")
+    parser.add_argument("--threads_per_replica", type=int, default=None, help="Torch threads per CPU replica (default: cores / CPU replicas)")
+    parser.add_argument("--batch_window_ms", type=float, default=0, help="Collect concurrent requests for this many ms and synthesize them as one batch (0 disables)")
+    parser.add_argument("--schedule_policy", type=str, default="fifo", choices=SCHEDULE_POLICIES, help="Request scheduling policy: fifo, sjf (shortest job first with aging) or priority")
+    parser.add_argument("--sjf_aging", type=float, default=20.0, help="Tokens credited per second of waiting under the sjf policy")
+    parser.add_argument("--jobs_db", type=str, default=os.path.join("outputs", "jobs", "jobs.db"), help="SQLite database for asynchronous jobs")
+    parser.add_argument("--batch_max_size", type=int, default=8, help="Max number of sentences in one cross-request batch")
+    parser.add_argument("--sentence_cache_mb", type=int, default=0, help="Memory budget in MB for the per-sentence waveform cache shared across requests (0 disables; when enabled, synthesis runs sentence by sentence instead of through tts.infer)")
+    parser.add_argument("--text_cache_mb", type=int, default=32, help="Memory budget in MB for cached text normalization and tokenization results (0 disables)")
+    parser.add_argument("--cond_cache_size", type=int, default=64, help="Number of speaker conditioning tensors kept in host memory (device tier keeps up to 16)")
+    parser.add_argument("--no_warmup", action="store_true", default=False, help="Skip the startup warm-up (/api/ready reports ready immediately)")
+    parser.add_argument("--warmup_voices", type=int, default=3, help="Preload conditioning of the N most used voices during warm-up")
+    parser.add_argument("--warmup_lengths", type=str, default="16,64", help="Comma separated sentence lengths (tokens) synthesized during warm-up")
+    parser.add_argument("--warmup_buckets", type=str, default="1,4", help="Comma separated batch sizes synthesized during warm-up")
+    parser.add_argument("--no_timing_log", action="store_true", default=False, help="Do not print the per-request stage timing log line")
+    parser.add_argument("--no_result_cache", action="store_true", default=False, help="Disable the whole-request result cache (/api/tts/file then returns audio from memory without touching disk)")
+    parser.add_argument("--cache_max_mb", type=int, default=2048, help="Disk quota in MB for generated audio under outputs/api, evicted least-recently-used first")
+    parser.add_argument("--encode_threads", type=int, default=2, help="Threads used to encode audio into compressed formats")
+    parser.add_argument("--import_profile", action="store_true", default=False, help="Print an import-time breakdown of the heavy modules loaded with the model")
+    return parser.parse_args(argv)
+
+def check_model_files(model_dir: str) -> Optional[str]:
+    """检查模型文件，缺失时返回错误信息"""
+    if not os.path.exists(model_dir):
+        return f"Model directory {model_dir} does not exist. Please download the model first."
+    for file in [
+        "bigvgan_generator.pth",
+        "bpe.model", 
+        "gpt.pth",
+        "config.yaml",
+    ]:
+        file_path = os.path.join(model_dir, file)
+        if not has_checkpoint(model_dir, file):
+            return f"Required file {file_path} does not exist. Please download it."
+    return None
+
+cmd_args = None
+voice_manager = None
+
+# 模型（在后台线程或预派生前加载，加载完成前除存活检查外的接口返回503）
+engines = None
+tts = None
+cond_mel_cache = None
+text_cache = None
+model_loaded = False
+model_error = None
+startup_timings = {}
+import_report = None
+
+# 运行时组件（线程不能跨fork，多进程模式下由每个子进程各自创建）
+engine_pool = None
+batch_scheduler = None
+job_store = None
+job_runner = None
+result_cache = None
+sentence_cache = None
+encode_executor = None
+warmup_report = None
+
+def load_models():
+    """导入推理依赖并加载模型副本"""
+    global engines, tts, cond_mel_cache, text_cache, import_report
+    error = check_model_files(cmd_args.model_dir)
+    if error:
+        raise RuntimeError(error)
+    
+    start_time = time.time()
+    with ImportProfiler(enabled=cmd_args.import_profile) as profiler:
+        import indextts.infer  # noqa: F401  torch/transformers等重量级依赖
+        from indextts.synthesis import set_cond_mel_cache, set_text_cache
+        from indextts.cond_cache import CondMelCache
+        from indextts.text_cache import TextFrontendCache
+    startup_timings["imports"] = round(time.time() - start_time, 3)
+    if cmd_args.import_profile:
+        import_report = profiler.top(30)
+        print(profiler.format_report(30))
+    
+    print("正在加载模型...")
+    start_time = time.time()
+    engines = create_engines(cmd_args.model_dir, resolve_devices(cmd_args.pool_size, cmd_args.devices))
+    tts = engines[0]
+    cond_mel_cache = CondMelCache(max_device_items=min(16, cmd_args.cond_cache_size), max_host_items=cmd_args.cond_cache_size)
+    set_cond_mel_cache(cond_mel_cache)
+    if voice_manager is not None:
+        voice_manager.cond_mel_cache = cond_mel_cache
+    if cmd_args.text_cache_mb > 0:
+        text_cache = TextFrontendCache(max_bytes=cmd_args.text_cache_mb * 1024 * 1024)
+        set_text_cache(text_cache)
+    startup_timings["model_load"] = round(time.time() - start_time, 3)
+    print(f"模型加载完成! 耗时 {startup_timings['model_load']:.2f}s")
+
+def start_warmup():
+    """在后台线程中预热各推理副本，完成前 /api/ready 返回503"""
+    global warmup_report
+    if cmd_args.no_warmup:
+        warmup_report = {"skipped": True}
+        return
+    
+    def run():
+        global warmup_report
+        from indextts.warmup import run_warmup
+        print("🔥 正在预热模型...")
+        report = run_warmup(
+            engine_pool, voice_manager,
+            top_voices=cmd_args.warmup_voices,
+            sentence_lengths=[int(n) for n in cmd_args.warmup_lengths.split(",") if n.strip()],
+            bucket_sizes=[int(n) for n in cmd_args.warmup_buckets.split(",") if n.strip()]
+        )
+        for replica in report["replicas"]:
+            if "error" in replica:
+                print(f"⚠️ {replica['name']} 预热失败: {replica['error']}")
+            else:
+                print(f"  {replica['name']}: {replica['timings']}")
+        print(f"✅ 预热完成，耗时 {report['seconds']:.2f}s")
+        warmup_report = report
+    
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+
+def init_runtime(run_jobs: bool = True):
+    """创建推理引擎池、批处理调度器和异步任务执行器
+
+    Args:
+        run_jobs: 是否在当前进程执行异步任务（多进程模式下只由一个子进程执行）
+    """
+    global engine_pool, batch_scheduler, job_store, job_runner, result_cache, sentence_cache, encode_executor
+    global model_loaded
+    from indextts.batch_scheduler import BatchScheduler
+    from indextts.job_store import JobStore, JobRunner
+    from indextts.sentence_cache import SentenceCache
+    
+    start_time = time.time()
+    if cmd_args.sentence_cache_mb > 0:
+        sentence_cache = SentenceCache(max_bytes=cmd_args.sentence_cache_mb * 1024 * 1024)
+    engine_pool = EnginePool(engines, max_queue_size=cmd_args.queue_size,
+                             cpu_threads=cmd_args.threads_per_replica,
+                             policy=cmd_args.schedule_policy, aging=cmd_args.sjf_aging)
+    if cmd_args.batch_window_ms > 0:
+        batch_scheduler = BatchScheduler(engine_pool, window_ms=cmd_args.batch_window_ms,
+                                         max_batch_size=cmd_args.batch_max_size, sentence_cache=sentence_cache)
+    job_store = JobStore(cmd_args.jobs_db)
+    result_cache = ResultCache(os.path.join("outputs", "api"), max_bytes=cmd_args.cache_max_mb * 1024 * 1024)
+    encode_executor = ThreadPoolExecutor(max_workers=cmd_args.encode_threads, thread_name_prefix="audio-encode")
+    if run_jobs:
+        job_runner = JobRunner(job_store, engine_pool, voice_manager, sentence_cache=sentence_cache)
+    startup_timings["runtime"] = round(time.time() - start_time, 3)
+    startup_timings["total"] = round(time.time() - PROCESS_START_TIME, 3)
+    model_loaded = True
+    start_warmup()
+
+def load_in_background():
+    """单进程模式：socket绑定后在后台线程加载模型，期间 /health 正常应答"""
+    def run():
+        global model_error
+        try:
+            load_models()
+            init_runtime()
+        except Exception as e:
+            model_error = str(e)
+            print(f"❌ 模型加载失败: {model_error}")
+    
+    threading.Thread(target=run, name="model-loader", daemon=True).start()
+
+# 模型加载期间仍可访问的接口
+LOADING_EXEMPT_PATHS = {"/", "/health", "/api/ready", "/api/voices", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+router = APIRouter()
+
+def create_app(args: Optional[argparse.Namespace] = None) -> FastAPI:
+    """创建FastAPI应用（应用工厂）
+
+    只创建应用和轻量组件，不加载模型；模型在应用启动后于后台线程加载，
+    也可以在创建前调用 load_models() 同步加载（预派生多进程模式）。
+    也可通过 uvicorn --factory api_server:create_app 启动（使用默认参数）。
+    """
+    global cmd_args, voice_manager
+    cmd_args = args if args is not None else parse_args([])
+    # 预派生模式下模型（及条件mel缓存）可能已在创建应用前加载
+    voice_manager = VoiceManager(cond_mel_cache=cond_mel_cache)
+    
+    # 创建必要目录
+    os.makedirs("outputs/api", exist_ok=True)
+    
+    app = FastAPI(
+        title="IndexTTS API",
+        description="IndexTTS API for dify workflow integration",
+        version="1.0.0"
+    )
+    
+    # 添加CORS中间件
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    @app.middleware("http")
+    async def reject_while_loading(request: Request, call_next):
+        """模型加载完成前拒绝推理相关请求"""
+        if not model_loaded and request.url.path not in LOADING_EXEMPT_PATHS:
+            return JSONResponse(status_code=503, content={"detail": model_error or "模型加载中"},
+                                headers={"Retry-After": "5"})
+        return await call_next(request)
+    
+    @app.on_event("startup")
+    def start_model_loading():
+        startup_timings["app_ready"] = round(time.time() - PROCESS_START_TIME, 3)
+        if not model_loaded and engines is None:
+            load_in_background()
+    
+    @app.on_event("shutdown")
+    def flush_voice_usage():
+        """退出前写入尚未保存的音色使用次数"""
+        voice_manager.flush_usage()
+    
+    app.include_router(router)
+    return app
 
-# 初始化组件
-print("正在加载模型...")
-tts = IndexTTS(model_dir=cmd_args.model_dir, cfg_path=os.path.join(cmd_args.model_dir, "config.yaml"))
-voice_manager = VoiceManager()
-print("模型加载完成!")
-
-# 创建必要目录
-os.makedirs("outputs/api", exist_ok=True)
-
-# 创建FastAPI应用
-app = FastAPI(
-    title="IndexTTS API",
-    description="IndexTTS API for dify workflow integration",
-    version="1.0.0"
-)
-
-# 添加CORS中间件
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120, 
+def get_generation_kwargs(request: TTSRequest) -> Dict:
+    """从请求中提取GPT生成参数"""
+    return {
+        "do_sample": request.do_sample,
+        "top_p": request.top_p,
+        "top_k": request.top_k,
+        "temperature": request.temperature,
+        "length_penalty": request.length_penalty,
+        "num_beams": request.num_beams,
+        "repetition_penalty": request.repetition_penalty,
+        "max_mel_tokens": request.max_mel_tokens,
+    }
+
+def generate_tts_internal(tts, prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120, 
                          sentences_bucket_max_size=4, **generation_kwargs):
-    """内部TTS生成函数"""
+    """内部TTS生成函数（在推理工作线程中执行）
+
+    默认由上游 tts.infer / tts.infer_fast 合成（计时分 cond、normalize、tokenize、gpt、vocoder、write 阶段）；
+    启用分句缓存时逐句合成，命中的分句跳过GPT解码和声码。
+    """
+    from indextts.synthesis import infer_upstream, save_wav
+    
     if not prompt_audio_path:
         return None, "请提供参考音频", 0
     
@@ -115,16 +355,14 @@ def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_p
     start_time = time.time()
     
     try:
-        if infer_mode == "普通推理":
-            result = tts.infer(prompt_audio_path, text, output_path, verbose=cmd_args.verbose,
-                              max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                              **generation_kwargs)
+        if sentence_cache is not None:
+            wavs = synthesize_wavs(tts, prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence,
+                                   sentences_bucket_max_size, **generation_kwargs)
+            result = save_wav(wavs, output_path) if wavs else None
         else:
-            # 批次推理
-            result = tts.infer_fast(prompt_audio_path, text, output_path, verbose=cmd_args.verbose,
-                                   max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                                   sentences_bucket_max_size=int(sentences_bucket_max_size),
-                                   **generation_kwargs)
+            result = infer_upstream(tts, prompt_audio_path, text, infer_mode != "普通推理",
+                                    max_text_tokens_per_sentence, sentences_bucket_max_size,
+                                    output_path=output_path, verbose=cmd_args.verbose, **generation_kwargs)
         
         duration = time.time() - start_time
         
@@ -137,7 +375,175 @@ def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_p
         duration = time.time() - start_time
         return None, f"生成失败: {str(e)}", duration
 
-@app.get("/")
+def synthesize_wavs(tts, prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120,
+                    sentences_bucket_max_size=4, **generation_kwargs):
+    """合成波形并留在内存中（在推理工作线程中执行），返回按顺序排列的波形列表"""
+    from indextts.sentence_cache import synthesize_text
+    from indextts.synthesis import infer_upstream
+    
+    if sentence_cache is None:
+        wav = infer_upstream(tts, prompt_audio_path, text, infer_mode != "普通推理",
+                             max_text_tokens_per_sentence, sentences_bucket_max_size,
+                             verbose=cmd_args.verbose, **generation_kwargs)
+        return [wav] if wav is not None else []
+    bucket_size = 1 if infer_mode == "普通推理" else int(sentences_bucket_max_size)
+    return synthesize_text(tts, prompt_audio_path, text, max_text_tokens_per_sentence,
+                           bucket_max_size=bucket_size, cache=sentence_cache, **generation_kwargs)
+
+async def estimate_request_cost(text: str) -> int:
+    """估算请求代价：sjf策略下使用分词后的token数，其它策略用文本长度近似"""
+    if cmd_args.schedule_policy != "sjf":
+        return len(text)
+    return await asyncio.get_running_loop().run_in_executor(None, estimate_cost, tts, text)
+
+def result_cache_key(request: TTSRequest) -> Optional[str]:
+    """计算请求的结果缓存键（文本+音色音频内容+全部采样参数）"""
+    voice_hash = voice_manager.get_voice_audio_hash(request.voice_name)
+    if not voice_hash:
+        return None
+    params = get_generation_kwargs(request)
+    params.update({
+        "infer_mode": request.infer_mode,
+        "max_text_tokens_per_sentence": request.max_text_tokens_per_sentence,
+        "sentences_bucket_max_size": request.sentences_bucket_max_size,
+    })
+    return ResultCache.make_key(request.text, voice_hash, params)
+
+def record_request(endpoint: str, outcome: str, start_time: float):
+    metrics.REQUESTS.labels(endpoint, outcome).inc()
+    metrics.REQUEST_SECONDS.labels(endpoint).observe(time.time() - start_time)
+
+async def track_stream_body(body_iterator, endpoint: str, start_time: float):
+    """包装流式响应体，发送完最后一块数据（或客户端断开）时才记录请求"""
+    outcome = "error"
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+        outcome = "success"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        record_request(endpoint, outcome, start_time)
+
+def track_request(endpoint: str):
+    """记录接口的请求数（按结果分类）和端到端耗时
+
+    返回流式响应时，耗时统计到响应体发送完毕为止。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start_time = time.time()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                if isinstance(result, StreamingResponse):
+                    result.body_iterator = track_stream_body(result.body_iterator, endpoint, start_time)
+                    outcome = None
+                else:
+                    outcome = "success" if getattr(result, "success", True) else "failed"
+                return result
+            except HTTPException as e:
+                if e.status_code == 503:
+                    outcome = "rejected"
+                elif e.status_code < 500:
+                    outcome = "invalid"
+                raise
+            finally:
+                if outcome is not None:
+                    record_request(endpoint, outcome, start_time)
+        return wrapper
+    return decorator
+
+def log_request_timings(endpoint: str, request: TTSRequest, timings: StageTimings):
+    if not cmd_args.no_timing_log:
+        log_timings(endpoint, timings, voice=request.voice_name, chars=len(request.text), format=request.format)
+
+def use_result_cache(request: TTSRequest) -> bool:
+    return request.cache and not cmd_args.no_result_cache
+
+def check_priority(request: TTSRequest):
+    if request.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"未知的优先级: {request.priority}")
+
+def check_output_format(fmt: str, sample_rate: Optional[int]):
+    try:
+        validate_output_format(fmt, sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def validate_tts_request(request: TTSRequest) -> str:
+    """检查TTS请求参数，全部通过后记录音色使用次数，返回音色音频路径"""
+    audio_path = voice_manager.get_voice_audio_path(request.voice_name)
+    if not audio_path:
+        raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+    check_priority(request)
+    check_output_format(request.format, request.sample_rate)
+    # 空文本请求不会合成，不计入使用次数
+    if request.text and request.text.strip():
+        voice_manager.record_usage(request.voice_name)
+    return audio_path
+
+async def get_audio_variant(wav_path: str, fmt: str = "wav", sample_rate: Optional[int] = None,
+                            timings: Optional[StageTimings] = None) -> str:
+    """获取指定格式和采样率的音频文件
+
+    编码在线程池中执行，结果按内容哈希命名，与原始wav放在同一目录并计入缓存配额；
+    变体名（如 <wav哈希>.16000.mp3）通过引用文件指向编码结果，重复下载不会重新编码。
+    """
+    from indextts.synthesis import SAMPLING_RATE
+    
+    sample_rate = sample_rate or SAMPLING_RATE
+    if fmt == "wav" and sample_rate == SAMPLING_RATE:
+        return wav_path
+    
+    variant_name = variant_filename(os.path.basename(wav_path), fmt, sample_rate)
+    
+    def encode():
+        variant_path = result_cache.lookup(variant_name)
+        if variant_path:
+            return variant_path
+        tmp_path = os.path.join(os.path.dirname(wav_path), f"{variant_name}.{uuid.uuid4().hex}.tmp")
+        encode_file(wav_path, tmp_path, fmt, sample_rate)
+        return result_cache.store(tmp_path, variant_name)
+    
+    with (timings or StageTimings()).measure("encode"):
+        return await asyncio.get_running_loop().run_in_executor(encode_executor, encode)
+
+async def generate_tts_batched(prompt_audio_path, text, max_text_tokens_per_sentence=120, cost=1,
+                               priority="normal", timings=None, **generation_kwargs):
+    """跨请求批处理的TTS生成函数（分句与其他并发请求合并成批次推理）"""
+    from indextts.synthesis import save_wav
+    
+    timings = timings or StageTimings()
+    
+    if not text or not text.strip():
+        return None, "请输入文本内容", 0
+    
+    task_id = str(uuid.uuid4())
+    output_path = os.path.join("outputs", "api", f"tts_{task_id}.wav")
+    
+    start_time = time.time()
+    
+    try:
+        future = batch_scheduler.submit(prompt_audio_path, text, max_text_tokens_per_sentence,
+                                        cost=cost, priority=priority, timings=timings, **generation_kwargs)
+        wavs = await asyncio.wrap_future(future)
+        if not wavs:
+            return None, "生成失败", time.time() - start_time
+        
+        with timings.measure("write"):
+            await asyncio.get_running_loop().run_in_executor(None, save_wav, wavs, output_path)
+        return output_path, "生成成功", time.time() - start_time
+    
+    except QueueFullError:
+        raise
+    except Exception as e:
+        duration = time.time() - start_time
+        return None, f"生成失败: {str(e)}", duration
+
+@router.get("/")
 async def root():
     """根路径"""
     return {
@@ -146,43 +552,96 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "tts": "/api/tts",
+            "tts_file": "/api/tts/file",
+            "tts_stream": "/api/tts/stream",
+            "tts_ws": "/api/tts/ws",
+            "jobs": "/api/jobs",
+            "queue": "/api/queue",
+            "ready": "/api/ready",
+            "health": "/health",
+            "metrics": "/metrics",
             "voices": "/api/voices",
             "audio": "/api/audio/{filename}"
         }
     }
 
-@app.post("/api/tts", response_model=TTSResponse)
-async def api_tts(request: TTSRequest):
-    """TTS API接口"""
+@router.post("/api/tts", response_model=TTSResponse)
+@track_request("tts")
+async def api_tts(request: TTSRequest, response: Response):
+    """TTS API接口（各阶段耗时在 Server-Timing 响应头和 timings 字段中返回）"""
+    timings = StageTimings()
+    result = await create_tts(request, timings)
+    response.headers["Server-Timing"] = timings.server_timing()
+    log_request_timings("tts", request, timings)
+    return result
+
+async def create_tts(request: TTSRequest, timings: Optional[StageTimings] = None) -> TTSResponse:
+    """生成音频（命中结果缓存时直接返回），返回音频URL"""
+    timings = timings or StageTimings()
     try:
-        # 检查音色是否存在
-        audio_path = voice_manager.get_voice_audio_path(request.voice_name)
-        if not audio_path:
-            raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+        audio_path = validate_tts_request(request)
+        
+        # 相同文本、音色和参数的请求直接返回已生成的音频
+        loop = asyncio.get_running_loop()
+        cache_key = None
+        cached_path = None
+        if use_result_cache(request):
+            with timings.measure("cache"):
+                cache_key = await loop.run_in_executor(None, result_cache_key, request)
+                cached_path = result_cache.get(cache_key) if cache_key else None
+            if cached_path:
+                cached_path = await get_audio_variant(cached_path, request.format, request.sample_rate, timings)
+                return TTSResponse(
+                    success=True,
+                    message="生成成功（命中缓存）",
+                    audio_url=f"/api/audio/{os.path.basename(cached_path)}",
+                    task_id=cache_key,
+                    duration=0,
+                    timings=timings.as_dict()
+                )
         
         # 准备生成参数
-        generation_kwargs = {
-            "do_sample": request.do_sample,
-            "top_p": request.top_p,
-            "top_k": request.top_k,
-            "temperature": request.temperature,
-            "length_penalty": request.length_penalty,
-            "num_beams": request.num_beams,
-            "repetition_penalty": request.repetition_penalty,
-            "max_mel_tokens": request.max_mel_tokens,
-        }
+        generation_kwargs = get_generation_kwargs(request)
+        cost = await estimate_request_cost(request.text)
         
-        # 生成语音
-        output_path, message, duration = generate_tts_internal(
-            audio_path,
-            request.text,
-            request.infer_mode,
-            request.max_text_tokens_per_sentence,
-            request.sentences_bucket_max_size,
-            **generation_kwargs
-        )
+        # 提交到推理工作线程，避免阻塞事件循环
+        try:
+            if batch_scheduler is not None:
+                output_path, message, duration = await generate_tts_batched(
+                    audio_path,
+                    request.text,
+                    request.max_text_tokens_per_sentence,
+                    cost=cost,
+                    priority=request.priority,
+                    timings=timings,
+                    **generation_kwargs
+                )
+            else:
+                job = InferenceJob(
+                    generate_tts_internal,
+                    (audio_path, request.text, request.infer_mode,
+                     request.max_text_tokens_per_sentence, request.sentences_bucket_max_size),
+                    generation_kwargs,
+                    cost=cost,
+                    priority=request.priority,
+                    timings=timings
+                )
+                output_path, message, duration = await asyncio.wrap_future(engine_pool.submit_job(job))
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e),
+                                headers={"Retry-After": str(e.retry_after)})
         
         if output_path:
+            task_id = os.path.basename(output_path).replace("tts_", "").replace(".wav", "")
+            # 按内容哈希重命名，返回的URL可以被客户端和CDN永久缓存
+            if cache_key:
+                task_id = cache_key
+                output_path = await loop.run_in_executor(None, result_cache.put, cache_key, output_path)
+            else:
+                output_path = await loop.run_in_executor(None, result_cache.store, output_path)
+            
+            output_path = await get_audio_variant(output_path, request.format, request.sample_rate, timings)
+            
             # 生成音频URL
             filename = os.path.basename(output_path)
             audio_url = f"/api/audio/{filename}"
@@ -191,16 +650,324 @@ async def api_tts(request: TTSRequest):
                 success=True,
                 message=message,
                 audio_url=audio_url,
-                task_id=filename.replace("tts_", "").replace(".wav", ""),
-                duration=duration
+                task_id=task_id,
+                duration=duration,
+                timings=timings.as_dict()
             )
         else:
-            return TTSResponse(success=False, message=message, duration=duration)
+            return TTSResponse(success=False, message=message, duration=duration, timings=timings.as_dict())
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/voices", response_model=VoiceListResponse)
+async def synthesize_in_memory(request: TTSRequest, timings: StageTimings) -> Response:
+    """生成音频并直接在内存中编码返回，不经过磁盘"""
+    from indextts.synthesis import SAMPLING_RATE
+    
+    audio_path = validate_tts_request(request)
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="请输入文本内容")
+    
+    generation_kwargs = get_generation_kwargs(request)
+    cost = await estimate_request_cost(request.text)
+    try:
+        if batch_scheduler is not None:
+            future = batch_scheduler.submit(audio_path, request.text, request.max_text_tokens_per_sentence,
+                                            cost=cost, priority=request.priority, timings=timings,
+                                            **generation_kwargs)
+        else:
+            future = engine_pool.submit_job(InferenceJob(
+                synthesize_wavs,
+                (audio_path, request.text, request.infer_mode,
+                 request.max_text_tokens_per_sentence, request.sentences_bucket_max_size),
+                generation_kwargs,
+                cost=cost,
+                priority=request.priority,
+                timings=timings
+            ))
+        wavs = await asyncio.wrap_future(future)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
+    if not wavs:
+        raise HTTPException(status_code=500, detail="生成失败")
+    
+    sample_rate = request.sample_rate or SAMPLING_RATE
+    with timings.measure("encode"):
+        content = await asyncio.get_running_loop().run_in_executor(
+            encode_executor, encode_wavs, wavs, SAMPLING_RATE, request.format, sample_rate)
+    filename = f"tts_{uuid.uuid4()}.{AUDIO_FORMATS[request.format]['extension']}"
+    return Response(
+        content=content,
+        media_type=media_type_for(request.format, sample_rate),
+        headers={"Content-Disposition": content_disposition(filename),
+                 "Server-Timing": timings.server_timing()}
+    )
+
+@router.post("/api/tts/file")
+@track_request("tts_file")
+async def api_tts_file(request: TTSRequest):
+    """TTS API接口 - 直接返回音频文件（格式由format和sample_rate指定）
+
+    使用结果缓存时生成的音频写入outputs/api以便复用；
+    不使用缓存时（cache=false 或 --no_result_cache）在内存中编码后直接返回，不写磁盘。
+    """
+    timings = StageTimings()
+    if not use_result_cache(request):
+        response = await synthesize_in_memory(request, timings)
+        log_request_timings("tts_file", request, timings)
+        return response
+    
+    result = await create_tts(request, timings)
+    if not result.success:
+        raise HTTPException(status_code=500, detail=result.message)
+    
+    filename = result.audio_url.split("/")[-1]
+    log_request_timings("tts_file", request, timings)
+    return FileResponse(
+        os.path.join("outputs", "api", filename),
+        media_type=media_type_for_filename(filename),
+        filename=filename,
+        headers={"Server-Timing": timings.server_timing()}
+    )
+
+@router.post("/api/tts/stream")
+@track_request("tts_stream")
+async def api_tts_stream(request: TTSStreamRequest):
+    """流式TTS接口 - 每合成完一句立即返回该句音频"""
+    from indextts.audio_stream import STREAM_MEDIA_TYPES, SentenceStream, iter_stream_body, run_stream_job
+    from indextts.synthesis import SAMPLING_RATE
+    
+    audio_path = voice_manager.get_voice_audio_path(request.voice_name)
+    if not audio_path:
+        raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+    
+    if request.stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的流式格式: {request.stream_format}")
+    
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="请输入文本内容")
+    
+    check_priority(request)
+    voice_manager.record_usage(request.voice_name)
+    generation_kwargs = get_generation_kwargs(request)
+    cost = await estimate_request_cost(request.text)
+    
+    stream = SentenceStream(asyncio.get_running_loop())
+    try:
+        engine_pool.submit_job(InferenceJob(
+            run_stream_job,
+            (stream, audio_path, request.text, request.max_text_tokens_per_sentence),
+            generation_kwargs,
+            cost=cost,
+            priority=request.priority
+        ))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    
+    return StreamingResponse(
+        iter_stream_body(stream, request.stream_format),
+        media_type=STREAM_MEDIA_TYPES[request.stream_format],
+        headers={"Cache-Control": "no-cache", "X-Sample-Rate": str(SAMPLING_RATE)}
+    )
+
+@router.websocket("/api/tts/ws")
+async def api_tts_ws(websocket: WebSocket):
+    """WebSocket双工TTS接口 - 一个连接内连续合成多段文本
+
+    客户端发送JSON文本消息:
+      {"type": "synthesize", "id": "u1", "text": "...", "voice_name": "...", ...TTSRequest其他字段}
+      {"type": "cancel", "id": "u1"}
+    服务端按顺序处理每段文本，依次发送:
+      {"type": "start", "id": "u1", "sample_rate": 24000}
+      若干二进制帧（每句一帧，PCM16单声道）
+      {"type": "end", "id": "u1"} / {"type": "cancelled", "id": "u1"} / {"type": "error", "id": "u1", "message": "..."}
+    """
+    await websocket.accept()
+    if not model_loaded:
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason="model loading")
+        return
+    from indextts.audio_stream import SentenceStream, run_stream_job
+    from indextts.synthesis import SAMPLING_RATE
+    
+    loop = asyncio.get_running_loop()
+    utterances = asyncio.Queue()
+    cancelled_ids = set()
+    current = {"id": None, "stream": None}
+    
+    async def receive_loop():
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type", "synthesize") == "cancel":
+                utterance_id = message.get("id")
+                if current["id"] == utterance_id and current["stream"] is not None:
+                    current["stream"].cancel()
+                else:
+                    cancelled_ids.add(utterance_id)
+            else:
+                await utterances.put(message)
+    
+    async def synthesize_loop():
+        while True:
+            message = await utterances.get()
+            start_time = time.time()
+            utterance_id = message.pop("id", None)
+            message.pop("type", None)
+            if utterance_id in cancelled_ids:
+                cancelled_ids.discard(utterance_id)
+                record_request("tts_ws", "cancelled", start_time)
+                await websocket.send_json({"type": "cancelled", "id": utterance_id})
+                continue
+            
+            try:
+                request = TTSRequest(**message)
+            except ValidationError as e:
+                record_request("tts_ws", "invalid", start_time)
+                await websocket.send_json({"type": "error", "id": utterance_id, "message": f"参数格式错误: {str(e)}"})
+                continue
+            
+            audio_path = voice_manager.get_voice_audio_path(request.voice_name)
+            if not audio_path:
+                record_request("tts_ws", "invalid", start_time)
+                await websocket.send_json({"type": "error", "id": utterance_id,
+                                           "message": f"音色 '{request.voice_name}' 不存在"})
+                continue
+            if not request.text.strip():
+                record_request("tts_ws", "invalid", start_time)
+                await websocket.send_json({"type": "error", "id": utterance_id, "message": "请输入文本内容"})
+                continue
+            if request.priority not in PRIORITY_CLASSES:
+                record_request("tts_ws", "invalid", start_time)
+                await websocket.send_json({"type": "error", "id": utterance_id,
+                                           "message": f"未知的优先级: {request.priority}"})
+                continue
+            voice_manager.record_usage(request.voice_name)
+            
+            stream = SentenceStream(loop)
+            try:
+                engine_pool.submit_job(InferenceJob(
+                    run_stream_job,
+                    (stream, audio_path, request.text, request.max_text_tokens_per_sentence),
+                    get_generation_kwargs(request),
+                    cost=await estimate_request_cost(request.text),
+                    priority=request.priority
+                ))
+            except QueueFullError as e:
+                record_request("tts_ws", "rejected", start_time)
+                await websocket.send_json({"type": "error", "id": utterance_id, "message": str(e),
+                                           "retry_after": e.retry_after})
+                continue
+            
+            current["id"], current["stream"] = utterance_id, stream
+            outcome = "error"
+            await websocket.send_json({"type": "start", "id": utterance_id, "sample_rate": SAMPLING_RATE})
+            try:
+                async for index, total, pcm in stream:
+                    if stream.cancelled:
+                        break
+                    await websocket.send_bytes(pcm)
+                outcome = "cancelled" if stream.cancelled else "success"
+            except Exception as e:
+                await websocket.send_json({"type": "error", "id": utterance_id, "message": f"生成失败: {str(e)}"})
+                continue
+            except asyncio.CancelledError:
+                # 连接断开
+                outcome = "cancelled"
+                raise
+            finally:
+                current["id"], current["stream"] = None, None
+                record_request("tts_ws", outcome, start_time)
+            
+            if stream.cancelled:
+                await websocket.send_json({"type": "cancelled", "id": utterance_id})
+            else:
+                await websocket.send_json({"type": "end", "id": utterance_id})
+    
+    receiver = asyncio.ensure_future(receive_loop())
+    synthesizer = asyncio.ensure_future(synthesize_loop())
+    try:
+        await asyncio.wait([receiver, synthesizer], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        synthesizer.cancel()
+        if current["stream"] is not None:
+            current["stream"].cancel()
+        for task in (receiver, synthesizer):
+            if task.done() and not task.cancelled() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"WebSocket连接异常: {task.exception()}")
+
+def _job_response(job: Dict) -> JobResponse:
+    return JobResponse(
+        success=job["state"] != "failed",
+        job_id=job["id"],
+        state=job["state"],
+        progress=job["progress"],
+        total=job["total"],
+        audio_url=job["result_url"],
+        message=job["message"],
+        created_time=job["created_time"],
+        started_time=job["started_time"],
+        finished_time=job["finished_time"]
+    )
+
+@router.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def api_create_job(request: TTSRequest):
+    """提交异步TTS任务 - 立即返回任务ID，适合长文本"""
+    if not voice_manager.get_voice_audio_path(request.voice_name):
+        raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="请输入文本内容")
+    check_priority(request)
+    check_output_format(request.format, request.sample_rate)
+    voice_manager.record_usage(request.voice_name)
+    
+    job_request = request.model_dump()
+    # 未指定优先级的异步任务按batch执行，不抢占交互式请求
+    if "priority" not in request.model_fields_set:
+        job_request["priority"] = "batch"
+    job = job_store.create_job(job_request)
+    if job_runner is not None:
+        job_runner.notify()
+    return _job_response(job)
+
+@router.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def api_get_job(job_id: str):
+    """查询异步任务状态"""
+    job = job_store.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return _job_response(job)
+
+@router.api_route("/api/jobs/{job_id}/audio", methods=["GET", "HEAD"])
+async def api_get_job_audio(http_request: Request, job_id: str):
+    """下载异步任务的结果音频（任务结果不计入结果缓存的磁盘配额，不会被淘汰）"""
+    from indextts.job_store import JOB_DONE, JOBS_OUTPUT_DIR, job_result_filename
+    
+    job = job_store.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job["state"] != JOB_DONE:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成: {job['state']}")
+    filename = job_result_filename(job_id, job["request"])
+    response = await audio_file_response(http_request, os.path.join(JOBS_OUTPUT_DIR, filename), filename,
+                                         media_type_for_filename(filename))
+    if response is None:
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+    return response
+
+@router.get("/api/jobs")
+async def api_list_jobs(state: Optional[str] = None, limit: int = 100):
+    """列出异步任务"""
+    jobs = job_store.list_jobs(state=state, limit=limit)
+    return {"success": True, "jobs": [_job_response(job) for job in jobs]}
+
+@router.get("/api/voices", response_model=VoiceListResponse)
 async def api_get_voices():
     """获取音色列表API"""
     try:
@@ -209,21 +976,59 @@ async def api_get_voices():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/audio/{filename}")
-async def api_get_audio(filename: str):
-    """获取音频文件API"""
+@router.api_route("/api/audio/{filename}", methods=["GET", "HEAD"])
+async def api_get_audio(http_request: Request, filename: str, format: Optional[str] = None,
+                        sample_rate: Optional[int] = None):
+    """获取音频文件API（支持Range断点/拖动、ETag条件请求；文件名按内容哈希命名，可永久缓存）
+
+    Args:
+        format: 可选，转换为指定格式（wav / flac / ogg-opus / mp3 / pcm16）
+        sample_rate: 可选，转换为指定采样率
+    """
     file_path = os.path.join("outputs", "api", filename)
-    if os.path.exists(file_path):
-        return FileResponse(
-            file_path, 
-            media_type="audio/wav", 
-            filename=filename,
-            headers={"Cache-Control": "max-age=3600"}  # 缓存1小时
-        )
-    else:
+    if filename.endswith(REF_SUFFIX) or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+    
+    if format or sample_rate:
+        if not filename.endswith(".wav"):
+            raise HTTPException(status_code=400, detail="只能从wav文件转换格式")
+        check_output_format(format or "wav", sample_rate)
+        file_path = await get_audio_variant(file_path, format or "wav", sample_rate)
+        filename = os.path.basename(file_path)
+    response = await audio_file_response(http_request, file_path, filename, media_type_for_filename(filename))
+    if response is None:
         raise HTTPException(status_code=404, detail="音频文件不存在")
+    return response
 
-@app.get("/api/status")
+@router.get("/api/queue")
+async def api_queue():
+    """获取排队情况（按调度顺序的排队位置、代价和已等待时间）"""
+    return {
+        "policy": cmd_args.schedule_policy,
+        "replicas": engine_pool.queued_jobs()
+    }
+
+@router.get("/health")
+async def health():
+    """存活检查 - 模型加载期间也立即应答，加载失败时返回500"""
+    if model_error:
+        raise HTTPException(status_code=500, detail=f"模型加载失败: {model_error}")
+    return {
+        "status": "ok" if model_loaded else "loading",
+        "uptime": round(time.time() - PROCESS_START_TIME, 3),
+        "startup": startup_timings
+    }
+
+@router.get("/api/ready")
+async def api_ready():
+    """就绪检查 - 模型加载和预热完成前返回503，负载均衡器据此决定是否转发流量"""
+    if not model_loaded:
+        raise HTTPException(status_code=503, detail="模型加载中")
+    if warmup_report is None:
+        raise HTTPException(status_code=503, detail="服务预热中")
+    return {"ready": True, "warmup": warmup_report}
+
+@router.get("/api/status")
 async def api_status():
     """获取服务状态"""
     voices_count = len(voice_manager.list_voices())
@@ -231,34 +1036,80 @@ async def api_status():
         "status": "running",
         "model_version": getattr(tts, 'model_version', '1.0'),
         "voices_count": voices_count,
-        "model_dir": cmd_args.model_dir
+        "model_dir": cmd_args.model_dir,
+        "queue": engine_pool.stats(),
+        "batching": batch_scheduler.stats() if batch_scheduler else None,
+        "result_cache": result_cache.stats(),
+        "sentence_cache": sentence_cache.stats() if sentence_cache else None,
+        "cond_cache": cond_mel_cache.stats(),
+        "text_cache": text_cache.stats() if text_cache else None,
+        "startup": startup_timings,
+        "import_profile": import_report
     }
 
-@app.delete("/api/cleanup")
-async def api_cleanup():
-    """清理临时文件"""
+def collect_metrics():
+    """同步由各组件自身维护的统计（队列、缓存、内存）到指标"""
+    metrics.update_queue_metrics(engine_pool, batch_scheduler)
+    if result_cache is not None:
+        stats = result_cache.stats()
+        metrics.update_cache_metrics("result", stats["hits"], stats["misses"], stats["bytes"])
+    if sentence_cache is not None:
+        stats = sentence_cache.stats()
+        metrics.update_cache_metrics("sentence", stats["hits"], stats["misses"], stats["bytes"])
+    if cond_mel_cache is not None:
+        hits = cond_mel_cache.stats()["hits"]
+        metrics.update_cache_metrics("cond_mel", hits["device"] + hits["host"] + hits["disk"], hits["computed"])
+    if text_cache is not None:
+        stats = text_cache.stats()
+        metrics.update_cache_metrics("text", stats["hits"], stats["misses"], stats["bytes"])
+    metrics.update_memory_metrics()
+
+@router.get("/metrics")
+async def api_metrics():
+    """Prometheus指标（多进程模式下为所有工作进程的汇总）"""
+    collect_metrics()
+    content = await asyncio.get_running_loop().run_in_executor(None, metrics.render)
+    return Response(content=content, media_type=metrics.CONTENT_TYPE)
+
+@router.delete("/api/cleanup")
+async def api_cleanup(max_age: Optional[float] = None):
+    """清理音频文件 - 按磁盘配额淘汰最久未访问的文件
+
+    Args:
+        max_age: 可选，同时删除超过该秒数未被访问的文件
+    """
     try:
-        import glob
-        api_files = glob.glob("outputs/api/tts_*.wav")
-        
-        # 删除1小时前的文件
-        current_time = time.time()
-        deleted_count = 0
+        def cleanup():
+            # 纳入其它途径（如手动放入）生成的文件后再按配额淘汰
+            result_cache.scan()
+            return result_cache.enforce_quota(max_age=max_age)
         
-        for file_path in api_files:
-            file_time = os.path.getctime(file_path)
-            if current_time - file_time > 3600:  # 1小时
-                os.remove(file_path)
-                deleted_count += 1
+        deleted_count = await asyncio.get_running_loop().run_in_executor(None, cleanup)
         
         return {
             "success": True,
-            "message": f"清理了 {deleted_count} 个临时文件"
+            "message": f"清理了 {deleted_count} 个音频文件",
+            "cache": result_cache.stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.workers > 1 and not metrics.multiprocess_dir():
+        # prometheus_client 在导入时读取多进程目录：创建临时目录后重新执行本脚本，/metrics 汇总所有工作进程
+        os.environ[metrics.MULTIPROC_DIR_ENV] = tempfile.mkdtemp(prefix="indextts-metrics-")
+        os.environ["INDEXTTS_OWNS_METRICS_DIR"] = "1"
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    app = create_app(args)
+    
+    # 模型文件缺失时直接退出，不进入后台加载
+    error = check_model_files(cmd_args.model_dir)
+    if error:
+        print(error)
+        sys.exit(1)
+    
     print(f"🚀 启动IndexTTS API服务器")
     print(f"📡 API地址: http://{cmd_args.host}:{cmd_args.port}")
     print(f"📖 API文档: http://{cmd_args.host}:{cmd_args.port}/docs")
@@ -279,6 +1130,41 @@ if __name__ == "__main__":
     
     print("=" * 50)
     
+    if cmd_args.workers > 1:
+        # 预派生模式需要在fork前加载好模型，子进程才能共享权重
+        load_models()
+        if any(str(engine.device).startswith("cuda") for engine in engines):
+            print("❌ 多进程模式不支持CUDA（CUDA上下文无法跨fork共享），请使用 --workers 1")
+            sys.exit(1)
+        # 各工作进程的指标写入共享的 PROMETHEUS_MULTIPROC_DIR，/metrics 输出所有进程的汇总
+        metrics_dir = metrics.multiprocess_dir()
+        for name in os.listdir(metrics_dir):
+            # 上次运行留下的文件（父进程自己的文件已经在使用中）
+            if name.endswith(".db") and not name.endswith(f"_{os.getpid()}.db"):
+                os.remove(os.path.join(metrics_dir, name))
+        # 父进程不处理请求，它的瞬时值不参与汇总
+        metrics.mark_process_dead(os.getpid())
+        
+        def on_worker_start(worker_index: int):
+            init_runtime(run_jobs=worker_index == 0)
+            metrics.start_collector(collect_metrics)
+        
+        try:
+            serve_prefork(
+                app,
+                host=cmd_args.host,
+                port=cmd_args.port,
+                workers=cmd_args.workers,
+                threads_per_worker=cmd_args.threads_per_worker,
+                on_worker_start=on_worker_start,
+                on_worker_exit=metrics.mark_process_dead
+            )
+        finally:
+            if os.environ.get("INDEXTTS_OWNS_METRICS_DIR"):
+                shutil.rmtree(metrics_dir, ignore_errors=True)
+        sys.exit(0)
+    
+    # 单进程模式：socket立即绑定，模型在应用启动后于后台线程加载
     uvicorn.run(
         app, 
         host=cmd_args.host, 
@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, "indextts"))
+
+from indextts.voice_manager import VoiceManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为已保存的音色预计算并保存条件mel和音频内容哈希")
+    parser.add_argument("--voices_dir", type=str, default="voices", help="Voices directory")
+    parser.add_argument("--force", action="store_true", default=False, help="Recompute even if the file already exists")
+    args = parser.parse_args()
+
+    voice_manager = VoiceManager(args.voices_dir)
+    voice_names = list(voice_manager.voices_db)
+    print(f"共 {len(voice_names)} 个音色")
+
+    done = 0
+    for voice_name in voice_names:
+        start_time = time.time()
+        voice_manager.ensure_audio_hash(voice_name)
+        cond_mel_path = voice_manager.ensure_cond_mel(voice_name, force=args.force)
+        if cond_mel_path:
+            done += 1
+            print(f"✅ {voice_name}: {cond_mel_path} ({time.time() - start_time:.2f}s)")
+        else:
+            print(f"❌ {voice_name}: 音频不存在或计算失败")
+
+    print(f"完成 {done}/{len(voice_names)} 个音色")
+
+
+if __name__ == "__main__":
+    main()
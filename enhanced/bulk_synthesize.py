@@ -0,0 +1,400 @@
+"""
+离线批量合成
+
+从JSONL清单读取任务，每行一条（格式同 tests/cases.jsonl，另加音色名称和输出路径）:
+    {"id": "ch01", "text": "第一章……", "voice_name": "旁白", "output": "outputs/book/ch01.mp3"}
+    {"text": "……", "prompt_audio": "tests/sample_prompt.wav", "format": "flac", "temperature": 0.8}
+
+- 先对所有条目分词分句，再按 (参考音频, 生成参数) 分组，默认在整个清单范围内
+  把同组的分句按token长度排序后切成批次，让每个批次里的分句长度接近，减少填充
+- 整个清单一起分桶时，一个条目要等它最长的分句所在的批次完成才能写出，
+  已完成分句的波形会一直留在内存中；清单很大时可以用 --window N 每N条分桶一次，
+  以稍低的批次密度换取有界的内存和更早写出的结果
+- 批次分发到多个推理副本（--workers）执行
+- 每条输出先写临时文件再原子重命名，完成后追加到完成日志（fsync）；
+  中断后用同一命令重新运行，日志中已完成且输出文件仍存在的条目会被跳过
+
+示例:
+    python bulk_synthesize.py --manifest book.jsonl --output_dir outputs/book --workers 2 --batch_size 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, "indextts"))
+
+from indextts.audio_encoding import AUDIO_FORMATS, encode_wavs, validate_output_format
+from indextts.engine_pool import EnginePool, create_engines, resolve_devices
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import InferenceJob
+from indextts.voice_manager import VoiceManager
+
+# 输出文件扩展名 -> 音频格式
+EXTENSION_FORMATS = {info["extension"]: fmt for fmt, info in AUDIO_FORMATS.items()}
+
+
+class Journal:
+    """完成日志 - 每条结果追加一行JSON并fsync，重新运行时据此跳过已完成的条目"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict] = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        needs_newline = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            for line in content.splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时只写了一半的最后一行
+                    continue
+                self.records[record["id"]] = record
+            needs_newline = bool(content) and not content.endswith("\n")
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def is_done(self, item: Dict) -> bool:
+        """日志中已完成、清单内容未改变且输出文件仍存在"""
+        record = self.records.get(item["id"])
+        return (record is not None and record.get("status") == "done"
+                and record.get("fingerprint") == item["fingerprint"]
+                and record.get("output") == item["output"] and os.path.exists(item["output"]))
+
+    def append(self, record: Dict):
+        record["time"] = round(time.time(), 3)
+        self.records[record["id"]] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def parse_item(entry: Dict, lineno: int, base_dir: str, output_dir: str, voice_manager: VoiceManager,
+               args) -> Dict:
+    """校验清单中的一行并解析出参考音频、输出路径和生成参数
+
+    Raises:
+        ValueError: 内容不合法
+    """
+    from indextts.synthesis import GENERATION_DEFAULTS
+
+    text = str(entry.get("text") or "").strip()
+    if not text:
+        raise ValueError(f"清单第 {lineno} 行缺少text")
+
+    if entry.get("voice_name"):
+        prompt_audio = voice_manager.get_voice_audio_path(entry["voice_name"])
+        if not prompt_audio:
+            raise ValueError(f"清单第 {lineno} 行: 音色 '{entry['voice_name']}' 不存在")
+    elif entry.get("prompt_audio"):
+        prompt_audio = entry["prompt_audio"]
+        # 相对路径先按当前目录解析，找不到时按清单所在目录解析
+        if not os.path.isabs(prompt_audio) and not os.path.exists(prompt_audio):
+            prompt_audio = os.path.join(base_dir, prompt_audio)
+        if not os.path.exists(prompt_audio):
+            raise ValueError(f"清单第 {lineno} 行: 参考音频 '{entry['prompt_audio']}' 不存在")
+    else:
+        raise ValueError(f"清单第 {lineno} 行需要voice_name或prompt_audio")
+
+    item_id = str(entry.get("id") or entry.get("output") or f"line_{lineno}")
+    output = entry.get("output")
+    fmt = entry.get("format")
+    if not fmt and output:
+        fmt = EXTENSION_FORMATS.get(os.path.splitext(output)[1].lstrip(".").lower())
+        if not fmt:
+            raise ValueError(f"清单第 {lineno} 行: 无法从输出文件扩展名推断格式，请指定format")
+    fmt = fmt or args.format
+    sample_rate = entry.get("sample_rate")
+    validate_output_format(fmt, sample_rate)
+    if not output:
+        output = os.path.join(output_dir, f"{item_id}.{AUDIO_FORMATS[fmt]['extension']}")
+
+    generation_kwargs = {k: entry[k] for k in GENERATION_DEFAULTS if k in entry}
+    max_tokens = int(entry.get("max_text_tokens_per_sentence", args.max_text_tokens_per_sentence))
+    fingerprint = hashlib.sha256(json.dumps(
+        [text, prompt_audio, generation_kwargs, max_tokens, fmt, sample_rate], ensure_ascii=False,
+        sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return {
+        "id": item_id,
+        "text": text,
+        "prompt_audio": prompt_audio,
+        "output": output,
+        "format": fmt,
+        "sample_rate": sample_rate,
+        "max_tokens": max_tokens,
+        "generation_kwargs": generation_kwargs,
+        "fingerprint": fingerprint,
+    }
+
+
+def load_manifest(path: str, output_dir: str, voice_manager: VoiceManager, args) -> List[Dict]:
+    """读取JSONL清单（空行和 # 开头的行忽略）
+
+    Raises:
+        ValueError: 某行内容不合法，或id / 输出路径重复
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    items = []
+    ids, outputs = set(), set()
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"清单第 {lineno} 行不是合法的JSON: {str(e)}")
+            item = parse_item(entry, lineno, base_dir, output_dir, voice_manager, args)
+            if item["id"] in ids:
+                raise ValueError(f"清单第 {lineno} 行: id '{item['id']}' 重复")
+            if item["output"] in outputs:
+                raise ValueError(f"清单第 {lineno} 行: 输出路径 '{item['output']}' 重复")
+            ids.add(item["id"])
+            outputs.add(item["output"])
+            items.append(item)
+    return items
+
+
+def group_key(item: Dict) -> Tuple[str, str]:
+    """只有参考音频和生成参数都相同的分句才能放进同一个批次"""
+    return item["prompt_audio"], json.dumps(item["generation_kwargs"], sort_keys=True)
+
+
+def plan_batches(items: List[Dict], batch_size: int) -> List[Tuple[str, Dict, List[Tuple[int, int]]]]:
+    """跨条目分桶：同组的所有分句按token长度排序后切成批次
+
+    Returns:
+        List[Tuple]: (参考音频, 生成参数, [(条目序号, 分句序号), ...])，同组批次由短到长
+    """
+    groups: Dict[Tuple[str, str], List[Tuple[int, int, int]]] = {}
+    for item_index, item in enumerate(items):
+        entries = groups.setdefault(group_key(item), [])
+        for sent_index, sent in enumerate(item["sentences"]):
+            entries.append((len(sent), item_index, sent_index))
+
+    batches = []
+    for entries in groups.values():
+        entries.sort()
+        first = items[entries[0][1]]
+        for start in range(0, len(entries), batch_size):
+            members = [(item_index, sent_index) for _, item_index, sent_index in entries[start:start + batch_size]]
+            batches.append((first["prompt_audio"], first["generation_kwargs"], members))
+    return batches
+
+
+def synthesize_bucket(tts, prompt_audio: str, sentences: List[List[str]], generation_kwargs: Dict) -> List:
+    """在推理工作线程中执行：一个填充批次的合成"""
+    from indextts.synthesis import get_cond_mel, synthesize_batch
+
+    cond_mel = get_cond_mel(tts, prompt_audio)
+    return synthesize_batch(tts, cond_mel, sentences, **generation_kwargs)
+
+
+def write_output(item: Dict, wavs: List) -> float:
+    """编码后先写临时文件并fsync，再原子重命名，中断时不会留下不完整的输出文件
+
+    Returns:
+        float: 音频时长（秒）
+    """
+    from indextts.synthesis import SAMPLING_RATE
+
+    output = item["output"]
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    encoded = encode_wavs(wavs, SAMPLING_RATE, item["format"], item["sample_rate"])
+    tmp_path = f"{output}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return sum(wav.shape[-1] for wav in wavs) / SAMPLING_RATE
+
+
+class BulkRun:
+    """按窗口执行清单：窗口内跨条目分桶，条目的分句全部完成后立即写出并记入日志"""
+
+    def __init__(self, pool: EnginePool, journal: Journal, batch_size: int, max_in_flight: int, total: int):
+        self.pool = pool
+        self.journal = journal
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+
+    def _progress(self) -> str:
+        return f"[{self.completed + self.failed}/{self.total}]"
+
+    def _fail(self, item: Dict, error: str):
+        self.failed += 1
+        self.journal.append({"id": item["id"], "status": "failed", "error": error})
+        print(f"❌ {self._progress()} {item['id']}: {error}")
+
+    def _finish(self, item: Dict, wavs: List):
+        try:
+            duration = write_output(item, wavs)
+        except Exception as e:
+            self._fail(item, f"写入失败: {str(e)}")
+            return
+        self.completed += 1
+        self.audio_seconds += duration
+        self.journal.append({"id": item["id"], "status": "done", "output": item["output"],
+                             "fingerprint": item["fingerprint"], "duration": round(duration, 3),
+                             "sentences": len(wavs)})
+        print(f"✅ {self._progress()} {item['id']} -> {item['output']} ({duration:.1f}s)")
+
+    def tokenize(self, items: List[Dict]) -> List[Dict]:
+        """对所有条目预先分词分句（只读分词器，在主线程中进行），返回分句非空的条目"""
+        from indextts.synthesis import split_text
+
+        tts = self.pool.tts
+        runnable = []
+        for item in items:
+            try:
+                item["sentences"] = split_text(tts, item["text"], item["max_tokens"])
+            except Exception as e:
+                self._fail(item, f"分词失败: {str(e)}")
+                continue
+            if item["sentences"]:
+                runnable.append(item)
+            else:
+                self._fail(item, "文本分句后为空")
+        return runnable
+
+    def run_window(self, runnable: List[Dict]):
+        """合成一个窗口内已分词的条目"""
+        if not runnable:
+            return
+
+        batches = plan_batches(runnable, self.batch_size)
+        wavs = [[None] * len(item["sentences"]) for item in runnable]
+        remaining = [len(item["sentences"]) for item in runnable]
+        failed = [False] * len(runnable)
+        pending = {}
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            while next_batch < len(batches) and len(pending) < self.max_in_flight:
+                prompt_audio, generation_kwargs, members = batches[next_batch]
+                sentences = [runnable[i]["sentences"][s] for i, s in members]
+                job = InferenceJob(synthesize_bucket, (prompt_audio, sentences, generation_kwargs),
+                                   cost=sum(len(sent) for sent in sentences), priority="batch")
+                try:
+                    future = self.pool.submit_job(job)
+                except QueueFullError:
+                    break
+                pending[future] = members
+                next_batch += 1
+            if not pending:
+                time.sleep(0.1)
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                members = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    for i in sorted({i for i, _ in members}):
+                        if not failed[i]:
+                            failed[i] = True
+                            wavs[i] = None
+                            self._fail(runnable[i], f"生成失败: {str(e)}")
+                    continue
+                for (i, s), wav in zip(members, results):
+                    if failed[i]:
+                        continue
+                    wavs[i][s] = wav
+                    remaining[i] -= 1
+                    if remaining[i] == 0:
+                        self._finish(runnable[i], wavs[i])
+                        wavs[i] = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量合成（可断点续跑）")
+    parser.add_argument("--manifest", type=str, required=True, help="JSONL manifest, one item per line")
+    parser.add_argument("--output_dir", type=str, default=os.path.join("outputs", "bulk"), help="Output directory for items without an explicit output path")
+    parser.add_argument("--journal", type=str, default=None, help="Completion journal (default: <manifest>.journal.jsonl)")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--voices_dir", type=str, default="voices", help="Voices directory")
+    parser.add_argument("--workers", type=int, default=1, help="Number of IndexTTS replicas synthesizing in parallel")
+    parser.add_argument("--devices", type=str, default=None, help="Comma separated devices for the replicas, e.g. cuda:0,cuda:1 or cpu (default: auto)")
+    parser.add_argument("--batch_size", type=int, default=8, help="Max number of sentences in one padded batch")
+    parser.add_argument("--window", type=int, default=0, help="Items bucketed together at a time (0 = whole manifest, densest batches). Whole-manifest bucketing keeps finished sentences in memory until each item's longest sentence is done; set e.g. 256 for bounded memory and earlier output at the cost of less dense batches")
+    parser.add_argument("--max_text_tokens_per_sentence", type=int, default=120, help="Default max tokens per sentence")
+    parser.add_argument("--format", type=str, default="wav", choices=list(AUDIO_FORMATS), help="Default output format for items without an output path")
+    parser.add_argument("--cond_cache_size", type=int, default=64, help="Number of speaker conditioning tensors kept in host memory")
+    args = parser.parse_args()
+
+    voice_manager = VoiceManager(args.voices_dir)
+    try:
+        items = load_manifest(args.manifest, args.output_dir, voice_manager, args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    journal = Journal(args.journal or f"{args.manifest}.journal.jsonl")
+    # 未完成和上次失败的条目都重新合成
+    pending_items = [item for item in items if not journal.is_done(item)]
+    print(f"清单共 {len(items)} 条，已完成 {len(items) - len(pending_items)} 条，待合成 {len(pending_items)} 条")
+    if not pending_items:
+        journal.close()
+        return
+
+    from indextts.cond_cache import CondMelCache
+    from indextts.synthesis import set_cond_mel_cache
+
+    engines = create_engines(args.model_dir, resolve_devices(args.workers, args.devices))
+    set_cond_mel_cache(CondMelCache(max_device_items=min(16, args.cond_cache_size), max_host_items=args.cond_cache_size))
+    # 每个副本保持两个批次在途，GPU不会等待主线程写文件
+    max_in_flight = 2 * len(engines)
+    pool = EnginePool(engines, max_queue_size=max_in_flight)
+
+    # 同一参考音频和生成参数的条目排在一起，窗口内的批次更满
+    pending_items.sort(key=group_key)
+    run = BulkRun(pool, journal, max(1, args.batch_size), max_in_flight, len(pending_items))
+    start_time = time.time()
+    try:
+        runnable = run.tokenize(pending_items)
+        print(f"分词完成: {len(runnable)} 条，{sum(len(item['sentences']) for item in runnable)} 个分句，"
+              f"耗时 {time.time() - start_time:.1f}s")
+        window = args.window if args.window > 0 else max(1, len(runnable))
+        for start in range(0, len(runnable), window):
+            run.run_window(runnable[start:start + window])
+    except KeyboardInterrupt:
+        print("⏹️ 已中断，已完成的条目记录在完成日志中，重新运行同一命令即可继续")
+    finally:
+        journal.close()
+        pool.shutdown(wait=False)
+
+    elapsed = time.time() - start_time
+    rtf = f"{elapsed / run.audio_seconds:.3f}" if run.audio_seconds else "-"
+    print(f"完成 {run.completed} 条，失败 {run.failed} 条，音频 {run.audio_seconds:.1f}s，耗时 {elapsed:.1f}s，RTF {rtf}")
+    if run.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
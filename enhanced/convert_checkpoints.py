@@ -0,0 +1,76 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, "indextts"))
+
+from indextts.checkpoint_loader import convert_checkpoint
+
+
+def measure_load(model_dir: str, device: str, use_safetensors: bool):
+    """在独立进程中加载一次模型，输出耗时和内存（JSON）"""
+    from indextts.engine_pool import create_engines
+    from indextts.prefork import memory_summary
+
+    start_time = time.time()
+    create_engines(model_dir, [device], use_safetensors=use_safetensors)
+    print(json.dumps({"seconds": round(time.time() - start_time, 2), "memory": memory_summary()}))
+
+
+def benchmark(model_dir: str, device: str):
+    """分别以 .pth 和 .safetensors 冷启动加载模型并对比"""
+    for mode in ("pth", "safetensors"):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--model_dir", model_dir, "--device", device,
+             "--measure_load", mode],
+            capture_output=True, text=True
+        )
+        lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+        if result.returncode != 0 or not lines:
+            print(f"❌ {mode} 加载失败:\n{result.stderr[-2000:]}")
+            continue
+        report = json.loads(lines[-1])
+        print(f"{mode:>12}: 加载耗时 {report['seconds']:.2f}s, 内存 {report['memory']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把模型checkpoint转换为可内存映射的safetensors")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--benchmark", action="store_true", default=False, help="Compare cold load time and memory of .pth and .safetensors after converting")
+    parser.add_argument("--device", type=str, default="cpu", help="Device used for the benchmark load")
+    parser.add_argument("--measure_load", type=str, default=None, choices=["pth", "safetensors"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load:
+        measure_load(args.model_dir, args.device, use_safetensors=args.measure_load == "safetensors")
+        return
+
+    checkpoints = sorted(glob.glob(os.path.join(args.model_dir, "*.pth")))
+    if not checkpoints:
+        print(f"{args.model_dir} 中没有 .pth 文件")
+        sys.exit(1)
+
+    for checkpoint_path in checkpoints:
+        start_time = time.time()
+        try:
+            info = convert_checkpoint(checkpoint_path)
+        except Exception as e:
+            print(f"❌ {checkpoint_path}: {str(e)}")
+            continue
+        print(f"✅ {checkpoint_path} -> {info['output']} ({info['tensors']} 个张量, {info['size_mb']}MB, "
+              f"{time.time() - start_time:.1f}s)")
+        if info["skipped"]:
+            print(f"   丢弃非张量字段: {', '.join(info['skipped'])}")
+
+    if args.benchmark:
+        benchmark(args.model_dir, args.device)
+
+
+if __name__ == "__main__":
+    main()
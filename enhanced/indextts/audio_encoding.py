@@ -0,0 +1,116 @@
+import io
+import os
+import re
+import uuid
+from typing import Optional
+
+# 支持的输出格式
+AUDIO_FORMATS = {
+    "wav": {"extension": "wav", "media_type": "audio/wav", "sf_format": "WAV", "subtype": "PCM_16"},
+    "flac": {"extension": "flac", "media_type": "audio/flac", "sf_format": "FLAC", "subtype": "PCM_16"},
+    "ogg-opus": {"extension": "opus", "media_type": "audio/ogg; codecs=opus", "sf_format": "OGG", "subtype": "OPUS"},
+    "mp3": {"extension": "mp3", "media_type": "audio/mpeg", "sf_format": "MP3", "subtype": "MPEG_LAYER_III"},
+    "pcm16": {"extension": "pcm", "media_type": "audio/L16", "sf_format": None, "subtype": None},
+}
+
+# Opus只支持这些采样率
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+# MPEG-1/2/2.5 Layer III 的标准采样率
+MP3_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+
+def validate_output_format(fmt: str, sample_rate: Optional[int] = None):
+    """检查输出格式和采样率
+
+    Raises:
+        ValueError: 不支持的格式或采样率
+    """
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"不支持的音频格式: {fmt}，可选: {', '.join(AUDIO_FORMATS)}")
+    if sample_rate is None:
+        return
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"采样率需在 {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} 之间")
+    if fmt == "ogg-opus" and sample_rate not in OPUS_SAMPLE_RATES:
+        raise ValueError(f"ogg-opus 只支持采样率: {', '.join(map(str, OPUS_SAMPLE_RATES))}")
+    if fmt == "mp3" and sample_rate not in MP3_SAMPLE_RATES:
+        raise ValueError(f"mp3 只支持采样率: {', '.join(map(str, MP3_SAMPLE_RATES))}")
+
+
+def media_type_for(fmt: str, sample_rate: int) -> str:
+    if fmt == "pcm16":
+        return f"audio/L16;rate={sample_rate};channels=1"
+    return AUDIO_FORMATS[fmt]["media_type"]
+
+
+def variant_filename(filename: str, fmt: str, sample_rate: int) -> str:
+    """编码变体的文件名，如 tts_xxx.wav -> tts_xxx.16000.mp3"""
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}.{sample_rate}.{AUDIO_FORMATS[fmt]['extension']}"
+
+
+def media_type_for_filename(filename: str) -> str:
+    """按扩展名推断Content-Type（裸PCM从文件名中的采样率推断）"""
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    for fmt, info in AUDIO_FORMATS.items():
+        if info["extension"] == extension:
+            if fmt == "pcm16":
+                match = re.search(r"\.(\d+)\.pcm$", filename)
+                return media_type_for(fmt, int(match.group(1))) if match else "audio/L16;channels=1"
+            return info["media_type"]
+    return "application/octet-stream"
+
+
+def encode_array(data, source_rate: int, fmt: str, sample_rate: Optional[int] = None) -> bytes:
+    """把单声道波形编码为指定格式
+
+    Args:
+        data: float32波形（numpy数组，范围[-1, 1]）
+        source_rate: 波形采样率
+        fmt: 输出格式
+        sample_rate: 输出采样率，默认不重采样
+
+    Returns:
+        bytes: 编码后的音频
+    """
+    import numpy as np
+    import soundfile as sf
+
+    sample_rate = sample_rate or source_rate
+    if sample_rate != source_rate:
+        import torch
+        import torchaudio
+
+        data = torchaudio.functional.resample(torch.from_numpy(np.ascontiguousarray(data)),
+                                              source_rate, sample_rate).numpy()
+
+    if fmt == "pcm16":
+        return (np.clip(data, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+    info = AUDIO_FORMATS[fmt]
+    buffer = io.BytesIO()
+    sf.write(buffer, data, sample_rate, format=info["sf_format"], subtype=info["subtype"])
+    return buffer.getvalue()
+
+
+def encode_wavs(wavs, source_rate: int, fmt: str, sample_rate: Optional[int] = None) -> bytes:
+    """拼接分句波形（int16量程的float张量 [1, N]）并直接编码到内存"""
+    import torch
+
+    data = (torch.cat(wavs, dim=1)[0] / 32767.0).float().numpy()
+    return encode_array(data, source_rate, fmt, sample_rate)
+
+
+def encode_file(source_path: str, output_path: str, fmt: str, sample_rate: Optional[int] = None) -> str:
+    """把wav文件编码为指定格式的文件（先写临时文件再原子重命名）"""
+    import soundfile as sf
+
+    data, source_rate = sf.read(source_path, dtype="float32")
+    encoded = encode_array(data, source_rate, fmt, sample_rate)
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encoded)
+    os.replace(tmp_path, output_path)
+    return output_path
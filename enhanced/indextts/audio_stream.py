@@ -0,0 +1,111 @@
+import asyncio
+import base64
+import json
+import struct
+import threading
+
+from indextts.synthesis import SAMPLING_RATE, stream_sentences, wav_to_pcm16
+
+# 流式输出格式对应的Content-Type
+STREAM_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "pcm": f"audio/L16;rate={SAMPLING_RATE};channels=1",
+    "sse": "text/event-stream",
+}
+
+
+def wav_stream_header(sample_rate: int = SAMPLING_RATE, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """生成流式wav头（数据长度未知，RIFF/data长度填0xFFFFFFFF）"""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    """编码一条Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class SentenceStream:
+    """逐句音频流 - 把推理线程产出的分句音频桥接到事件循环
+
+    推理线程调用 put/close，事件循环侧用 async for 消费；
+    消费方断开时调用 cancel，推理线程会在下一句开始前停止。
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._error = None
+        self.cancel_event = threading.Event()
+
+    def put(self, item):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def close(self, error: Exception = None):
+        self._error = error
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, self._CLOSED)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is self._CLOSED:
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        return item
+
+
+def run_stream_job(tts, stream: SentenceStream, prompt_audio_path: str, text: str,
+                   max_text_tokens_per_sentence: int = 120, **generation_kwargs):
+    """流式合成任务（在推理工作线程中执行），每句产出 (序号, 总数, PCM字节)"""
+    try:
+        for index, total, wav in stream_sentences(tts, prompt_audio_path, text, max_text_tokens_per_sentence,
+                                                  cancel_event=stream.cancel_event, **generation_kwargs):
+            stream.put((index, total, wav_to_pcm16(wav)))
+    except Exception as e:
+        stream.close(e)
+        raise
+    stream.close()
+
+
+async def iter_stream_body(stream: SentenceStream, stream_format: str, sample_rate: int = SAMPLING_RATE):
+    """StreamingResponse的响应体生成器"""
+    try:
+        if stream_format == "wav":
+            yield wav_stream_header(sample_rate)
+        sentences = 0
+        async for index, total, pcm in stream:
+            sentences = total
+            if stream_format == "sse":
+                yield sse_event("audio", {
+                    "index": index,
+                    "total": total,
+                    "sample_rate": sample_rate,
+                    "audio": base64.b64encode(pcm).decode("ascii"),
+                })
+            else:
+                yield pcm
+        if stream_format == "sse":
+            yield sse_event("done", {"sentences": sentences})
+    except Exception as e:
+        # 音频流已开始传输，无法再改状态码；SSE通过error事件告知客户端
+        if stream_format == "sse":
+            yield sse_event("error", {"message": f"生成失败: {str(e)}"})
+        else:
+            print(f"流式合成中断: {str(e)}")
+    finally:
+        stream.cancel()
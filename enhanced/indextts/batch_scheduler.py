@@ -0,0 +1,175 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import PRIORITY_CLASSES, InferenceJob
+from indextts.sentence_cache import synthesize_sentences_cached
+from indextts.synthesis import get_cond_mel, split_text
+from indextts.timings import activate
+
+
+class _PendingRequest:
+    __slots__ = ("prompt_audio_path", "text", "max_text_tokens_per_sentence", "generation_kwargs",
+                 "cost", "priority", "timings", "submit_time", "future")
+
+    def __init__(self, prompt_audio_path, text, max_text_tokens_per_sentence, generation_kwargs, cost, priority,
+                 timings=None):
+        self.prompt_audio_path = prompt_audio_path
+        self.text = text
+        self.max_text_tokens_per_sentence = max_text_tokens_per_sentence
+        self.generation_kwargs = generation_kwargs
+        self.cost = cost
+        self.priority = priority
+        self.timings = timings
+        self.submit_time = time.time()
+        self.future = Future()
+
+    def group_key(self):
+        return self.prompt_audio_path, tuple(sorted(self.generation_kwargs.items()))
+
+
+class BatchScheduler:
+    """跨请求动态批处理调度器
+
+    在一个短时间窗口内收集多个并发请求，按(参考音频, 生成参数)分组，
+    组内所有分句按token长度排序分桶，作为填充批次交给推理工作线程执行，
+    最后把生成的音频按分句拆回给各个请求。
+    """
+
+    def __init__(self, worker, window_ms: float = 30, max_batch_size: int = 8, max_pending: int = 64,
+                 sentence_cache=None):
+        self.worker = worker
+        self.sentence_cache = sentence_cache
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self._pending: List[_PendingRequest] = []
+        self._first_arrival = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._batches = 0
+        self._batched_requests = 0
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt_audio_path: str, text: str, max_text_tokens_per_sentence: int = 120,
+               cost: int = 1, priority: str = "normal", timings=None, **generation_kwargs) -> Future:
+        """提交一个合成请求
+
+        Args:
+            cost: 预估代价（token数），合并后的批次代价为各请求之和
+            priority: 优先级类别，批次取其中最高的优先级
+            timings: 可选的请求阶段计时，批次的合成耗时计入批内每个请求
+
+        Returns:
+            Future: 结果为按顺序排列的分句波形列表
+
+        Raises:
+            QueueFullError: 等待批处理的请求过多
+        """
+        request = _PendingRequest(prompt_audio_path, text, int(max_text_tokens_per_sentence), generation_kwargs,
+                                  cost, priority, timings)
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError(self.worker.estimate_retry_after())
+            if not self._pending:
+                self._first_arrival = time.time()
+            self._pending.append(request)
+            self._cond.notify()
+        return request.future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+                # 等待时间窗口结束，或攒够一个批次
+                deadline = self._first_arrival + self.window
+                while len(self._pending) < self.max_batch_size and not self._stopped:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                requests, self._pending = self._pending, []
+            self._dispatch(requests)
+
+    def _dispatch(self, requests: List[_PendingRequest]):
+        groups: Dict[tuple, List[_PendingRequest]] = {}
+        for request in requests:
+            groups.setdefault(request.group_key(), []).append(request)
+
+        for group in groups.values():
+            job = InferenceJob(self._run_group, (group,),
+                               cost=sum(request.cost for request in group),
+                               priority=min((request.priority for request in group), key=PRIORITY_CLASSES.get))
+            try:
+                self.worker.submit_job(job)
+            except QueueFullError as e:
+                for request in group:
+                    request.future.set_exception(e)
+                continue
+            self._batches += 1
+            self._batched_requests += len(group)
+
+    def _run_group(self, tts, group: List[_PendingRequest]):
+        """在推理工作线程中执行：分句、合并批量合成、按请求拆分结果"""
+        items = []
+        live = []
+        for request in group:
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if request.timings is not None:
+                # 包括批处理时间窗口内的等待
+                request.timings.add("queue", time.time() - request.submit_time)
+            try:
+                with activate(request.timings):
+                    sentences = split_text(tts, request.text, request.max_text_tokens_per_sentence)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+            if not sentences:
+                request.future.set_result([])
+                continue
+            live.append((request, len(sentences)))
+            items.extend(sentences)
+
+        if not items:
+            return
+
+        try:
+            with activate(*(request.timings for request, _ in live)):
+                cond_mel = get_cond_mel(tts, group[0].prompt_audio_path)
+                wavs = synthesize_sentences_cached(tts, cond_mel, items, self.sentence_cache,
+                                                   bucket_max_size=self.max_batch_size, **group[0].generation_kwargs)
+        except Exception as e:
+            for request, _ in live:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request, count in live:
+            request.future.set_result(wavs[offset:offset + count])
+            offset += count
+
+    def shutdown(self):
+        """停止调度线程（已收集的请求会先分发）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        """获取批处理统计"""
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_batch_size": self.max_batch_size,
+            "pending": pending,
+            "batches": self._batches,
+            "avg_requests_per_batch": round(self._batched_requests / self._batches, 2) if self._batches else 0,
+        }
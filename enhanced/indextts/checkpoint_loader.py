@@ -0,0 +1,125 @@
+import contextlib
+import inspect
+import os
+from typing import Dict, List, Optional
+
+SAFETENSORS_SUFFIX = ".safetensors"
+
+# 原checkpoint中包裹state_dict的键（如bigvgan的 {"generator": ...}），写在safetensors元数据里
+WRAP_KEY_METADATA = "wrap_key"
+
+
+def safetensors_path_for(checkpoint_path: str) -> str:
+    """checkpoint对应的safetensors文件路径（同目录同名）"""
+    return os.path.splitext(checkpoint_path)[0] + SAFETENSORS_SUFFIX
+
+
+def _find_state_dict(checkpoint) -> tuple:
+    """返回 (包裹键, state_dict)，checkpoint本身就是state_dict时包裹键为空"""
+    import torch
+
+    if isinstance(checkpoint, dict):
+        for key in ("model", "generator", "state_dict"):
+            if isinstance(checkpoint.get(key), dict):
+                return key, checkpoint[key]
+        if all(isinstance(v, torch.Tensor) for v in checkpoint.values()):
+            return "", checkpoint
+    raise ValueError("无法识别的checkpoint格式")
+
+
+def convert_checkpoint(checkpoint_path: str) -> Dict:
+    """把pickle格式的 .pth 转换为可内存映射的 .safetensors（一次性操作）
+
+    Returns:
+        Dict: 转换信息（输出路径、张量数、丢弃的非张量字段等）
+    """
+    import torch
+    from safetensors.torch import save_file
+
+    checkpoint = torch.load(checkpoint_path, map_location="cpu")
+    wrap_key, state_dict = _find_state_dict(checkpoint)
+
+    tensors = {}
+    skipped = []
+    for name, value in state_dict.items():
+        if isinstance(value, torch.Tensor):
+            # safetensors不允许共享存储的张量，逐个复制为独立的连续张量
+            tensors[name] = value.detach().contiguous().clone()
+        else:
+            skipped.append(name)
+
+    output_path = safetensors_path_for(checkpoint_path)
+    tmp_path = output_path + ".tmp"
+    save_file(tensors, tmp_path, metadata={"format": "pt", WRAP_KEY_METADATA: wrap_key})
+    os.replace(tmp_path, output_path)
+    return {
+        "source": checkpoint_path,
+        "output": output_path,
+        "tensors": len(tensors),
+        "skipped": skipped,
+        "wrap_key": wrap_key,
+        "size_mb": round(os.path.getsize(output_path) / 1024 / 1024, 1),
+    }
+
+
+def load_safetensors_checkpoint(path: str):
+    """按原checkpoint的结构读取safetensors（张量由文件内存映射而来）"""
+    from safetensors import safe_open
+    from safetensors.torch import load_file
+
+    with safe_open(path, framework="pt") as f:
+        metadata = f.metadata() or {}
+    state_dict = load_file(path, device="cpu")
+    wrap_key = metadata.get(WRAP_KEY_METADATA, "")
+    return {wrap_key: state_dict} if wrap_key else state_dict
+
+
+@contextlib.contextmanager
+def prefer_safetensors(loaded: Optional[List[str]] = None):
+    """在上下文内优先从safetensors加载checkpoint
+
+    IndexTTS内部用 torch.load 读取 gpt.pth / bigvgan_generator.pth 等文件，
+    这里临时替换 torch.load：同目录存在同名 .safetensors 时改为内存映射读取，
+    并让 load_state_dict 直接引用映射的张量（assign=True），不再复制一份权重。
+    多个进程加载同一份文件时共享页缓存。
+
+    Args:
+        loaded: 可选，记录实际从safetensors加载的文件
+    """
+    import torch
+
+    original_load = torch.load
+    original_load_state_dict = torch.nn.Module.load_state_dict
+    supports_assign = "assign" in inspect.signature(original_load_state_dict).parameters
+    mapped_ids = set()
+
+    def load(f, *args, **kwargs):
+        if isinstance(f, (str, os.PathLike)) and str(f).endswith(".pth"):
+            path = safetensors_path_for(str(f))
+            if os.path.exists(path):
+                checkpoint = load_safetensors_checkpoint(path)
+                mapped_ids.add(id(checkpoint))
+                mapped_ids.update(id(v) for v in checkpoint.values() if isinstance(v, dict))
+                if loaded is not None:
+                    loaded.append(path)
+                return checkpoint
+        return original_load(f, *args, **kwargs)
+
+    def load_state_dict(self, state_dict, *args, **kwargs):
+        if supports_assign and id(state_dict) in mapped_ids:
+            kwargs.setdefault("assign", True)
+        return original_load_state_dict(self, state_dict, *args, **kwargs)
+
+    torch.load = load
+    torch.nn.Module.load_state_dict = load_state_dict
+    try:
+        yield
+    finally:
+        torch.load = original_load
+        torch.nn.Module.load_state_dict = original_load_state_dict
+
+
+def has_checkpoint(model_dir: str, filename: str) -> bool:
+    """checkpoint文件存在（.pth 或转换后的 .safetensors 任一即可）"""
+    path = os.path.join(model_dir, filename)
+    return os.path.exists(path) or (path.endswith(".pth") and os.path.exists(safetensors_path_for(path)))
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import torch
+
+from indextts.synthesis import compute_cond_mel
+from indextts.voice_manager import cond_mel_path_for
+
+
+def save_cond_mel(audio_path: str) -> str:
+    """计算参考音频的条件mel并保存到音频旁边
+
+    Returns:
+        str: 条件mel文件路径
+    """
+    path = cond_mel_path_for(audio_path)
+    cond_mel = compute_cond_mel(audio_path)
+    tmp_path = path + ".tmp"
+    torch.save(cond_mel, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class CondMelCache:
+    """说话人条件mel的分级LRU缓存：设备显存/内存 -> 锁页主机内存 -> 磁盘
+
+    命中设备层时只是一次字典查找；主机层命中时异步拷贝到设备；
+    都未命中时读取保存音色时预计算的 .cond_mel.pt，没有则现场计算。
+    缓存键包含音频文件的修改时间和大小，同一路径的音色被删除重建（包括在其它进程中）后不会命中旧结果。
+    """
+
+    def __init__(self, max_device_items: int = 16, max_host_items: int = 64):
+        self.max_device_items = max_device_items
+        self.max_host_items = max_host_items
+        self._device: "OrderedDict[tuple, torch.Tensor]" = OrderedDict()  # (设备, 音频路径, 文件戳) -> 张量
+        self._host: "OrderedDict[tuple, torch.Tensor]" = OrderedDict()  # (音频路径, 文件戳) -> CPU张量
+        self._lock = threading.Lock()
+        self._hits = {"device": 0, "host": 0, "disk": 0, "computed": 0}
+
+    @staticmethod
+    def _stamp(audio_path: str) -> tuple:
+        try:
+            stat = os.stat(audio_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None, None
+
+    @staticmethod
+    def _load(audio_path: str) -> tuple:
+        path = cond_mel_path_for(audio_path)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(audio_path):
+            try:
+                return torch.load(path, map_location="cpu"), "disk"
+            except Exception as e:
+                print(f"读取条件mel失败 {path}: {str(e)}")
+        return compute_cond_mel(audio_path), "computed"
+
+    def get(self, audio_path: str, device) -> torch.Tensor:
+        """获取参考音频在指定设备上的条件mel"""
+        device = torch.device(device)
+        host_key = (audio_path, self._stamp(audio_path))
+        key = (str(device),) + host_key
+        with self._lock:
+            cond_mel = self._device.get(key)
+            if cond_mel is not None:
+                self._device.move_to_end(key)
+                self._hits["device"] += 1
+                return cond_mel
+            host_mel = self._host.get(host_key)
+            if host_mel is not None:
+                self._host.move_to_end(host_key)
+                self._hits["host"] += 1
+
+        if host_mel is None:
+            host_mel, tier = self._load(audio_path)
+            if device.type == "cuda":
+                host_mel = host_mel.pin_memory()
+            with self._lock:
+                self._hits[tier] += 1
+                # 同一路径旧文件的结果不会再命中，直接移除
+                self._remove(audio_path)
+                self._host[host_key] = host_mel
+                while len(self._host) > self.max_host_items:
+                    self._host.popitem(last=False)
+
+        if device.type == "cpu":
+            # CPU推理时主机层即设备层
+            return host_mel
+
+        cond_mel = host_mel.to(device, non_blocking=True)
+        with self._lock:
+            self._device[key] = cond_mel
+            while len(self._device) > self.max_device_items:
+                self._device.popitem(last=False)
+        return cond_mel
+
+    def _remove(self, audio_path: str):
+        for key in [key for key in self._host if key[0] == audio_path]:
+            del self._host[key]
+        for key in [key for key in self._device if key[1] == audio_path]:
+            del self._device[key]
+
+    def invalidate(self, audio_path: str):
+        """音色删除或更新后移除缓存"""
+        with self._lock:
+            self._remove(audio_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "device_items": len(self._device),
+                "host_items": len(self._host),
+                "max_device_items": self.max_device_items,
+                "max_host_items": self.max_host_items,
+                "hits": dict(self._hits),
+            }
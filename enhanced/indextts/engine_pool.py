@@ -0,0 +1,153 @@
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from indextts.inference_worker import InferenceWorker, QueueFullError
+from indextts.request_queue import POLICY_FIFO, InferenceJob
+
+
+def resolve_devices(pool_size: int = 1, devices: Optional[str] = None) -> List[str]:
+    """确定每个副本使用的设备
+
+    Args:
+        pool_size: 副本数量
+        devices: 逗号分隔的设备列表，如 "cuda:0,cuda:1" 或 "cpu"；不足pool_size时循环使用。
+            为空时自动选择：有GPU则轮流分配到各GPU，否则全部使用CPU
+
+    Returns:
+        List[str]: 每个副本的设备
+    """
+    if devices:
+        device_list = [d.strip() for d in devices.split(",") if d.strip()]
+    else:
+        import torch
+        if torch.cuda.is_available():
+            device_list = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+        else:
+            device_list = ["cpu"]
+    return [device_list[i % len(device_list)] for i in range(max(1, pool_size))]
+
+
+def create_engines(model_dir: str, devices: List[str], use_safetensors: bool = True) -> List:
+    """按设备列表加载IndexTTS副本
+
+    Args:
+        use_safetensors: 同目录存在转换后的 .safetensors 时优先以内存映射方式加载
+    """
+    from indextts.infer import IndexTTS
+    from indextts.checkpoint_loader import prefer_safetensors
+    from indextts.prefork import memory_summary
+    from indextts.synthesis import instrument_engine
+
+    print(f"加载前内存: {memory_summary()}")
+    engines = []
+    for i, device in enumerate(devices):
+        print(f"正在加载模型副本 {i + 1}/{len(devices)} ({device})...")
+        loaded = []
+        start_time = time.time()
+        with prefer_safetensors(loaded) if use_safetensors else contextlib.nullcontext():
+            tts = IndexTTS(model_dir=model_dir, cfg_path=os.path.join(model_dir, "config.yaml"), device=device)
+        engines.append(instrument_engine(tts))
+        source = "safetensors" if loaded else "pth"
+        print(f"模型副本 {i + 1} 加载完成 ({source})，耗时 {time.time() - start_time:.2f}s，内存: {memory_summary()}")
+    return engines
+
+
+class EnginePool:
+    """多副本推理引擎池 - 每个IndexTTS副本由一个推理工作线程独占
+
+    提交的任务分发给未完成工作最少的副本；对外接口与InferenceWorker一致，
+    批处理调度器、流式接口和异步任务可以直接使用。
+    """
+
+    def __init__(self, engines: List, max_queue_size: int = 8, cpu_threads: Optional[int] = None,
+                 policy: str = POLICY_FIFO, aging: float = 20.0):
+        """
+        Args:
+            engines: IndexTTS副本列表
+            max_queue_size: 每个副本的最大排队任务数
+            cpu_threads: 每个CPU副本的torch线程数，默认平分CPU核数
+            policy: 各副本队列的调度策略 fifo / sjf / priority
+            aging: sjf策略下每等待1秒抵扣的token数
+        """
+        cpu_replicas = sum(1 for tts in engines if str(tts.device).startswith("cpu"))
+        if cpu_threads is None and cpu_replicas > 1:
+            cpu_threads = max(1, (os.cpu_count() or 1) // cpu_replicas)
+
+        self.workers = []
+        for i, tts in enumerate(engines):
+            thread_init = None
+            if cpu_threads and str(tts.device).startswith("cpu"):
+                thread_init = self._make_thread_init(cpu_threads)
+            self.workers.append(InferenceWorker(tts, max_queue_size=max_queue_size,
+                                                name=f"inference-worker-{i}", thread_init=thread_init,
+                                                policy=policy, aging=aging))
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    @staticmethod
+    def _make_thread_init(num_threads: int) -> Callable[[], None]:
+        def thread_init():
+            import torch
+            # OpenMP线程数按调用线程生效，需要在工作线程内设置
+            torch.set_num_threads(num_threads)
+        return thread_init
+
+    @property
+    def tts(self):
+        """第一个副本（用于读取分词器、配置等只读信息）"""
+        return self.workers[0].tts
+
+    @property
+    def max_queue_size(self) -> int:
+        return sum(worker.max_queue_size for worker in self.workers)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """提交任务（默认代价与优先级）到未完成工作最少的副本
+
+        Raises:
+            QueueFullError: 所有副本的队列都已满
+        """
+        return self.submit_job(InferenceJob(func, args, kwargs))
+
+    def submit_job(self, job: InferenceJob) -> Future:
+        """按未完成任务的预估代价之和选择副本
+
+        Raises:
+            QueueFullError: 所有副本的队列都已满（整个池只计一次拒绝）
+        """
+        for worker in sorted(self.workers, key=lambda w: (w.outstanding_cost(), w.outstanding())):
+            future = worker.try_submit_job(job)
+            if future is not None:
+                return future
+        with self._lock:
+            self._rejected += 1
+        raise QueueFullError(self.estimate_retry_after())
+
+    def outstanding(self) -> int:
+        return sum(worker.outstanding() for worker in self.workers)
+
+    def estimate_retry_after(self) -> int:
+        return min(worker.estimate_retry_after() for worker in self.workers)
+
+    def shutdown(self, wait: bool = True):
+        for worker in self.workers:
+            worker.shutdown(wait=wait)
+
+    def queued_jobs(self) -> List[Dict]:
+        """各副本排队中的任务（按调度顺序）"""
+        return [{"name": worker.name, "jobs": worker.queued_jobs()} for worker in self.workers]
+
+    def stats(self) -> Dict:
+        """获取各副本的队列状态"""
+        replicas = [worker.stats() for worker in self.workers]
+        return {
+            "pool_size": len(replicas),
+            "queue_size": sum(r["queue_size"] for r in replicas),
+            "max_queue_size": self.max_queue_size,
+            "rejected": self._rejected,
+            "replicas": replicas,
+        }
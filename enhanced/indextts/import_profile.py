@@ -0,0 +1,73 @@
+import builtins
+import sys
+import threading
+import time
+from typing import Dict, List
+
+
+class ImportProfiler:
+    """导入耗时分析 - 类似 python -X importtime，记录每个模块导入的累计耗时和自身耗时
+
+    用法:
+        with ImportProfiler() as profiler:
+            import torch
+        print(profiler.format_report())
+
+    只统计进入上下文的线程中首次导入的模块，其它线程的导入不受影响。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.records: List[Dict] = []
+        self._stack: List[float] = []
+        self._thread_id = None
+        self._original_import = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread_id = threading.get_ident()
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+        return False
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules or threading.get_ident() != self._thread_id:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        depth = len(self._stack)
+        self._stack.append(0.0)
+        start_time = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.append({
+                "module": name,
+                "cumulative": round(elapsed, 4),
+                "self": round(elapsed - children, 4),
+                "depth": depth,
+            })
+
+    def top(self, n: int = 20) -> List[Dict]:
+        """累计耗时最多的前N个模块"""
+        return sorted(self.records, key=lambda r: r["cumulative"], reverse=True)[:n]
+
+    def total_seconds(self) -> float:
+        return round(sum(r["cumulative"] for r in self.records if r["depth"] == 0), 4)
+
+    def format_report(self, n: int = 20) -> str:
+        lines = [f"导入耗时 {self.total_seconds():.2f}s（按累计耗时排序）",
+                 f"{'cumulative':>10} | {'self':>8} | module"]
+        for record in self.top(n):
+            lines.append(f"{record['cumulative']:>10.3f} | {record['self']:>8.3f} | "
+                         f"{'  ' * record['depth']}{record['module']}")
+        return "\n".join(lines)
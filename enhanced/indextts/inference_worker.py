@@ -0,0 +1,179 @@
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from indextts.metrics import INFERENCE_SECONDS, QUEUE_WAIT_SECONDS
+from indextts.request_queue import POLICY_FIFO, PRIORITY_CLASSES, InferenceJob, RequestQueue
+from indextts.timings import activate
+
+
+class QueueFullError(Exception):
+    """推理队列已满"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"推理队列已满，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class InferenceWorker:
+    """推理工作线程 - 独占IndexTTS实例，通过有界队列串行执行推理任务
+
+    事件循环只负责提交任务并等待Future，阻塞的推理在专用线程中执行，
+    因此 /api/voices、/api/status 等控制面接口不会被长请求卡住。
+    """
+
+    def __init__(self, tts, max_queue_size: int = 8, name: str = "inference-worker",
+                 thread_init: Callable[[], None] = None, policy: str = POLICY_FIFO, aging: float = 20.0):
+        self.tts = tts
+        self.name = name
+        self._thread_init = thread_init
+        self.max_queue_size = max_queue_size
+        self._queue = RequestQueue(maxsize=max_queue_size, policy=policy, aging=aging)
+        self._lock = threading.Lock()
+        self._current: InferenceJob = None
+        self._avg_job_seconds = 0.0
+        self._avg_wait_seconds = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """提交推理任务（默认代价与优先级）
+
+        Args:
+            func: 任务函数，调用方式为 func(tts, *args, **kwargs)
+
+        Returns:
+            Future: 任务结果
+
+        Raises:
+            QueueFullError: 队列已满
+        """
+        return self.submit_job(InferenceJob(func, args, kwargs))
+
+    def submit_job(self, job: InferenceJob) -> Future:
+        """提交带代价和优先级的推理任务
+
+        Raises:
+            QueueFullError: 队列已满
+        """
+        future = self.try_submit_job(job)
+        if future is None:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(self.estimate_retry_after())
+        return future
+
+    def try_submit_job(self, job: InferenceJob):
+        """尝试提交任务，队列已满时返回None（不计入拒绝次数，由调用方决定是否换副本重试）"""
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            return None
+        return job.future
+
+    @property
+    def _busy(self) -> bool:
+        return self._current is not None
+
+    def outstanding(self) -> int:
+        """未完成的任务数（排队中+执行中）"""
+        return self._queue.qsize() + (1 if self._busy else 0)
+
+    def outstanding_cost(self) -> int:
+        """未完成任务的预估代价之和"""
+        current = self._current
+        return self._queue.total_cost() + (current.cost if current is not None else 0)
+
+    def estimate_retry_after(self) -> int:
+        """根据平均任务耗时估算客户端重试等待秒数"""
+        avg = self._avg_job_seconds or 1.0
+        return max(1, min(300, math.ceil(avg * max(self.outstanding(), 1))))
+
+    def _run(self):
+        if self._thread_init is not None:
+            try:
+                self._thread_init()
+            except Exception as e:
+                print(f"{self.name} 线程初始化失败: {str(e)}")
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            self._current = job
+            start_time = time.time()
+            waited = start_time - job.enqueue_time
+            if job.timings is not None:
+                job.timings.add("queue", waited)
+            try:
+                with activate(job.timings):
+                    result = job.func(self.tts, *job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+                ok = False
+            else:
+                job.future.set_result(result)
+                ok = True
+            finally:
+                self._current = None
+
+            elapsed = time.time() - start_time
+            QUEUE_WAIT_SECONDS.labels(job.priority).observe(waited)
+            INFERENCE_SECONDS.observe(elapsed)
+            with self._lock:
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                # 指数滑动平均，用于估算Retry-After
+                if self._avg_job_seconds == 0:
+                    self._avg_job_seconds = elapsed
+                else:
+                    self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+                avg_wait = self._avg_wait_seconds[job.priority]
+                self._avg_wait_seconds[job.priority] = waited if avg_wait == 0 else 0.8 * avg_wait + 0.2 * waited
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程（已入队的任务会先执行完）"""
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def queued_jobs(self) -> List[Dict]:
+        """按调度顺序列出排队中的任务（排队位置指标）"""
+        now = time.time()
+        return [
+            {
+                "position": position,
+                "priority": job.priority,
+                "cost": job.cost,
+                "waited": round(job.waited(now), 3),
+            }
+            for position, job in enumerate(self._queue.snapshot(), start=1)
+        ]
+
+    def stats(self) -> Dict:
+        """获取队列状态"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "device": str(getattr(self.tts, "device", "")),
+                "policy": self._queue.policy,
+                "queue_size": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "busy": self._busy,
+                "outstanding_cost": self.outstanding_cost(),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_job_seconds": round(self._avg_job_seconds, 3),
+                "avg_wait_seconds": {k: round(v, 3) for k, v in self._avg_wait_seconds.items()},
+            }
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from indextts.audio_encoding import encode_file, variant_filename
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import InferenceJob
+from indextts.sentence_cache import synthesize_sentences_cached
+from indextts.synthesis import GENERATION_DEFAULTS, SAMPLING_RATE, get_cond_mel, save_wav, split_text
+
+# 任务结果目录，不在 outputs/api 的结果缓存磁盘配额内，任务完成后结果不会被淘汰
+JOBS_OUTPUT_DIR = os.path.join("outputs", "jobs")
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobStore:
+    """异步任务存储 - 使用本地SQLite持久化，服务重启后排队中的任务不会丢失"""
+
+    def __init__(self, db_path: str = os.path.join("outputs", "jobs", "jobs.db")):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    created_time REAL NOT NULL,
+                    started_time REAL,
+                    finished_time REAL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    result_url TEXT,
+                    message TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, created_time)")
+
+    def _row_to_job(self, row) -> Dict:
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        return job
+
+    def create_job(self, request: Dict) -> Dict:
+        """新建排队任务
+
+        Args:
+            request: TTS请求参数
+
+        Returns:
+            Dict: 任务信息
+        """
+        job_id = str(uuid.uuid4())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, state, request, created_time) VALUES (?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(request, ensure_ascii=False), time.time())
+            )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取任务信息，不存在返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, state: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """按创建时间倒序列出任务"""
+        with self._lock:
+            if state:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY created_time DESC LIMIT ?", (state, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs ORDER BY created_time DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def next_queued(self) -> Optional[Dict]:
+        """获取最早的排队任务"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY created_time LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def count(self, state: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)).fetchone()[0]
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id: str):
+        self._update(job_id, state=JOB_RUNNING, started_time=time.time(), progress=0)
+
+    def update_progress(self, job_id: str, progress: int, total: int):
+        self._update(job_id, progress=progress, total=total)
+
+    def mark_done(self, job_id: str, result_url: str):
+        self._update(job_id, state=JOB_DONE, finished_time=time.time(), result_url=result_url, message="生成成功")
+
+    def mark_failed(self, job_id: str, message: str):
+        self._update(job_id, state=JOB_FAILED, finished_time=time.time(), message=message)
+
+    def requeue_interrupted(self) -> int:
+        """服务重启时把上次中断的运行中任务重新放回队列"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, progress = 0 WHERE state = ?", (JOB_QUEUED, JOB_RUNNING)
+            )
+        return cursor.rowcount
+
+
+class JobRunner:
+    """异步任务执行器 - 按提交顺序逐个把排队任务交给推理工作线程"""
+
+    def __init__(self, store: JobStore, worker, voice_manager, output_dir: str = JOBS_OUTPUT_DIR,
+                 poll_interval: float = 1.0, sentence_cache=None):
+        self.store = store
+        self.sentence_cache = sentence_cache
+        self.worker = worker
+        self.voice_manager = voice_manager
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        recovered = store.requeue_interrupted()
+        if recovered:
+            print(f"恢复了 {recovered} 个中断的任务")
+        self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """有新任务入队时唤醒执行器"""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            job = self.store.next_queued()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                # 异步任务默认使用batch优先级，不抢占交互式请求
+                future = self.worker.submit_job(InferenceJob(self._run_job, (job["id"], job["request"]),
+                                                             cost=len(job["request"]["text"]),
+                                                             priority=job["request"].get("priority", "batch")))
+            except QueueFullError as e:
+                # 推理队列繁忙，让出给交互式请求
+                time.sleep(min(e.retry_after, 5))
+                continue
+
+            try:
+                future.result()
+            except Exception as e:
+                self.store.mark_failed(job["id"], f"生成失败: {str(e)}")
+
+    def _run_job(self, tts, job_id: str, request: Dict):
+        """在推理工作线程中执行：逐批合成并记录分句进度"""
+        self.store.mark_running(job_id)
+        audio_path = self.voice_manager.get_voice_audio_path(request["voice_name"])
+        if not audio_path:
+            raise ValueError(f"音色 '{request['voice_name']}' 不存在")
+
+        generation_kwargs = {k: request[k] for k in GENERATION_DEFAULTS if k in request}
+        bucket_size = 1 if request.get("infer_mode", "普通推理") == "普通推理" else \
+            int(request.get("sentences_bucket_max_size", 4))
+
+        sentences = split_text(tts, request["text"], request.get("max_text_tokens_per_sentence", 120))
+        if not sentences:
+            raise ValueError("请输入文本内容")
+        self.store.update_progress(job_id, 0, len(sentences))
+
+        cond_mel = get_cond_mel(tts, audio_path)
+        wavs = []
+        for start in range(0, len(sentences), bucket_size):
+            chunk = sentences[start:start + bucket_size]
+            wavs.extend(synthesize_sentences_cached(tts, cond_mel, chunk, self.sentence_cache,
+                                                    bucket_max_size=bucket_size, **generation_kwargs))
+            self.store.update_progress(job_id, len(wavs), len(sentences))
+
+        wav_path = save_wav(wavs, os.path.join(self.output_dir, f"tts_{job_id}.wav"))
+        filename = job_result_filename(job_id, request)
+        if filename != os.path.basename(wav_path):
+            encode_file(wav_path, os.path.join(self.output_dir, filename), request.get("format") or "wav",
+                        request.get("sample_rate") or SAMPLING_RATE)
+        self.store.mark_done(job_id, f"/api/jobs/{job_id}/audio")
+
+
+def job_result_filename(job_id: str, request: Dict) -> str:
+    """任务结果的文件名（按请求的格式和采样率）"""
+    filename = f"tts_{job_id}.wav"
+    fmt = request.get("format") or "wav"
+    sample_rate = request.get("sample_rate") or SAMPLING_RATE
+    if fmt != "wav" or sample_rate != SAMPLING_RATE:
+        filename = variant_filename(filename, fmt, sample_rate)
+    return filename
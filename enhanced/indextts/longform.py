@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from indextts.longform_io import WavAppender, iter_paragraphs
+from indextts.sentence_cache import synthesize_sentences_cached
+from indextts.synthesis import SAMPLING_RATE, generation_params, get_cond_mel, split_text, wav_to_pcm16
+
+def progress_path_for(output_path: str) -> str:
+    return f"{output_path}.progress.json"
+
+
+def index_path_for(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + ".index.jsonl"
+
+
+def _fingerprint(input_path: str, prompt_audio: str, max_text_tokens_per_sentence: int,
+                 generation_kwargs: Dict) -> str:
+    """输入文本内容和合成参数的指纹，任一变化时不能续跑"""
+    digest = hashlib.sha256()
+    with open(input_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(json.dumps([os.path.abspath(prompt_audio), int(max_text_tokens_per_sentence),
+                              generation_params(generation_kwargs)], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_progress(output_path: str, fingerprint: str) -> Optional[Dict]:
+    """读取与当前输入匹配、且音频和索引文件都完整的进度"""
+    try:
+        with open(progress_path_for(output_path), "r", encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if progress.get("fingerprint") != fingerprint:
+        return None
+    try:
+        if (os.path.getsize(output_path) < WavAppender.HEADER_SIZE + progress["samples"] * 2
+                or os.path.getsize(index_path_for(output_path)) < progress["index_offset"]):
+            return None
+    except OSError:
+        return None
+    return progress
+
+
+def _save_progress(output_path: str, progress: Dict):
+    path = progress_path_for(output_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def sentence_text(tokens) -> str:
+    """分句token还原为（规范化后的）文本，用于时间戳索引"""
+    return "".join(tokens).replace("▁", " ").strip()
+
+
+def synthesize_longform(tts, prompt_audio: str, input_path: str, output_path: str,
+                        max_text_tokens_per_sentence: int = 120, bucket_max_size: int = 4, resume: bool = True,
+                        cache=None, progress_callback: Callable[[Dict], None] = None, **generation_kwargs) -> Dict:
+    """长文本（有声书）合成：逐段读取、分句、合成并追加写入WAV，内存占用与文本长度无关
+
+    - 音频按批次追加写入，每段结束时回填WAV头、落盘并保存进度（<output>.progress.json）
+    - 同时写出分句时间戳索引（<output>.index.jsonl，每行一个分句的起止秒数和文本）
+    - 输入文本和参数不变时，再次调用从上次完成的段落之后继续
+
+    Args:
+        tts: IndexTTS实例
+        prompt_audio: 参考音频路径
+        input_path: UTF-8文本文件，每个非空行为一段
+        output_path: 输出WAV路径
+        bucket_max_size: 每批合成的分句数
+        resume: 是否从已有进度继续
+        cache: 可选的分句缓存（indextts.sentence_cache.SentenceCache）
+        progress_callback: 每段完成后以进度字典调用
+
+    Returns:
+        Dict: 进度（段落数、分句数、时长等）
+    """
+    bucket_max_size = max(1, int(bucket_max_size))
+    fingerprint = _fingerprint(input_path, prompt_audio, max_text_tokens_per_sentence, generation_kwargs)
+    progress = _load_progress(output_path, fingerprint) if resume else None
+    if progress and progress.get("complete"):
+        return dict(progress, duration=progress["samples"] / SAMPLING_RATE, elapsed=0.0)
+
+    index_path = index_path_for(output_path)
+    if progress:
+        writer = WavAppender(output_path, SAMPLING_RATE, resume_samples=progress["samples"])
+        index_file = open(index_path, "r+b")
+        index_file.truncate(progress["index_offset"])
+        index_file.seek(0, os.SEEK_END)
+    else:
+        progress = {
+            "fingerprint": fingerprint,
+            "input": os.path.abspath(input_path),
+            "input_size": os.path.getsize(input_path),
+            "input_offset": 0,
+            "paragraphs": 0,
+            "sentences": 0,
+            "samples": 0,
+            "index_offset": 0,
+            "complete": False,
+        }
+        writer = WavAppender(output_path, SAMPLING_RATE)
+        index_file = open(index_path, "wb")
+
+    start_time = time.time()
+    cond_mel = get_cond_mel(tts, prompt_audio)
+    try:
+        with open(input_path, "rb") as f:
+            for text, offset in iter_paragraphs(f, progress["input_offset"]):
+                sentences = split_text(tts, text, max_text_tokens_per_sentence)
+                for start in range(0, len(sentences), bucket_max_size):
+                    chunk = sentences[start:start + bucket_max_size]
+                    wavs = synthesize_sentences_cached(tts, cond_mel, chunk, cache,
+                                                       bucket_max_size=bucket_max_size, **generation_kwargs)
+                    for sent, wav in zip(chunk, wavs):
+                        begin = writer.duration
+                        writer.write_pcm(wav_to_pcm16(wav))
+                        record = {"paragraph": progress["paragraphs"], "sentence": progress["sentences"],
+                                  "start": round(begin, 3), "end": round(writer.duration, 3),
+                                  "text": sentence_text(sent)}
+                        index_file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                        progress["sentences"] += 1
+                    del wavs
+
+                # 段落结束：先让音频和索引落盘，再记录进度
+                writer.checkpoint()
+                index_file.flush()
+                os.fsync(index_file.fileno())
+                progress.update(input_offset=offset, paragraphs=progress["paragraphs"] + 1,
+                                samples=writer.samples, index_offset=index_file.tell())
+                _save_progress(output_path, progress)
+                if progress_callback:
+                    progress_callback(dict(progress, duration=writer.duration,
+                                           elapsed=time.time() - start_time))
+    finally:
+        writer.close()
+        index_file.close()
+
+    progress["complete"] = True
+    _save_progress(output_path, progress)
+    return dict(progress, duration=writer.duration, elapsed=time.time() - start_time)
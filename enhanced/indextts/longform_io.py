@@ -0,0 +1,106 @@
+import os
+import struct
+from typing import Iterator, Optional, Tuple
+
+# 单个段落最多读取的字节数，超长的行在句末标点处切开，内存占用与输入文本大小无关
+MAX_PARAGRAPH_BYTES = 16 * 1024
+
+# 切开超长行时可用的句末标点
+SENTENCE_ENDS = ("。", "！", "？", "；", "…", ".", "!", "?", ";")
+
+# 与 synthesis.SAMPLING_RATE 相同，这里不导入synthesis以免带上torch
+SAMPLING_RATE = 24000
+
+# WAV数据块的长度字段是32位
+MAX_WAV_DATA_BYTES = 0xFFFFFFFF - 36
+
+
+def _cut_at_sentence_end(chunk: bytes) -> bytes:
+    """截掉被readline上限切断的不完整UTF-8字符，并尽量在最后一个句末标点处切开"""
+    for end in range(len(chunk), max(0, len(chunk) - 4), -1):
+        try:
+            text = chunk[:end].decode("utf-8")
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        # 中间就有非法字节，不再细分
+        return chunk
+    cut = max(text.rfind(p) for p in SENTENCE_ENDS)
+    if cut >= 0:
+        text = text[:cut + 1]
+    return text.encode("utf-8")
+
+
+def iter_paragraphs(f, start_offset: int = 0, max_bytes: int = MAX_PARAGRAPH_BYTES) -> Iterator[Tuple[str, int]]:
+    """从以二进制方式打开的UTF-8文本中逐段读取，每个非空行为一段
+
+    Yields:
+        Tuple[str, int]: (段落文本, 段落结束处的字节偏移)，偏移可用于断点续跑
+    """
+    f.seek(start_offset)
+    while True:
+        position = f.tell()
+        line = f.readline(max_bytes)
+        if not line:
+            return
+        if len(line) == max_bytes and not line.endswith(b"\n"):
+            line = _cut_at_sentence_end(line)
+            f.seek(position + len(line))
+        if position == 0 and line.startswith(b"\xef\xbb\xbf"):
+            line = line[3:]
+        text = line.decode("utf-8", errors="replace").strip()
+        if text:
+            yield text, f.tell()
+
+
+class WavAppender:
+    """边合成边追加写入的16位单声道WAV文件
+
+    头部的长度字段在每次checkpoint()和close()时回填，中途崩溃后文件仍是合法的WAV（截止到上次checkpoint）；
+    续跑时截断到上次checkpoint的位置继续追加。
+    """
+
+    HEADER_SIZE = 44
+
+    def __init__(self, path: str, sample_rate: int = SAMPLING_RATE, resume_samples: Optional[int] = None):
+        self.path = path
+        self.sample_rate = sample_rate
+        if resume_samples is None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "wb")
+            self._file.write(self._header(0))
+            self.samples = 0
+        else:
+            self._file = open(path, "r+b")
+            self._file.truncate(self.HEADER_SIZE + resume_samples * 2)
+            self._file.seek(0, os.SEEK_END)
+            self.samples = resume_samples
+
+    def _header(self, data_bytes: int) -> bytes:
+        return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+                           self.sample_rate, self.sample_rate * 2, 2, 16, b"data", data_bytes)
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+    def write_pcm(self, pcm: bytes):
+        """追加一段16位小端PCM（synthesis.wav_to_pcm16 的结果）"""
+        if (self.samples * 2 + len(pcm)) > MAX_WAV_DATA_BYTES:
+            raise ValueError("音频超过WAV文件的4GB上限，请拆分输入文本")
+        self._file.write(pcm)
+        self.samples += len(pcm) // 2
+
+    def checkpoint(self):
+        """回填头部长度并落盘"""
+        self._file.seek(0)
+        self._file.write(self._header(self.samples * 2))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self._file.close()
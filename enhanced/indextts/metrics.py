@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# 多进程模式：prometheus_client 在导入时读取该环境变量，各进程的指标写入目录中的mmap文件，输出时汇总
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+
+# 服务指标使用独立的注册表，不输出 prometheus_client 默认的进程/平台指标
+REGISTRY = CollectorRegistry()
+
+REQUESTS = Counter("tts_requests_total", "TTS请求数（按接口和结果）", ["endpoint", "outcome"], registry=REGISTRY)
+REQUEST_SECONDS = Histogram("tts_request_duration_seconds", "TTS请求端到端耗时（流式接口为发送完最后一块数据的耗时）",
+                            ["endpoint"], buckets=LATENCY_BUCKETS, registry=REGISTRY)
+QUEUE_WAIT_SECONDS = Histogram("tts_queue_wait_seconds", "推理任务排队等待时间", ["priority"],
+                               buckets=LATENCY_BUCKETS, registry=REGISTRY)
+INFERENCE_SECONDS = Histogram("tts_inference_seconds", "推理任务在工作线程中的执行耗时",
+                              buckets=LATENCY_BUCKETS, registry=REGISTRY)
+# 多进程模式下瞬时值只统计存活进程：live* 模式在进程退出并 mark_process_dead 后不再输出
+QUEUE_DEPTH = Gauge("tts_queue_depth", "各推理副本排队中的任务数", ["replica"],
+                    multiprocess_mode="livesum", registry=REGISTRY)
+QUEUE_BUSY = Gauge("tts_replica_busy", "推理副本是否正在执行任务", ["replica"],
+                   multiprocess_mode="livesum", registry=REGISTRY)
+BATCH_PENDING = Gauge("tts_batch_pending", "等待合并批处理的请求数", multiprocess_mode="livesum", registry=REGISTRY)
+
+SYNTHESIS_SECONDS = Counter("tts_synthesis_seconds_total", "GPT解码+声码累计耗时", registry=REGISTRY)
+AUDIO_SECONDS = Counter("tts_audio_seconds_total", "累计合成的音频时长", registry=REGISTRY)
+REAL_TIME_FACTOR = Histogram("tts_real_time_factor", "实时率（合成耗时/音频时长）", buckets=RTF_BUCKETS, registry=REGISTRY)
+SENTENCES = Counter("tts_sentences_total", "合成的分句数", registry=REGISTRY)
+TOKENS = Counter("tts_tokens_total", "合成的文本token数", registry=REGISTRY)
+
+CACHE_HITS = Counter("tts_cache_hits_total", "缓存命中次数", ["cache"], registry=REGISTRY)
+CACHE_MISSES = Counter("tts_cache_misses_total", "缓存未命中次数", ["cache"], registry=REGISTRY)
+CACHE_HIT_RATIO = Gauge("tts_cache_hit_ratio", "缓存命中率", ["cache"], multiprocess_mode="liveall", registry=REGISTRY)
+CACHE_BYTES = Gauge("tts_cache_bytes", "缓存占用字节数", ["cache"], multiprocess_mode="liveall", registry=REGISTRY)
+
+PROCESS_RSS = Gauge("process_resident_memory_bytes", "进程常驻内存", multiprocess_mode="liveall", registry=REGISTRY)
+DEVICE_MEMORY_ALLOCATED = Gauge("tts_device_memory_allocated_bytes", "GPU已分配显存", ["device"],
+                                multiprocess_mode="liveall", registry=REGISTRY)
+DEVICE_MEMORY_RESERVED = Gauge("tts_device_memory_reserved_bytes", "GPU缓存分配器保留的显存", ["device"],
+                               multiprocess_mode="liveall", registry=REGISTRY)
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get(MULTIPROC_DIR_ENV) or None
+
+
+def render() -> bytes:
+    """Prometheus文本格式；多进程模式下汇总目录中所有进程的指标"""
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead(pid: int):
+    """工作进程退出后由父进程调用，删除它的 live* 仪表盘文件（计数器和直方图保留）"""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+def start_collector(collect: Callable[[], None], interval: float = 1.0):
+    """在后台线程中定期同步由组件自身维护的统计
+
+    多进程模式下 /metrics 只由其中一个工作进程应答，其它进程的队列、缓存等统计靠这个线程写入共享目录。
+    在每个工作进程启动后调用（线程不能跨fork）。
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️ 同步指标失败: {e}")
+
+    threading.Thread(target=run, daemon=True, name="metrics-collector").start()
+
+
+def observe_synthesis(seconds: float, audio_seconds: float, sentences: int = 0, tokens: int = 0):
+    """记录一次合成的耗时、音频时长和处理量"""
+    SYNTHESIS_SECONDS.inc(seconds)
+    AUDIO_SECONDS.inc(audio_seconds)
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.observe(seconds / audio_seconds)
+    SENTENCES.inc(sentences)
+    TOKENS.inc(tokens)
+
+
+# 缓存自身维护的是累计命中数，计数器只能增加：记录上次同步的值，每次只累加增量
+_synced_counts: Dict[Tuple[str, str], float] = {}
+_synced_lock = threading.Lock()
+
+
+def _sync_counter(counter: Counter, kind: str, name: str, value: float):
+    with _synced_lock:
+        previous = _synced_counts.get((kind, name), 0)
+        _synced_counts[(kind, name)] = value
+    # 缓存被清空重建后统计从0开始，不产生负增量
+    if value > previous:
+        counter.labels(name).inc(value - previous)
+
+
+def update_cache_metrics(name: str, hits: int, misses: int, size_bytes: Optional[int] = None):
+    """同步缓存自身维护的命中统计"""
+    _sync_counter(CACHE_HITS, "hits", name, hits)
+    _sync_counter(CACHE_MISSES, "misses", name, misses)
+    lookups = hits + misses
+    CACHE_HIT_RATIO.labels(name).set(hits / lookups if lookups else 0)
+    if size_bytes is not None:
+        CACHE_BYTES.labels(name).set(size_bytes)
+
+
+def update_memory_metrics():
+    """读取进程RSS和各GPU显存（未加载torch时跳过显存）"""
+    try:
+        with open("/proc/self/statm") as f:
+            PROCESS_RSS.set(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        pass
+
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return
+    for index in range(torch.cuda.device_count()):
+        device = f"cuda:{index}"
+        DEVICE_MEMORY_ALLOCATED.labels(device).set(torch.cuda.memory_allocated(index))
+        DEVICE_MEMORY_RESERVED.labels(device).set(torch.cuda.memory_reserved(index))
+
+
+def update_queue_metrics(engine_pool, batch_scheduler=None):
+    """同步各推理副本的队列深度"""
+    if engine_pool is not None:
+        for replica in engine_pool.stats()["replicas"]:
+            QUEUE_DEPTH.labels(replica["name"]).set(replica["queue_size"])
+            QUEUE_BUSY.labels(replica["name"]).set(1 if replica["busy"] else 0)
+    if batch_scheduler is not None:
+        BATCH_PENDING.set(batch_scheduler.stats()["pending"])
@@ -0,0 +1,130 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Optional
+
+
+def _bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def memory_summary() -> str:
+    """读取当前进程的RSS/PSS（PSS按共享页平摊，更能反映写时复制的效果）"""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Private_Dirty"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return "n/a"
+    return ", ".join(f"{k}={v:.0f}MB" for k, v in values.items())
+
+
+def _run_child(app, sock: socket.socket, worker_index: int, threads_per_worker: int, log_level: str,
+               on_worker_start: Optional[Callable[[int], None]]):
+    import torch
+    import uvicorn
+
+    # 子进程恢复默认信号处理，由uvicorn接管
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    torch.set_num_threads(threads_per_worker)
+    # 各子进程使用不同的随机种子，避免采样结果完全一致
+    torch.manual_seed(int(time.time()) + os.getpid())
+
+    if on_worker_start is not None:
+        on_worker_start(worker_index)
+
+    print(f"[worker {worker_index}] pid={os.getpid()} torch_threads={threads_per_worker} "
+          f"memory: {memory_summary()}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve_prefork(app, host: str, port: int, workers: int, threads_per_worker: Optional[int] = None,
+                  log_level: str = "info", on_worker_start: Optional[Callable[[int], None]] = None,
+                  on_worker_exit: Optional[Callable[[int], None]] = None):
+    """预派生多进程服务
+
+    父进程已经加载好模型，在这里绑定监听socket后fork出N个子进程。
+    模型权重页在子进程之间写时复制共享，所有子进程在同一个socket上accept，
+    由内核在子进程之间分配连接。子进程意外退出时会自动重新派生。
+
+    注意：CUDA上下文不能跨fork使用，此模式仅适用于CPU推理。
+
+    Args:
+        app: ASGI应用
+        workers: 子进程数量
+        threads_per_worker: 每个子进程的torch线程数，默认平分CPU核数
+        on_worker_start: 子进程启动后的回调（参数为子进程序号），用于创建线程等不能跨fork的组件
+        on_worker_exit: 父进程中子进程退出后的回调（参数为子进程pid），用于清理该进程留下的状态
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    sock = _bind_socket(host, port)
+    print(f"父进程内存: {memory_summary()}")
+
+    # 冻结现有对象，避免子进程中的GC改写对象头导致权重所在页被复制
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    shutting_down = False
+
+    def spawn(worker_index: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_child(app, sock, worker_index, threads_per_worker, log_level, on_worker_start)
+            finally:
+                os._exit(0)
+        children[pid] = worker_index
+
+    def handle_shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, handle_shutdown)
+    signal.signal(signal.SIGTERM, handle_shutdown)
+
+    for worker_index in range(workers):
+        spawn(worker_index)
+    print(f"🧩 预派生 {workers} 个工作进程，每个进程 {threads_per_worker} 个torch线程")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_index = children.pop(pid, None)
+        if worker_index is None:
+            continue
+        if on_worker_exit is not None:
+            on_worker_exit(pid)
+        if shutting_down:
+            continue
+        print(f"⚠️ 工作进程 {worker_index} (pid={pid}) 退出，状态码 {status}，重新派生", file=sys.stderr)
+        time.sleep(1)
+        spawn(worker_index)
+
+    sock.close()
@@ -0,0 +1,132 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+# 调度策略
+POLICY_FIFO = "fifo"
+POLICY_SJF = "sjf"
+POLICY_PRIORITY = "priority"
+SCHEDULE_POLICIES = (POLICY_FIFO, POLICY_SJF, POLICY_PRIORITY)
+
+# 优先级类别（数值越小越优先）
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "normal": 1,
+    "batch": 2,
+}
+
+
+class InferenceJob:
+    """推理任务
+
+    Args:
+        func: 任务函数，调用方式为 func(tts, *args, **kwargs)
+        cost: 预估代价（文本token数），用于短作业优先调度
+        priority: 优先级类别 interactive / normal / batch
+        timings: 可选的请求阶段计时（indextts.timings.StageTimings），执行期间激活
+    """
+
+    _seq = itertools.count()
+
+    def __init__(self, func: Callable, args: tuple = (), kwargs: Dict = None, cost: int = 1,
+                 priority: str = "normal", timings=None):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"未知的优先级: {priority}")
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.cost = max(1, int(cost))
+        self.priority = priority
+        self.timings = timings
+        self.future = Future()
+        self.seq = next(self._seq)
+        self.enqueue_time = time.time()
+
+    def waited(self, now: float = None) -> float:
+        return (now or time.time()) - self.enqueue_time
+
+
+class RequestQueue:
+    """可配置调度策略的有界请求队列
+
+    - fifo: 先到先服务
+    - sjf: 短作业优先，按 代价 - 等待秒数*aging 排序，等待越久越靠前，避免长请求饿死
+    - priority: 按请求的优先级类别排序，同类别内先到先服务
+
+    队列长度有限（通常几十个），出队时线性扫描即可。
+    """
+
+    def __init__(self, maxsize: int = 8, policy: str = POLICY_FIFO, aging: float = 20.0):
+        """
+        Args:
+            maxsize: 最大排队任务数
+            policy: 调度策略
+            aging: sjf策略下每等待1秒抵扣的token数
+        """
+        if policy not in SCHEDULE_POLICIES:
+            raise ValueError(f"未知的调度策略: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.aging = aging
+        self._jobs: List[InferenceJob] = []
+        self._cond = threading.Condition()
+
+    def _sort_key(self, job: InferenceJob, now: float):
+        if self.policy == POLICY_SJF:
+            return job.cost - job.waited(now) * self.aging, job.seq
+        if self.policy == POLICY_PRIORITY:
+            return PRIORITY_CLASSES[job.priority], job.seq
+        return job.seq
+
+    def put_nowait(self, job):
+        """入队，队列已满时抛出queue.Full"""
+        with self._cond:
+            if len(self._jobs) >= self.maxsize:
+                raise queue.Full
+            self._jobs.append(job)
+            self._cond.notify()
+
+    def put(self, job):
+        """不受长度限制地入队（用于停止信号）"""
+        with self._cond:
+            self._jobs.append(job)
+            self._cond.notify()
+
+    def get(self):
+        """按调度策略取出下一个任务（阻塞）"""
+        with self._cond:
+            while not self._jobs:
+                self._cond.wait()
+            # 停止信号(None)总是排在最后
+            candidates = [job for job in self._jobs if job is not None]
+            if not candidates:
+                return self._jobs.pop(0)
+            now = time.time()
+            job = min(candidates, key=lambda j: self._sort_key(j, now))
+            self._jobs.remove(job)
+            return job
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def total_cost(self) -> int:
+        with self._cond:
+            return sum(job.cost for job in self._jobs if job is not None)
+
+    def snapshot(self) -> List[InferenceJob]:
+        """按当前调度顺序返回排队中的任务"""
+        with self._cond:
+            now = time.time()
+            jobs = [job for job in self._jobs if job is not None]
+            return sorted(jobs, key=lambda j: self._sort_key(j, now))
+
+
+def estimate_cost(tts, text: str) -> int:
+    """用分词后的token数估算请求代价（与合成共用文本前端缓存）"""
+    from indextts.synthesis import tokenize_text
+
+    return len(tokenize_text(tts, text))
@@ -0,0 +1,249 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+# 结果文件按内容的SHA-256命名（<sha256>.wav、<sha256>.16000.mp3），同名文件内容永不变化，可以永久缓存；
+# 请求缓存键和编码变体通过同目录下的小引用文件（<逻辑文件名>.ref，内容为文件名）指向内容文件
+REF_SUFFIX = ".ref"
+_CONTENT_FILENAME = re.compile(r"([0-9a-f]{64})(\.\d+)?\.[0-9a-z]+")
+
+
+def content_hash(path: str) -> str:
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_filename(digest: str, name: str) -> str:
+    """按内容哈希命名，保留逻辑文件名中的采样率和扩展名（tts_key.16000.mp3 -> <sha256>.16000.mp3）"""
+    return f"{digest}.{name.split('.', 1)[1]}"
+
+
+def content_digest_of(filename: str) -> Optional[str]:
+    """按内容哈希命名的文件返回其中的哈希，其它文件返回None"""
+    match = _CONTENT_FILENAME.fullmatch(filename)
+    return match.group(1) if match else None
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本用于缓存键：全半角统一、合并空白"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class ResultCache:
+    """整请求结果缓存 - 内容寻址，内存LRU索引 + 磁盘wav文件，按字节配额淘汰
+
+    缓存目录即音频输出目录（outputs/api），目录内所有文件（含各编码格式的变体和引用文件）都计入配额。
+    结果文件按内容哈希命名，可直接通过 /api/audio/{filename} 访问并永久缓存；
+    缓存键 tts_<key>.wav 通过引用文件 tts_<key>.wav.ref 指向内容文件，任一方被淘汰都按未命中处理。
+    """
+
+    def __init__(self, cache_dir: str = os.path.join("outputs", "api"), max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # 文件名 -> 字节数，按最近访问排序
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.scan()
+
+    @staticmethod
+    def make_key(text: str, voice_hash: str, params: Dict) -> str:
+        """由规范化文本、音色音频哈希和全部生成参数计算缓存键"""
+        payload = json.dumps({
+            "text": normalize_text(text),
+            "voice": voice_hash,
+            "params": params,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]
+
+    @staticmethod
+    def filename_for(key: str) -> str:
+        return f"tts_{key}.wav"
+
+    def scan(self) -> int:
+        """把目录中尚未索引的音频文件纳入索引（按修改时间作为最近访问顺序）
+
+        Returns:
+            int: 新纳入的文件数
+        """
+        files = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*")):
+            if path.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, os.path.basename(path), stat.st_size))
+        files.sort()
+
+        adopted = 0
+        with self._lock:
+            known = set(self._index)
+            # 从最新的开始逐个插到最前面，最旧的文件最终排在LRU队首，最先被淘汰
+            for _, filename, size in reversed(files):
+                if filename in known:
+                    continue
+                self._index[filename] = size
+                self._index.move_to_end(filename, last=False)
+                self._total_bytes += size
+                adopted += 1
+        return adopted
+
+    def _forget(self, filename: str):
+        with self._lock:
+            self._total_bytes -= self._index.pop(filename, 0)
+
+    def _touch(self, path: str):
+        # 多进程模式下其它进程生成的文件也在同一目录，直接纳入索引
+        self.add_file(path)
+        try:
+            # 更新mtime，重启后仍能保持LRU顺序
+            os.utime(path)
+        except OSError:
+            pass
+
+    def lookup(self, name: str) -> Optional[str]:
+        """按逻辑文件名查找内容文件，找到时刷新引用文件和内容文件的最近访问时间
+
+        Returns:
+            str: 内容文件路径，引用不存在或内容文件已被淘汰时返回None
+        """
+        ref_path = os.path.join(self.cache_dir, name + REF_SUFFIX)
+        try:
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                filename = f.read().strip()
+        except OSError:
+            self._forget(name + REF_SUFFIX)
+            return None
+        path = os.path.join(self.cache_dir, filename)
+        if content_digest_of(filename) is None or not os.path.isfile(path):
+            # 内容文件已被淘汰，引用失效
+            try:
+                os.remove(ref_path)
+            except OSError:
+                pass
+            self._forget(name + REF_SUFFIX)
+            return None
+        self._touch(ref_path)
+        self._touch(path)
+        return path
+
+    def store(self, output_path: str, name: Optional[str] = None) -> str:
+        """把新生成的文件按内容哈希重命名（同目录内原子重命名）并登记到缓存
+
+        Args:
+            output_path: 新生成的文件
+            name: 可选的逻辑文件名，写入引用文件以便之后用 lookup(name) 找到；默认取output_path的文件名
+
+        Returns:
+            str: 内容文件路径
+        """
+        digest = content_hash(output_path)
+        filename = content_filename(digest, name or os.path.basename(output_path))
+        path = os.path.join(self.cache_dir, filename)
+        os.replace(output_path, path)
+        self.add_file(path)
+        if name:
+            ref_path = os.path.join(self.cache_dir, name + REF_SUFFIX)
+            tmp_path = f"{ref_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(filename)
+            os.replace(tmp_path, ref_path)
+            self.add_file(ref_path)
+        self.enforce_quota()
+        return path
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，命中返回内容文件路径并刷新最近访问时间"""
+        path = self.lookup(self.filename_for(key))
+        with self._lock:
+            if path:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return path
+
+    def put(self, key: str, output_path: str) -> str:
+        """把新生成的音频登记到缓存（按内容哈希命名，缓存键通过引用文件指向它）
+
+        Returns:
+            str: 缓存中的文件路径
+        """
+        return self.store(output_path, self.filename_for(key))
+
+    def add_file(self, path: str):
+        """登记目录中的一个文件（如异步任务的输出），计入配额"""
+        filename = os.path.basename(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._index.get(filename, 0)
+            self._index[filename] = size
+            self._index.move_to_end(filename)
+
+    def enforce_quota(self, max_age: Optional[float] = None) -> int:
+        """按LRU淘汰超出配额的文件
+
+        Args:
+            max_age: 可选，同时删除超过该秒数未被访问的文件
+
+        Returns:
+            int: 删除的文件数
+        """
+        now = time.time()
+        to_delete = []
+        with self._lock:
+            while self._index and self._total_bytes > self.max_bytes:
+                filename, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                to_delete.append(filename)
+            if max_age is not None:
+                for filename in list(self._index):
+                    path = os.path.join(self.cache_dir, filename)
+                    try:
+                        expired = now - os.path.getmtime(path) > max_age
+                    except OSError:
+                        expired = True
+                    if not expired:
+                        # 索引按访问顺序排列，后面的都更新
+                        break
+                    self._total_bytes -= self._index.pop(filename)
+                    to_delete.append(filename)
+            self._evicted += len(to_delete)
+
+        for filename in to_delete:
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+        return len(to_delete)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "files": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0,
+                "evicted": self._evicted,
+            }
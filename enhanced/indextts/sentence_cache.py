@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from indextts.synthesis import generation_params, get_cond_mel, split_text, synthesize_sentences
+
+
+class SentenceCache:
+    """分句级合成缓存 - 按(音色, 分句token, 采样参数)缓存分句波形，跨请求共享
+
+    模板化通知等只有个别分句不同的请求，命中的分句直接复用波形，
+    跳过GPT解码和声码。内存中按字节配额做LRU淘汰。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # 键 -> (波形, 合成耗时秒数)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def voice_key(cond_mel) -> str:
+        """由条件mel内容计算音色键（与参考音频文件名无关）"""
+        return hashlib.sha1(cond_mel.detach().float().cpu().numpy().tobytes()).hexdigest()
+
+    @staticmethod
+    def make_key(voice_key: str, tokens: List[str], generation_kwargs: Dict) -> str:
+        payload = json.dumps([voice_key, tokens, generation_params(generation_kwargs)],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """查询分句波形，未命中返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._saved_seconds += entry[1]
+            return entry[0]
+
+    def put(self, key: str, wav, seconds: float):
+        """缓存分句波形
+
+        Args:
+            seconds: 合成该分句的耗时，命中时计入节省的时间
+        """
+        size = wav.element_size() * wav.nelement()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[0].element_size() * old[0].nelement()
+            self._entries[key] = (wav, seconds)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.element_size() * evicted.nelement()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0,
+                "saved_seconds": round(self._saved_seconds, 3),
+            }
+
+
+def synthesize_sentences_cached(tts, cond_mel, sentences: List[List[str]], cache: Optional[SentenceCache],
+                                bucket_max_size: int = 1, **generation_kwargs) -> List:
+    """带分句缓存的批量合成：只合成未命中的分句，结果按输入顺序返回"""
+    if cache is None:
+        return synthesize_sentences(tts, cond_mel, sentences, bucket_max_size=bucket_max_size, **generation_kwargs)
+
+    voice_key = SentenceCache.voice_key(cond_mel)
+    keys = [SentenceCache.make_key(voice_key, sent, generation_kwargs) for sent in sentences]
+    results = [cache.get(key) for key in keys]
+
+    # 同一请求内重复的分句只合成一次
+    missing: Dict[str, List[int]] = {}
+    for i, wav in enumerate(results):
+        if wav is None:
+            missing.setdefault(keys[i], []).append(i)
+    if not missing:
+        return results
+
+    firsts = [idxs[0] for idxs in missing.values()]
+    start_time = time.time()
+    wavs = synthesize_sentences(tts, cond_mel, [sentences[i] for i in firsts], bucket_max_size=bucket_max_size,
+                                **generation_kwargs)
+    seconds_per_sentence = (time.time() - start_time) / len(firsts)
+
+    for (key, idxs), wav in zip(missing.items(), wavs):
+        cache.put(key, wav, seconds_per_sentence)
+        for i in idxs:
+            results[i] = wav
+    return results
+
+
+def synthesize_text(tts, prompt_audio_path: str, text: str, max_text_tokens_per_sentence: int = 120,
+                    bucket_max_size: int = 1, cache: Optional[SentenceCache] = None, **generation_kwargs) -> List:
+    """分句并合成整段文本，返回按顺序排列的分句波形（留在内存中，不写文件）"""
+    sentences = split_text(tts, text, max_text_tokens_per_sentence)
+    cond_mel = get_cond_mel(tts, prompt_audio_path)
+    return synthesize_sentences_cached(tts, cond_mel, sentences, cache, bucket_max_size=bucket_max_size,
+                                       **generation_kwargs)
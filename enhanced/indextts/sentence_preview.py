@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+
+class SentencePreview:
+    """WebUI分句预览 - 防抖、按段落记忆分词结果，并缓存 (文本, 分句Token数) 的预览结果
+
+    输入框每次变化只重新分词改动过的段落，其余段落直接复用token；
+    来回拖动分句滑块时命中结果缓存，不再分词。
+    预览按段落分词后拼接再分句，段落边界处可能与整段合成时的分句略有差异。
+    """
+
+    def __init__(self, tokenizer, max_paragraphs: int = 4096, max_results: int = 64, debounce: float = 0.3):
+        """
+        Args:
+            tokenizer: IndexTTS的文本分词器
+            max_paragraphs: 段落分词记忆的最大条数
+            max_results: 预览结果缓存的最大条数
+            debounce: 防抖间隔（秒），间隔内的更新调用会使之前的调用作废
+        """
+        self.tokenizer = tokenizer
+        self.max_paragraphs = max_paragraphs
+        self.max_results = max_results
+        self.debounce = debounce
+        self._paragraphs: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._results: "OrderedDict[Tuple[str, int], List[List[str]]]" = OrderedDict()
+        self._latest: Dict[str, int] = {}  # 会话 -> 最新调用序号
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def is_cached(self, text: str, max_tokens: int) -> bool:
+        with self._lock:
+            return (text, int(max_tokens)) in self._results
+
+    def wait_latest(self, session: str) -> bool:
+        """登记一次调用并等待防抖间隔
+
+        Returns:
+            bool: 期间同一会话没有更新的调用（本次需要计算预览）
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._latest[session] = seq
+        if self.debounce > 0:
+            time.sleep(self.debounce)
+        with self._lock:
+            if self._latest.get(session) != seq:
+                return False
+            del self._latest[session]
+            return True
+
+    def _tokenize_paragraph(self, paragraph: str) -> List[str]:
+        with self._lock:
+            tokens = self._paragraphs.get(paragraph)
+            if tokens is not None:
+                self._paragraphs.move_to_end(paragraph)
+                return tokens
+        tokens = self.tokenizer.tokenize(paragraph)
+        with self._lock:
+            self._paragraphs[paragraph] = tokens
+            while len(self._paragraphs) > self.max_paragraphs:
+                self._paragraphs.popitem(last=False)
+        return tokens
+
+    def split(self, text: str, max_tokens: int) -> List[List[str]]:
+        """分句预览（分句token列表）"""
+        key = (text, int(max_tokens))
+        with self._lock:
+            sentences = self._results.get(key)
+            if sentences is not None:
+                self._results.move_to_end(key)
+                return sentences
+
+        tokens = []
+        for paragraph in text.split("\n"):
+            if paragraph.strip():
+                tokens.extend(self._tokenize_paragraph(paragraph))
+        sentences = self.tokenizer.split_sentences(tokens, max_tokens_per_sentence=int(max_tokens)) if tokens else []
+
+        with self._lock:
+            self._results[key] = sentences
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return sentences
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+from indextts.result_cache import content_digest_of
+
+CHUNK_SIZE = 256 * 1024
+
+# 其它文件（异步任务结果、旧版本按请求参数命名的文件）的同名文件可能被重新生成，
+# 客户端可以缓存，但每次使用前都要用ETag重新验证
+CACHE_CONTROL = "public, no-cache"
+# 按内容哈希命名的文件内容永不变化，客户端和CDN可以永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# ETag按 (路径, mtime, 大小) 缓存，文件都是原子替换写入的，内容变化时mtime必然变化
+MAX_ETAG_ENTRIES = 4096
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def file_etag(path: str, st: os.stat_result) -> str:
+    """文件内容的强ETag（sha256前32位）"""
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+        if etag:
+            _etag_cache.move_to_end(key)
+            return etag
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+
+    with _etag_lock:
+        _etag_cache[key] = etag
+        while len(_etag_cache) > MAX_ETAG_ENTRIES:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 比较（弱比较，忽略 W/ 前缀）"""
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个字节范围，返回 (起始, 结束)（闭区间）
+
+    格式不合法或包含多个范围时返回None（按完整文件响应）
+
+    Raises:
+        ValueError: 范围无法满足（应返回416）
+    """
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.group(1), match.group(2)
+    if not start:
+        # 后缀范围 bytes=-N：最后N个字节
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError("范围无法满足")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("范围无法满足")
+    return start, min(end, size - 1)
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def cache_control_for(filename: str, etag: str) -> str:
+    """文件名中的内容哈希与文件内容一致时返回immutable，否则要求重新验证"""
+    digest = content_digest_of(filename)
+    if digest and etag == f'"{digest[:32]}"':
+        return IMMUTABLE_CACHE_CONTROL
+    return CACHE_CONTROL
+
+
+class AudioFileResponse(Response):
+    """分块读取并发送文件的一段字节（Range请求；完整文件用 FileResponse 发送）"""
+
+    def __init__(self, path: str, status_code: int, headers: dict, media_type: str,
+                 offset: int, count: int, send_body: bool = True):
+        self.path = path
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.offset = offset
+        self.count = count
+        self.send_body = send_body
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        remaining = self.count
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.offset)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # 文件在发送过程中被截断
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def audio_file_response(request: Request, path: str, filename: str, media_type: str) -> Optional[Response]:
+    """返回音频文件，支持 Range/206、ETag/If-None-Match/304 和 HEAD
+
+    按内容哈希命名的文件返回immutable缓存头，其它文件要求客户端每次用If-None-Match重新验证，文件未变时返回304。
+    完整文件交给 Starlette FileResponse 发送，服务器支持时走 pathsend/sendfile 零拷贝。
+
+    Returns:
+        Response: 文件不存在时返回None
+    """
+    try:
+        st = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    etag = await anyio.to_thread.run_sync(file_etag, path, st)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control_for(os.path.basename(path), etag),
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = content_disposition(filename)
+    send_body = request.method != "HEAD"
+    size = st.st_size
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "ETag": etag})
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return AudioFileResponse(path, 206, headers, media_type, start, end - start + 1, send_body)
+
+    headers["Content-Length"] = str(size)
+    # FileResponse 对HEAD只发送响应头；stat_result 已经取过，不再重复stat
+    return FileResponse(path, status_code=200, headers=headers, media_type=media_type, stat_result=st)
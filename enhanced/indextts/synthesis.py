@@ -0,0 +1,326 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import torch
+import torchaudio
+
+from indextts.metrics import observe_synthesis
+from indextts.text_cache import install_tokenizer_cache
+from indextts.timings import hook_stage, is_active, stage, wrap_stage
+from indextts.utils.feature_extractors import MelSpectrogramFeatures
+
+# IndexTTS 输出采样率
+SAMPLING_RATE = 24000
+
+# 与 IndexTTS.infer 一致的生成参数默认值
+GENERATION_DEFAULTS = {
+    "do_sample": True,
+    "top_p": 0.8,
+    "top_k": 30,
+    "temperature": 1.0,
+    "length_penalty": 0.0,
+    "num_beams": 3,
+    "repetition_penalty": 10.0,
+    "max_mel_tokens": 600,
+}
+
+
+def compute_cond_mel(audio_path: str) -> torch.Tensor:
+    """从参考音频计算条件mel（与IndexTTS.infer相同的预处理）
+
+    Args:
+        audio_path: 参考音频路径
+
+    Returns:
+        torch.Tensor: CPU上的条件mel [1, 100, T]
+    """
+    audio, sr = torchaudio.load(audio_path)
+    audio = torch.mean(audio, dim=0, keepdim=True)
+    audio = torchaudio.transforms.Resample(sr, SAMPLING_RATE)(audio)
+    return MelSpectrogramFeatures()(audio)
+
+
+# 可选的共享条件mel缓存（indextts.cond_cache.CondMelCache），由服务启动时设置
+_cond_mel_cache = None
+
+
+def set_cond_mel_cache(cache):
+    """设置共享的条件mel缓存，之后get_cond_mel优先从中读取"""
+    global _cond_mel_cache
+    _cond_mel_cache = cache
+
+
+def get_cond_mel(tts, audio_path: str) -> torch.Tensor:
+    """获取参考音频的条件mel，参考音频未变化时复用IndexTTS自带的缓存
+
+    结果同时写入IndexTTS自带的缓存，随后调用tts.infer也不会重新计算。
+    设置了共享缓存时每次都经过共享缓存（设备层命中只是一次字典查找），
+    音色删除重建后IndexTTS按路径判断的缓存不会返回旧结果。
+    """
+    with stage("cond"):
+        if _cond_mel_cache is not None:
+            tts.cache_cond_mel = _cond_mel_cache.get(audio_path, tts.device)
+            tts.cache_audio_prompt = audio_path
+        elif tts.cache_cond_mel is None or tts.cache_audio_prompt != audio_path:
+            tts.cache_cond_mel = compute_cond_mel(audio_path).to(tts.device)
+            tts.cache_audio_prompt = audio_path
+        return tts.cache_cond_mel
+
+
+# 可选的文本前端缓存（indextts.text_cache.TextFrontendCache），由服务启动时设置
+_text_cache = None
+
+
+def set_text_cache(cache):
+    """设置共享的文本前端缓存，instrument_engine 装到各副本分词器上的缓存随之生效"""
+    global _text_cache
+    _text_cache = cache
+
+
+def get_text_cache():
+    return _text_cache
+
+
+def tokenize_text(tts, text: str) -> List[str]:
+    """文本规范化并分词（设置了文本前端缓存时分词器直接复用之前的结果）"""
+    return tts.tokenizer.tokenize(text)
+
+
+def split_text(tts, text: str, max_text_tokens_per_sentence: int = 120) -> List[List[str]]:
+    """文本规范化、分词并分句（与IndexTTS.infer相同的分句方式）"""
+    with stage("tokenize"):
+        text_tokens_list = tts.tokenizer.tokenize(text)
+        return tts.tokenizer.split_sentences(text_tokens_list,
+                                             max_tokens_per_sentence=int(max_text_tokens_per_sentence))
+
+
+def generation_params(generation_kwargs: Dict) -> Dict:
+    """补全生成参数默认值"""
+    params = dict(GENERATION_DEFAULTS)
+    params.update(generation_kwargs)
+    return params
+
+
+def _autocast(tts):
+    return torch.amp.autocast(torch.device(tts.device).type, enabled=tts.dtype is not None, dtype=tts.dtype)
+
+
+def _synchronize(tts):
+    """计时时等待GPU执行完，避免异步执行的耗时计入下一阶段"""
+    if is_active() and torch.device(tts.device).type == "cuda":
+        torch.cuda.synchronize(tts.device)
+
+
+_counts = threading.local()
+
+
+@contextlib.contextmanager
+def _count_sentences():
+    """统计期间当前线程中分词器 split_sentences 产出的分句数和token数（上游infer内部的分句）"""
+    previous = getattr(_counts, "value", None)
+    _counts.value = counts = {"sentences": 0, "tokens": 0}
+    try:
+        yield counts
+    finally:
+        _counts.value = previous
+
+
+def _install_sentence_counter(tokenizer):
+    split_sentences = tokenizer.split_sentences
+    if getattr(split_sentences, "_counts_sentences", False):
+        return
+
+    @functools.wraps(split_sentences)
+    def counting_split_sentences(*args, **kwargs):
+        sentences = split_sentences(*args, **kwargs)
+        counts = getattr(_counts, "value", None)
+        if counts is not None:
+            counts["sentences"] += len(sentences)
+            counts["tokens"] += sum(len(sentence) for sentence in sentences)
+        return sentences
+
+    counting_split_sentences._counts_sentences = True
+    tokenizer.split_sentences = counting_split_sentences
+
+
+def instrument_engine(tts):
+    """给IndexTTS实例加上阶段埋点，只修改这个实例的属性和前向钩子，不改上游代码（重复调用无副作用）
+
+    分词器装上文本前端缓存（set_text_cache 设置后生效），上游 infer / infer_fast 和服务端估算代价的分词共用缓存，
+    并统计上游分出的分句数和token数；
+    上游内部的文本规范化、分词分句、GPT解码（inference_speech 和求latent的前向）
+    和BigVGAN声码分别计入 normalize / tokenize / gpt / vocoder 阶段（命中缓存的分词不含规范化耗时）。
+    """
+    def synchronize():
+        _synchronize(tts)
+
+    install_tokenizer_cache(tts.tokenizer, get_text_cache)
+    _install_sentence_counter(tts.tokenizer)
+    if getattr(tts, "normalizer", None) is not None:
+        wrap_stage(tts.normalizer, "normalize", "normalize")
+    wrap_stage(tts.tokenizer, "tokenize", "tokenize")
+    wrap_stage(tts.tokenizer, "split_sentences", "tokenize")
+    wrap_stage(tts.gpt, "inference_speech", "gpt", synchronize=synchronize)
+    hook_stage(tts.gpt, "gpt", synchronize=synchronize)
+    hook_stage(tts.bigvgan, "vocoder", synchronize=synchronize)
+    return tts
+
+
+def infer_upstream(tts, prompt_audio_path: str, text: str, fast: bool = False, max_text_tokens_per_sentence: int = 120,
+                   sentences_bucket_max_size: int = 4, output_path: Optional[str] = None, verbose: bool = False,
+                   **generation_kwargs):
+    """调用 IndexTTS.infer / infer_fast 合成整段文本，合成行为与上游完全一致
+
+    条件mel先经由 get_cond_mel 写入IndexTTS自带的缓存，上游不会重新计算；
+    上游内部各阶段的耗时由 instrument_engine 安装的埋点分别记录，结果由 save_wav 写入（write 阶段）。
+
+    Args:
+        fast: 使用 infer_fast（分句分桶批量推理）
+        output_path: 指定时写入wav文件
+
+    Returns:
+        指定output_path时返回该路径，否则返回波形 [1, N]（int16量程的float，CPU）；失败返回None
+    """
+    get_cond_mel(tts, prompt_audio_path)
+    start_time = time.time()
+    with _count_sentences() as counts:
+        if fast:
+            result = tts.infer_fast(prompt_audio_path, text, None, verbose=verbose,
+                                    max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
+                                    sentences_bucket_max_size=int(sentences_bucket_max_size),
+                                    **generation_kwargs)
+        else:
+            result = tts.infer(prompt_audio_path, text, None, verbose=verbose,
+                               max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
+                               **generation_kwargs)
+    if not result:
+        return None
+
+    # 上游不写文件时返回 (采样率, int16波形 [N, 1])
+    sampling_rate, wav_data = result
+    wav = torch.from_numpy(wav_data.T.astype("float32"))
+    # 分句数和token数来自上游内部的 split_sentences（instrument_engine 安装的计数）
+    observe_synthesis(time.time() - start_time, wav.shape[-1] / sampling_rate,
+                      sentences=counts["sentences"], tokens=counts["tokens"])
+    if output_path:
+        return save_wav([wav], output_path)
+    return wav
+
+
+def synthesize_batch(tts, cond_mel: torch.Tensor, sentences: List[List[str]], **generation_kwargs) -> List[torch.Tensor]:
+    """将多个分句作为一个填充批次进行GPT解码并声码
+
+    用于分句缓存、跨请求批处理和流式合成等需要逐句控制的场景，普通合成请使用 infer_upstream。
+
+    Args:
+        tts: IndexTTS实例
+        cond_mel: 条件mel（已在tts.device上）
+        sentences: 分句token列表
+
+    Returns:
+        List[torch.Tensor]: 每个分句的波形 [1, N]（int16量程的float，CPU）
+    """
+    params = generation_params(generation_kwargs)
+    device = tts.device
+    start_time = time.time()
+    token_tensors = [
+        torch.tensor(tts.tokenizer.convert_tokens_to_ids(sent), dtype=torch.int32, device=device).unsqueeze(0)
+        for sent in sentences
+    ]
+    batch_text_tokens = tts.pad_tokens_cat(token_tensors) if len(token_tensors) > 1 else token_tensors[0]
+    cond_mel_lengths = torch.tensor([cond_mel.shape[-1]], device=device)
+
+    wavs = []
+    with torch.no_grad():
+        with stage("gpt"), _autocast(tts):
+            batch_codes = tts.gpt.inference_speech(cond_mel, batch_text_tokens,
+                                                   cond_mel_lengths=cond_mel_lengths,
+                                                   do_sample=params["do_sample"],
+                                                   top_p=params["top_p"],
+                                                   top_k=params["top_k"],
+                                                   temperature=params["temperature"],
+                                                   num_return_sequences=1,
+                                                   length_penalty=params["length_penalty"],
+                                                   num_beams=params["num_beams"],
+                                                   repetition_penalty=params["repetition_penalty"],
+                                                   max_generate_length=params["max_mel_tokens"])
+
+        for i, text_tokens in enumerate(token_tensors):
+            with stage("gpt"):
+                codes = batch_codes[i]
+                # 截断到第一个停止符
+                stop_positions = (codes == tts.stop_mel_token).nonzero(as_tuple=False)
+                code_len = int(stop_positions[0]) if len(stop_positions) > 0 else len(codes)
+                codes = codes[:code_len].unsqueeze(0)
+                code_lens = torch.tensor([code_len], device=device, dtype=torch.long)
+                codes, code_lens = tts.remove_long_silence(codes, silent_token=52, max_consecutive=30)
+
+                with _autocast(tts):
+                    latent = tts.gpt(cond_mel, text_tokens,
+                                     torch.tensor([text_tokens.shape[-1]], device=device), codes,
+                                     code_lens * tts.gpt.mel_length_compression,
+                                     cond_mel_lengths=cond_mel_lengths,
+                                     return_latent=True, clip_inputs=False)
+                _synchronize(tts)
+
+            with stage("vocoder"):
+                with _autocast(tts):
+                    wav, _ = tts.bigvgan(latent, cond_mel.transpose(1, 2))
+                    wav = wav.squeeze(1)
+                wav = torch.clamp(32767 * wav, -32767.0, 32767.0)
+                wavs.append(wav.cpu())
+    observe_synthesis(time.time() - start_time, sum(wav.shape[-1] for wav in wavs) / SAMPLING_RATE,
+                      sentences=len(sentences), tokens=sum(len(sent) for sent in sentences))
+    return wavs
+
+
+def synthesize_sentences(tts, cond_mel: torch.Tensor, sentences: List[List[str]], bucket_max_size: int = 1,
+                         **generation_kwargs) -> List[torch.Tensor]:
+    """按token长度排序分桶批量合成，结果按输入顺序返回"""
+    bucket_max_size = max(1, int(bucket_max_size))
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    results = [None] * len(sentences)
+    for start in range(0, len(order), bucket_max_size):
+        idxs = order[start:start + bucket_max_size]
+        wavs = synthesize_batch(tts, cond_mel, [sentences[i] for i in idxs], **generation_kwargs)
+        for i, wav in zip(idxs, wavs):
+            results[i] = wav
+    return results
+
+
+def save_wav(wavs: List[torch.Tensor], output_path: str) -> str:
+    """拼接分句波形并保存为wav文件"""
+    with stage("write"):
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        wav = torch.cat(wavs, dim=1)
+        torchaudio.save(output_path, wav.type(torch.int16), SAMPLING_RATE)
+        return output_path
+
+
+def stream_sentences(tts, prompt_audio_path: str, text: str, max_text_tokens_per_sentence: int = 120,
+                     cancel_event=None, **generation_kwargs):
+    """逐句合成的生成器，每合成完一句立即产出
+
+    Args:
+        cancel_event: 可选的threading.Event，置位后在下一句开始前停止
+
+    Yields:
+        Tuple[int, int, torch.Tensor]: (分句序号, 分句总数, 波形)
+    """
+    sentences = split_text(tts, text, max_text_tokens_per_sentence)
+    cond_mel = get_cond_mel(tts, prompt_audio_path)
+    for index, sent in enumerate(sentences):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        wav = synthesize_batch(tts, cond_mel, [sent], **generation_kwargs)[0]
+        yield index, len(sentences), wav
+
+
+def wav_to_pcm16(wav: torch.Tensor) -> bytes:
+    """波形转换为16位小端PCM字节"""
+    return wav.type(torch.int16).numpy().tobytes()
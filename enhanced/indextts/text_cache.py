@@ -0,0 +1,96 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class TextFrontendCache:
+    """文本前端缓存 - 按原始文本缓存文本规范化+BPE分词的结果，跨请求共享
+
+    只缓存整段文本的结果，不把文本切成片段分别分词：分词器的规范化（中英文路径）和
+    SentencePiece的前缀空格都取决于整段文本，片段拼接的结果与 tokenizer.tokenize(text) 不一定一致。
+    通过 install_tokenizer_cache 装到IndexTTS实例的分词器上，上游 infer/infer_fast 内部的分词同样命中缓存。
+    按估算的内存占用做LRU淘汰。
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # 文本 -> (token列表, 估算字节数)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _size_of(text: str, tokens: List[str]) -> int:
+        return sys.getsizeof(text) + sys.getsizeof(tokens) + sum(sys.getsizeof(token) for token in tokens)
+
+    def get(self, text: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self._hits += 1
+            return list(entry[0])
+
+    def put(self, text: str, tokens: List[str]):
+        tokens = list(tokens)
+        size = self._size_of(text, tokens)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(text, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[text] = (tokens, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted
+
+    def tokenize(self, text: str, compute: Callable[[str], List[str]]) -> List[str]:
+        """规范化并分词，未命中时调用 compute(text)（原始的 tokenizer.tokenize），返回的列表调用方可以修改"""
+        tokens = self.get(text)
+        if tokens is None:
+            tokens = compute(text)
+            self.put(text, tokens)
+            tokens = list(tokens)
+        return tokens
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0,
+            }
+
+
+def install_tokenizer_cache(tokenizer, get_cache: Callable[[], Optional[TextFrontendCache]]):
+    """给分词器实例装上缓存：tokenizer.tokenize(text) 先查 get_cache() 返回的缓存，未命中时调用原方法
+
+    只替换这个实例的属性，不修改上游类；get_cache() 返回None时直接调用原方法（重复调用不会重复安装）。
+    """
+    if "_uncached_tokenize" in vars(tokenizer):
+        return
+    tokenize = tokenizer.tokenize
+
+    def cached_tokenize(text, *args, **kwargs):
+        cache = get_cache()
+        if cache is None or args or kwargs or not isinstance(text, str):
+            return tokenize(text, *args, **kwargs)
+        return cache.tokenize(text, tokenize)
+
+    tokenizer._uncached_tokenize = tokenize
+    tokenizer.tokenize = cached_tokenize
@@ -0,0 +1,158 @@
+import contextlib
+import functools
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# 输出时的阶段顺序
+STAGE_ORDER = ("queue", "cache", "normalize", "tokenize", "cond", "gpt", "vocoder", "encode", "write", "total")
+
+_local = threading.local()
+
+
+class StageTimings:
+    """单个请求各阶段的累计耗时（秒）
+
+    可在事件循环和推理工作线程中同时累计：事件循环一侧用 measure() 显式计时，
+    推理工作线程中通过 activate() 激活后，由 stage() 埋点自动计入。
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def as_dict(self) -> Dict[str, float]:
+        """各阶段耗时（秒），total为从创建到现在的总耗时"""
+        with self._lock:
+            stages = dict(self._stages)
+        stages["total"] = time.perf_counter() - self._start_time
+        order = {name: i for i, name in enumerate(STAGE_ORDER)}
+        return {name: round(stages[name], 4)
+                for name in sorted(stages, key=lambda n: (order.get(n, len(order) - 1), n))}
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头（毫秒）"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.as_dict().items())
+
+
+@contextlib.contextmanager
+def activate(*timings: Optional[StageTimings]):
+    """在当前线程中激活请求的计时，期间 stage() 的耗时计入这些请求（合并批次时计入批内每个请求）"""
+    previous = (getattr(_local, "active", ()), getattr(_local, "stack", None), getattr(_local, "hooks", None))
+    _local.active = tuple(t for t in timings if t is not None)
+    # 每次激活使用新的阶段栈，上一个任务中异常退出、没有配对的埋点不会影响这次
+    _local.stack, _local.hooks = [], []
+    try:
+        yield
+    finally:
+        _local.active, _local.stack, _local.hooks = previous
+
+
+def is_active() -> bool:
+    return bool(getattr(_local, "active", ()))
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """阶段埋点：当前线程没有激活的计时时几乎没有开销
+
+    嵌套的阶段只计自身耗时，外层阶段扣除其中内层阶段的耗时。
+    """
+    active = getattr(_local, "active", ())
+    if not active:
+        yield
+        return
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        for timings in active:
+            timings.add(name, elapsed - children)
+
+
+def wrap_stage(obj, attr: str, name: str, synchronize: Optional[Callable[[], None]] = None):
+    """把对象的方法包装为阶段埋点，只替换这个实例的属性，不修改类和上游代码（重复调用不会重复包装）
+
+    Args:
+        synchronize: 可选，阶段结束前调用（如等待GPU执行完）
+    """
+    method = getattr(obj, attr)
+    if getattr(method, "_stage_name", None) is not None:
+        return
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not is_active():
+            return method(*args, **kwargs)
+        with stage(name):
+            result = method(*args, **kwargs)
+            if synchronize is not None:
+                synchronize()
+            return result
+
+    wrapper._stage_name = name
+    setattr(obj, attr, wrapper)
+
+
+def hook_stage(module, name: str, synchronize: Optional[Callable[[], None]] = None):
+    """用前向钩子把模块的 forward 计入阶段（torch.nn.Module），不修改模块代码（重复调用不会重复注册）
+
+    Args:
+        synchronize: 可选，阶段结束前调用（如等待GPU执行完）
+    """
+    if getattr(module, "_stage_name", None) is not None:
+        return
+
+    def pre_hook(_module, _args):
+        if is_active():
+            context = stage(name)
+            context.__enter__()
+            _local.hooks.append(context)
+
+    def post_hook(_module, _args, _output):
+        hooks = getattr(_local, "hooks", None)
+        if not is_active() or not hooks:
+            return
+        context = hooks.pop()
+        try:
+            if synchronize is not None:
+                synchronize()
+        finally:
+            context.__exit__(None, None, None)
+
+    module.register_forward_pre_hook(pre_hook)
+    try:
+        # forward抛出异常时也结束阶段
+        module.register_forward_hook(post_hook, always_call=True)
+    except TypeError:
+        module.register_forward_hook(post_hook)
+    module._stage_name = name
+
+
+def log_timings(endpoint: str, timings: StageTimings, **fields):
+    """输出一行结构化（JSON）计时日志"""
+    record = {"event": "tts_timings", "endpoint": endpoint, "time": round(time.time(), 3)}
+    record.update(fields)
+    record["timings"] = timings.as_dict()
+    print(json.dumps(record, ensure_ascii=False), flush=True)
@@ -1,18 +1,41 @@
+import hashlib
 import json
 import os
 import shutil
+import threading
 import time
 from typing import Dict, List, Optional
-import torchaudio
+
+# 条件mel文件与参考音频同名保存
+COND_MEL_SUFFIX = ".cond_mel.pt"
+
+
+def cond_mel_path_for(audio_path: str) -> str:
+    """参考音频对应的条件mel文件路径"""
+    return os.path.splitext(audio_path)[0] + COND_MEL_SUFFIX
+
 
 class VoiceManager:
     """音色管理器 - 用于保存、加载和管理音色"""
     
-    def __init__(self, voices_dir: str = "voices"):
+    def __init__(self, voices_dir: str = "voices", cond_mel_cache=None):
+        """
+        Args:
+            voices_dir: 音色目录
+            cond_mel_cache: 可选的条件mel缓存（indextts.cond_cache.CondMelCache），音色保存或删除时清除对应条目
+        """
         self.voices_dir = voices_dir
+        self.cond_mel_cache = cond_mel_cache
+        self._audio_hashes = {}
         self.voices_db_path = os.path.join(voices_dir, "voices.json")
+        self.usage_path = os.path.join(voices_dir, "usage.json")
         os.makedirs(voices_dir, exist_ok=True)
         self._load_voices_db()
+        self._usage_pending = {}
+        self._usage_flush_time = time.time()
+        self._usage_lock = threading.Lock()
+        self._usage_flush_lock = threading.Lock()
+        self._usage_flushing = False
     
     def _load_voices_db(self):
         """加载音色数据库"""
@@ -30,6 +53,30 @@ class VoiceManager:
         with open(self.voices_db_path, 'w', encoding='utf-8') as f:
             json.dump(self.voices_db, f, ensure_ascii=False, indent=2)
     
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        """计算音频文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _invalidate_cond_mel(self, audio_path: str):
+        """清除该音频在条件mel缓存中的条目"""
+        self._audio_hashes.pop(audio_path, None)
+        if self.cond_mel_cache is not None:
+            self.cond_mel_cache.invalidate(audio_path)
+    
+    def _save_cond_mel(self, audio_path: str) -> Optional[str]:
+        """预计算并保存条件mel，失败时返回None（推理时会现场计算）"""
+        try:
+            from indextts.cond_cache import save_cond_mel
+            return save_cond_mel(audio_path)
+        except Exception as e:
+            print(f"预计算条件mel失败 {audio_path}: {str(e)}")
+            return None
+    
     def save_voice(self, audio_path: str, voice_name: str, description: str = "") -> Dict:
         """保存音色
         
@@ -57,11 +104,13 @@ class VoiceManager:
         saved_audio_path = os.path.join(self.voices_dir, f"{voice_id}{file_extension}")
         
         try:
-            # 复制音频文件
+            # 复制音频文件（路径可能与之前删除的音色相同）
             shutil.copy2(audio_path, saved_audio_path)
+            self._invalidate_cond_mel(saved_audio_path)
             
             # 验证音频文件
             try:
+                import torchaudio
                 audio_info = torchaudio.info(saved_audio_path)
                 duration = audio_info.num_frames / audio_info.sample_rate
             except:
@@ -76,7 +125,9 @@ class VoiceManager:
                 "created_time": time.time(),
                 "duration": duration,
                 "sample_rate": audio_info.sample_rate if 'audio_info' in locals() else 0,
-                "file_size": os.path.getsize(saved_audio_path)
+                "file_size": os.path.getsize(saved_audio_path),
+                "audio_hash": self._file_hash(saved_audio_path),
+                "cond_mel_path": self._save_cond_mel(saved_audio_path)
             }
             
             self.voices_db[voice_name] = voice_info
@@ -119,6 +170,65 @@ class VoiceManager:
             return voice_info["audio_path"]
         return None
     
+    def ensure_cond_mel(self, voice_name: str, force: bool = False) -> Optional[str]:
+        """确保音色已有预计算的条件mel（用于补算旧音色）
+        
+        Args:
+            voice_name: 音色名称
+            force: 是否强制重新计算
+            
+        Returns:
+            Optional[str]: 条件mel文件路径，音色不存在或计算失败返回None
+        """
+        voice_info = self.get_voice(voice_name)
+        if not voice_info or not os.path.exists(voice_info["audio_path"]):
+            return None
+        cond_mel_path = voice_info.get("cond_mel_path")
+        if force or not cond_mel_path or not os.path.exists(cond_mel_path):
+            cond_mel_path = self._save_cond_mel(voice_info["audio_path"])
+            voice_info["cond_mel_path"] = cond_mel_path
+            self._save_voices_db()
+        return cond_mel_path
+    
+    def get_voice_audio_hash(self, voice_name: str) -> Optional[str]:
+        """获取音色音频的内容哈希（用于结果缓存键）
+        
+        旧数据没有保存哈希时只在内存中补算，不改写voices.json（请求路径上改写会与其它进程冲突），
+        持久化由 backfill_voices.py 调用 ensure_audio_hash 完成。
+        
+        Args:
+            voice_name: 音色名称
+            
+        Returns:
+            Optional[str]: 音频内容哈希，如果不存在返回None
+        """
+        voice_info = self.get_voice(voice_name)
+        if not voice_info or not os.path.exists(voice_info["audio_path"]):
+            return None
+        if voice_info.get("audio_hash"):
+            return voice_info["audio_hash"]
+        audio_path = voice_info["audio_path"]
+        if audio_path not in self._audio_hashes:
+            self._audio_hashes[audio_path] = self._file_hash(audio_path)
+        return self._audio_hashes[audio_path]
+    
+    def ensure_audio_hash(self, voice_name: str) -> Optional[str]:
+        """为旧音色补算并保存音频内容哈希（离线补算用）
+        
+        Args:
+            voice_name: 音色名称
+            
+        Returns:
+            Optional[str]: 音频内容哈希，音色不存在返回None
+        """
+        voice_info = self.get_voice(voice_name)
+        if not voice_info or not os.path.exists(voice_info["audio_path"]):
+            return None
+        if not voice_info.get("audio_hash"):
+            voice_info["audio_hash"] = self._file_hash(voice_info["audio_path"])
+            self._save_voices_db()
+        return voice_info["audio_hash"]
+    
     def list_voices(self) -> List[Dict]:
         """获取所有音色列表
         
@@ -154,15 +264,23 @@ class VoiceManager:
             return {"success": False, "message": f"音色 '{voice_name}' 不存在"}
         
         voice_info = self.voices_db[voice_name]
+        audio_path = voice_info["audio_path"]
+        cond_mel_path = cond_mel_path_for(audio_path)
         
         try:
-            # 删除音频文件
-            if os.path.exists(voice_info["audio_path"]):
-                os.remove(voice_info["audio_path"])
-            
-            # 从数据库删除
+            # 先从数据库删除，保存失败时数据库和文件都保持原样
             del self.voices_db[voice_name]
-            self._save_voices_db()
+            try:
+                self._save_voices_db()
+            except Exception:
+                self.voices_db[voice_name] = voice_info
+                raise
+            
+            # 数据库已不再引用，再删除音频和条件mel文件
+            for path in (audio_path, cond_mel_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._invalidate_cond_mel(audio_path)
             
             return {
                 "success": True,
@@ -172,6 +290,103 @@ class VoiceManager:
         except Exception as e:
             return {"success": False, "message": f"删除失败: {str(e)}"}
     
+    def record_usage(self, voice_name: str, flush_interval: float = 30.0):
+        """记录音色使用次数
+        
+        计数先在内存中累积，定期在后台线程写入本进程自己的usage.<pid>.json，
+        不改写voices.json，也不与其它工作进程写同一个文件，调用方（事件循环）不会阻塞在文件IO上。
+        
+        Args:
+            voice_name: 音色名称
+            flush_interval: 写入间隔秒数
+        """
+        with self._usage_lock:
+            self._usage_pending[voice_name] = self._usage_pending.get(voice_name, 0) + 1
+            if self._usage_flushing or time.time() - self._usage_flush_time < flush_interval:
+                return
+            self._usage_flushing = True
+            self._usage_flush_time = time.time()
+        
+        def run():
+            try:
+                self.flush_usage()
+            except Exception as e:
+                print(f"写入音色使用次数失败: {str(e)}")
+            finally:
+                with self._usage_lock:
+                    self._usage_flushing = False
+        
+        threading.Thread(target=run, name="voice-usage-flush", daemon=True).start()
+    
+    def _process_usage_path(self) -> str:
+        """本进程的使用次数文件，多进程部署时每个进程只写自己的文件"""
+        return os.path.join(self.voices_dir, f"usage.{os.getpid()}.json")
+    
+    @staticmethod
+    def _read_usage_file(path: str) -> Dict[str, int]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            return {}
+    
+    def flush_usage(self):
+        """把累积的使用次数合并写入本进程的使用次数文件"""
+        with self._usage_lock:
+            pending, self._usage_pending = self._usage_pending, {}
+            self._usage_flush_time = time.time()
+        if not pending:
+            return
+        path = self._process_usage_path()
+        try:
+            with self._usage_flush_lock:
+                # 进程号可能被复用：在旧文件的计数上累加
+                usage = self._read_usage_file(path) if os.path.exists(path) else {}
+                for voice_name, count in pending.items():
+                    usage[voice_name] = usage.get(voice_name, 0) + count
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(usage, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, path)
+        except Exception:
+            # 写入失败时放回内存，下次再写
+            with self._usage_lock:
+                for voice_name, count in pending.items():
+                    self._usage_pending[voice_name] = self._usage_pending.get(voice_name, 0) + count
+            raise
+    
+    def get_usage_counts(self) -> Dict[str, int]:
+        """获取已写入的音色使用次数（合并usage.json和各进程的usage.<pid>.json）"""
+        usage = {}
+        paths = [self.usage_path] + sorted(
+            os.path.join(self.voices_dir, name) for name in os.listdir(self.voices_dir)
+            if name.startswith("usage.") and name.endswith(".json") and name != "usage.json"
+        )
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            for voice_name, count in self._read_usage_file(path).items():
+                usage[voice_name] = usage.get(voice_name, 0) + count
+        return usage
+    
+    def top_voices(self, n: int) -> List[str]:
+        """按使用次数获取最常用的前N个音色名称
+        
+        Args:
+            n: 数量
+            
+        Returns:
+            List[str]: 音色名称列表
+        """
+        usage = self.get_usage_counts()
+        with self._usage_lock:
+            pending = dict(self._usage_pending)
+        for voice_name, count in pending.items():
+            usage[voice_name] = usage.get(voice_name, 0) + count
+        voice_names = [voice["name"] for voice in self.list_voices()]
+        voice_names.sort(key=lambda name: usage.get(name, 0), reverse=True)
+        return voice_names[:n]
+    
     def search_voices(self, keyword: str) -> List[Dict]:
         """搜索音色
         
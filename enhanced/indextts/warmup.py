@@ -0,0 +1,86 @@
+import os
+import time
+from typing import Dict, List, Sequence
+
+from indextts.request_queue import InferenceJob
+from indextts.synthesis import get_cond_mel, synthesize_batch
+
+# 预热用的示例文本，按需重复截取到指定token数
+WARMUP_TEXT = "欢迎使用语音合成服务，这是一段用于预热模型的示例文本，其中包含常见的标点符号和数字123。"
+
+# 没有保存任何音色时使用的参考音频
+FALLBACK_PROMPT = os.path.join("tests", "sample_prompt.wav")
+
+
+def _warmup_tokens(tts, length: int) -> List[str]:
+    base = tts.tokenizer.tokenize(WARMUP_TEXT)
+    tokens = []
+    while len(tokens) < length:
+        tokens.extend(base)
+    return tokens[:length]
+
+
+def warmup_engine(tts, audio_paths: List[str], sentence_lengths: Sequence[int], bucket_sizes: Sequence[int],
+                  **generation_kwargs) -> Dict:
+    """在推理工作线程中执行：预加载音色条件mel，再按代表性分句长度和批大小空跑合成
+
+    Returns:
+        Dict: 各步骤耗时（秒）
+    """
+    timings = {"voices": {}, "synthesis": {}}
+    for audio_path in audio_paths:
+        start_time = time.time()
+        get_cond_mel(tts, audio_path)
+        timings["voices"][os.path.basename(audio_path)] = round(time.time() - start_time, 3)
+
+    if not audio_paths:
+        return timings
+    # 最后预加载的音色已在IndexTTS自带缓存中，直接用于空跑
+    cond_mel = get_cond_mel(tts, audio_paths[-1])
+    for length in sentence_lengths:
+        tokens = _warmup_tokens(tts, length)
+        for bucket_size in bucket_sizes:
+            start_time = time.time()
+            synthesize_batch(tts, cond_mel, [tokens] * bucket_size, **generation_kwargs)
+            timings["synthesis"][f"tokens={length},bucket={bucket_size}"] = round(time.time() - start_time, 3)
+    return timings
+
+
+def run_warmup(engine_pool, voice_manager, top_voices: int = 3, sentence_lengths: Sequence[int] = (16, 64),
+               bucket_sizes: Sequence[int] = (1, 4), **generation_kwargs) -> Dict:
+    """在每个推理副本上执行预热，阻塞直到全部完成
+
+    Args:
+        engine_pool: 推理引擎池
+        voice_manager: 音色管理器，按使用次数选取预加载的音色
+        top_voices: 预加载使用最多的前N个音色
+        sentence_lengths: 空跑的分句token数
+        bucket_sizes: 空跑的批大小
+
+    Returns:
+        Dict: 预热报告（音色列表、各副本耗时、总耗时）
+    """
+    start_time = time.time()
+    voice_names = voice_manager.top_voices(top_voices) if top_voices > 0 else []
+    audio_paths = [path for path in (voice_manager.get_voice_audio_path(name) for name in voice_names) if path]
+    if not audio_paths and os.path.exists(FALLBACK_PROMPT):
+        audio_paths = [FALLBACK_PROMPT]
+
+    futures = []
+    for worker in engine_pool.workers:
+        job = InferenceJob(warmup_engine, (audio_paths, sentence_lengths, bucket_sizes), generation_kwargs,
+                           priority="interactive")
+        futures.append((worker.name, worker.submit_job(job)))
+
+    replicas = []
+    for name, future in futures:
+        try:
+            replicas.append({"name": name, "timings": future.result()})
+        except Exception as e:
+            replicas.append({"name": name, "error": str(e)})
+
+    return {
+        "voices": voice_names,
+        "replicas": replicas,
+        "seconds": round(time.time() - start_time, 3),
+    }
@@ -0,0 +1,74 @@
+"""
+长文本（有声书）合成
+
+逐段读取文本文件（每个非空行为一段）并边合成边写入WAV，内存占用与文本长度无关；
+同时输出分句时间戳索引 <output>.index.jsonl。每段完成后保存进度，中断后用同一命令重新运行即可继续。
+
+示例:
+    python longform_synthesize.py --input chapter01.txt --voice_name 旁白 --output outputs/book/chapter01.wav
+"""
+
+import argparse
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, "indextts"))
+
+from indextts.engine_pool import create_engines, resolve_devices
+from indextts.voice_manager import VoiceManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长文本（有声书）合成，可断点续跑")
+    parser.add_argument("--input", type=str, required=True, help="UTF-8 text file, one paragraph per non-empty line")
+    parser.add_argument("--output", type=str, required=True, help="Output WAV path")
+    parser.add_argument("--voice_name", type=str, default=None, help="Saved voice to use")
+    parser.add_argument("--prompt_audio", type=str, default=None, help="Reference audio to use instead of a saved voice")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--voices_dir", type=str, default="voices", help="Voices directory")
+    parser.add_argument("--device", type=str, default=None, help="Device, e.g. cuda:0 or cpu (default: auto)")
+    parser.add_argument("--max_text_tokens_per_sentence", type=int, default=120, help="Max tokens per sentence")
+    parser.add_argument("--bucket_size", type=int, default=4, help="Sentences synthesized per padded batch")
+    parser.add_argument("--restart", action="store_true", default=False, help="Ignore saved progress and start over")
+    args = parser.parse_args()
+
+    if args.voice_name:
+        prompt_audio = VoiceManager(args.voices_dir).get_voice_audio_path(args.voice_name)
+        if not prompt_audio:
+            print(f"❌ 音色 '{args.voice_name}' 不存在")
+            sys.exit(1)
+    elif args.prompt_audio and os.path.exists(args.prompt_audio):
+        prompt_audio = args.prompt_audio
+    else:
+        print("❌ 请通过 --voice_name 或 --prompt_audio 指定参考音频")
+        sys.exit(1)
+    if not os.path.exists(args.input):
+        print(f"❌ 输入文件不存在: {args.input}")
+        sys.exit(1)
+
+    tts = create_engines(args.model_dir, resolve_devices(1, args.device))[0]
+
+    from indextts.longform import synthesize_longform
+
+    def report(progress):
+        percent = progress["input_offset"] / progress["input_size"] * 100 if progress["input_size"] else 100
+        print(f"📖 {percent:5.1f}% 段落 {progress['paragraphs']}，分句 {progress['sentences']}，"
+              f"音频 {progress['duration']:.1f}s，耗时 {progress['elapsed']:.1f}s")
+
+    try:
+        result = synthesize_longform(tts, prompt_audio, args.input, args.output,
+                                     max_text_tokens_per_sentence=args.max_text_tokens_per_sentence,
+                                     bucket_max_size=args.bucket_size, resume=not args.restart,
+                                     progress_callback=report)
+    except KeyboardInterrupt:
+        print("⏹️ 已中断，重新运行同一命令即可从上次完成的段落继续")
+        sys.exit(1)
+
+    print(f"✅ 完成: {args.output}（{result['paragraphs']} 段，{result['sentences']} 句，"
+          f"音频 {result['duration']:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
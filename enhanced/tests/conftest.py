@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入 enhanced/indextts 下的模块（与脚本相同的 sys.path 设置）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,27 @@
+import pytest
+
+from indextts.audio_encoding import media_type_for_filename, validate_output_format, variant_filename
+
+
+@pytest.mark.parametrize("fmt, sample_rate", [
+    ("wav", None), ("wav", 10000), ("flac", 44100), ("pcm16", 8000),
+    ("mp3", 22050), ("mp3", 24000), ("ogg-opus", 48000),
+])
+def test_valid_formats(fmt, sample_rate):
+    validate_output_format(fmt, sample_rate)
+
+
+@pytest.mark.parametrize("fmt, sample_rate", [
+    ("aac", None), ("wav", 4000), ("wav", 96000),
+    ("mp3", 10000), ("mp3", 20000), ("ogg-opus", 22050),
+])
+def test_invalid_formats(fmt, sample_rate):
+    with pytest.raises(ValueError):
+        validate_output_format(fmt, sample_rate)
+
+
+def test_variant_names_and_media_types():
+    assert variant_filename("tts_abc.wav", "mp3", 16000) == "tts_abc.16000.mp3"
+    assert media_type_for_filename("tts_abc.16000.mp3") == "audio/mpeg"
+    assert media_type_for_filename("tts_abc.8000.pcm") == "audio/L16;rate=8000;channels=1"
+    assert media_type_for_filename("notes.txt") == "application/octet-stream"
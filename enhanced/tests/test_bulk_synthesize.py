@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from bulk_synthesize import Journal, plan_batches
+
+
+def _item(item_id, output, fingerprint="f1"):
+    return {"id": item_id, "output": str(output), "fingerprint": fingerprint}
+
+
+def _done(item, output):
+    return {"id": item["id"], "status": "done", "output": str(output), "fingerprint": item["fingerprint"]}
+
+
+def test_journal_resumes_after_truncated_last_line(tmp_path):
+    output = tmp_path / "a.wav"
+    output.write_bytes(b"RIFF")
+    item = _item("a", output)
+    path = tmp_path / "run.journal.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(_done(item, output)) + "\n")
+        # 崩溃时只写了一半的记录
+        f.write('{"id": "b", "status": "do')
+
+    journal = Journal(str(path))
+    assert journal.is_done(item)
+    assert not journal.is_done(_item("b", tmp_path / "b.wav"))
+    journal.append(_done(_item("b", tmp_path / "b.wav"), tmp_path / "b.wav"))
+    journal.close()
+
+    # 新记录从新的一行开始，重新读取时不会和残行粘在一起
+    records = Journal(str(path)).records
+    assert set(records) == {"a", "b"}
+    assert records["b"]["status"] == "done"
+
+
+def test_journal_reruns_changed_or_missing_items(tmp_path):
+    output = tmp_path / "a.wav"
+    output.write_bytes(b"RIFF")
+    item = _item("a", output)
+    path = tmp_path / "run.journal.jsonl"
+    journal = Journal(str(path))
+    journal.append(_done(item, output))
+    journal.append({"id": "c", "status": "failed", "error": "生成失败"})
+    journal.close()
+
+    journal = Journal(str(path))
+    assert journal.is_done(item)
+    # 清单内容（文本、音色、参数等）变化后指纹不同
+    assert not journal.is_done(_item("a", output, fingerprint="f2"))
+    # 输出路径改变
+    assert not journal.is_done(_item("a", tmp_path / "other.wav"))
+    # 上次失败的条目
+    assert not journal.is_done(_item("c", tmp_path / "c.wav"))
+    # 输出文件被删除
+    output.unlink()
+    assert not journal.is_done(item)
+    journal.close()
+
+
+def _plan_item(prompt, lengths, **generation_kwargs):
+    return {"prompt_audio": prompt, "generation_kwargs": generation_kwargs,
+            "sentences": [["t"] * length for length in lengths]}
+
+
+def test_plan_batches_sorts_sentences_across_items():
+    items = [
+        _plan_item("a.wav", [9, 1, 5]),
+        _plan_item("a.wav", [2, 8]),
+        _plan_item("a.wav", [4], temperature=0.5),
+        _plan_item("b.wav", [3, 7]),
+    ]
+    batches = plan_batches(items, batch_size=2)
+
+    # 每个 (参考音频, 生成参数) 组内按长度排序后切批，批次不跨组
+    by_group = {}
+    for prompt, generation_kwargs, members in batches:
+        assert 1 <= len(members) <= 2
+        key = (prompt, json.dumps(generation_kwargs, sort_keys=True))
+        for item_index, sent_index in members:
+            item = items[item_index]
+            assert (item["prompt_audio"], json.dumps(item["generation_kwargs"], sort_keys=True)) == key
+        by_group.setdefault(key, []).append([len(items[i]["sentences"][s]) for i, s in members])
+
+    assert by_group[("a.wav", "{}")] == [[1, 2], [5, 8], [9]]
+    assert by_group[("a.wav", '{"temperature": 0.5}')] == [[4]]
+    assert by_group[("b.wav", "{}")] == [[3, 7]]
+
+    # 每个分句恰好出现一次
+    members = sorted(member for _, _, batch in batches for member in batch)
+    assert members == sorted((i, s) for i, item in enumerate(items) for s in range(len(item["sentences"])))
@@ -0,0 +1,42 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from indextts.engine_pool import EnginePool
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import InferenceJob
+
+
+def test_rejection_is_counted_once_per_pool():
+    # 非CPU设备的假副本，不会在工作线程中设置torch线程数
+    pool = EnginePool([SimpleNamespace(device="cuda:0"), SimpleNamespace(device="cuda:1")], max_queue_size=1)
+    release = threading.Event()
+
+    def block(tts, started):
+        started.set()
+        release.wait(5)
+
+    try:
+        futures = []
+        for _ in range(2):
+            started = threading.Event()
+            futures.append(pool.submit_job(InferenceJob(block, (started,))))
+            assert started.wait(5)
+        # 两个副本各执行一个、各排队一个
+        for _ in range(2):
+            futures.append(pool.submit_job(InferenceJob(block, (threading.Event(),))))
+
+        with pytest.raises(QueueFullError):
+            pool.submit_job(InferenceJob(block, (threading.Event(),)))
+
+        stats = pool.stats()
+        assert stats["rejected"] == 1
+        assert [replica["rejected"] for replica in stats["replicas"]] == [0, 0]
+    finally:
+        release.set()
+        for future in futures:
+            future.result(5)
+        pool.shutdown()
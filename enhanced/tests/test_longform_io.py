@@ -0,0 +1,90 @@
+import io
+import struct
+import wave
+
+from indextts.longform_io import MAX_PARAGRAPH_BYTES, WavAppender, iter_paragraphs
+
+
+def pcm(samples, value=1):
+    return struct.pack("<%dh" % samples, *([value] * samples))
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        header = f.read(WavAppender.HEADER_SIZE)
+    riff_size = struct.unpack_from("<I", header, 4)[0]
+    data_size = struct.unpack_from("<I", header, 40)[0]
+    return riff_size, data_size
+
+
+def test_checkpoint_patches_header(tmp_path):
+    path = str(tmp_path / "out.wav")
+    writer = WavAppender(path, 24000)
+    writer._file.flush()
+    assert read_header(path) == (36, 0)
+    writer.write_pcm(pcm(100))
+    writer.checkpoint()
+    assert read_header(path) == (36 + 200, 200)
+    writer.write_pcm(pcm(50))
+    # 未checkpoint前头部仍是上次的长度
+    writer._file.flush()
+    assert read_header(path) == (36 + 200, 200)
+    writer.close()
+    assert read_header(path) == (36 + 300, 300)
+    with wave.open(path, "rb") as w:
+        assert w.getnframes() == 150
+        assert w.getframerate() == 24000
+        assert w.getsampwidth() == 2
+        assert w.getnchannels() == 1
+    assert writer.duration == 150 / 24000
+
+
+def test_resume_truncates_to_checkpoint(tmp_path):
+    path = str(tmp_path / "out.wav")
+    writer = WavAppender(path, 24000)
+    writer.write_pcm(pcm(100, 1))
+    writer.checkpoint()
+    # 模拟崩溃：checkpoint之后又写入了一部分数据，但头部没有更新
+    writer.write_pcm(pcm(70, 2))
+    writer._file.flush()
+    writer._file.close()
+
+    writer = WavAppender(path, 24000, resume_samples=100)
+    assert writer.samples == 100
+    writer.write_pcm(pcm(20, 3))
+    writer.close()
+
+    assert read_header(path) == (36 + 240, 240)
+    with wave.open(path, "rb") as w:
+        frames = w.readframes(w.getnframes())
+    assert frames == pcm(100, 1) + pcm(20, 3)
+
+
+def test_long_multibyte_line_cut_at_sentence_end():
+    sentence = "这是一个用来测试超长段落切分的中文句子，" * 3 + "。"
+    line = sentence * (MAX_PARAGRAPH_BYTES // len(sentence.encode("utf-8")) * 3)
+    data = ("第一段。\n" + line + "\n最后一段！\n").encode("utf-8")
+    assert len(line.encode("utf-8")) > MAX_PARAGRAPH_BYTES
+
+    paragraphs = list(iter_paragraphs(io.BytesIO(data)))
+    texts = [text for text, _ in paragraphs]
+    assert texts[0] == "第一段。"
+    assert texts[-1] == "最后一段！"
+    middle = texts[1:-1]
+    assert len(middle) > 1
+    for text in middle:
+        assert len(text.encode("utf-8")) <= MAX_PARAGRAPH_BYTES
+        assert text.endswith("。")
+        assert "�" not in text
+    assert "".join(middle) == line
+
+    # 每段的结束偏移都能用来续跑
+    for i, (_, offset) in enumerate(paragraphs[:-1]):
+        resumed = [text for text, _ in iter_paragraphs(io.BytesIO(data), offset)]
+        assert resumed == texts[i + 1:]
+    assert paragraphs[-1][1] == len(data)
+
+
+def test_bom_stripped_and_blank_lines_skipped():
+    data = "﻿第一段\n\n  \n第二段".encode("utf-8")
+    assert [text for text, _ in iter_paragraphs(io.BytesIO(data))] == ["第一段", "第二段"]
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from indextts import metrics
+
+ENHANCED_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sample(name, labels=None):
+    value = metrics.REGISTRY.get_sample_value(name, labels or {})
+    return value or 0.0
+
+
+def test_observe_synthesis_counts_sentences_and_tokens():
+    sentences, tokens = _sample("tts_sentences_total"), _sample("tts_tokens_total")
+    metrics.observe_synthesis(2.0, 4.0, sentences=3, tokens=57)
+    assert _sample("tts_sentences_total") == sentences + 3
+    assert _sample("tts_tokens_total") == tokens + 57
+
+
+def test_cache_counters_follow_cumulative_stats():
+    labels = {"cache": "test"}
+    metrics.update_cache_metrics("test", 5, 1, 100)
+    metrics.update_cache_metrics("test", 8, 2, 120)
+    assert _sample("tts_cache_hits_total", labels) == 8
+    assert _sample("tts_cache_misses_total", labels) == 2
+    assert _sample("tts_cache_bytes", labels) == 120
+    # 缓存重建后统计从0开始，计数器不回退
+    metrics.update_cache_metrics("test", 1, 0)
+    metrics.update_cache_metrics("test", 3, 0)
+    assert _sample("tts_cache_hits_total", labels) == 10
+    assert _sample("tts_cache_hit_ratio", labels) == 1.0
+
+
+def _run(code, metrics_dir):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir), PYTHONPATH=ENHANCED_DIR)
+    result = subprocess.run([sys.executable, "-c", code], env=env, cwd=ENHANCED_DIR,
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+WORKER = """
+import os
+from indextts import metrics
+metrics.REQUESTS.labels("tts", "success").inc({requests})
+metrics.QUEUE_DEPTH.labels("cpu").set({depth})
+metrics.observe_synthesis(1.0, 2.0, sentences=2, tokens=10)
+print(os.getpid())
+"""
+
+
+def test_multiprocess_mode_sums_workers_and_drops_dead_gauges(tmp_path):
+    first = int(_run(WORKER.format(requests=3, depth=2), tmp_path))
+    _run(WORKER.format(requests=4, depth=5), tmp_path)
+    # 第一个工作进程被父进程标记为退出
+    output = _run(f"from indextts import metrics\nmetrics.mark_process_dead({first})\n"
+                  "print(metrics.render().decode())", tmp_path)
+    lines = output.splitlines()
+    assert 'tts_requests_total{endpoint="tts",outcome="success"} 7.0' in lines
+    assert "tts_sentences_total 4.0" in lines
+    assert "tts_tokens_total 20.0" in lines
+    assert 'tts_queue_depth{replica="cpu"} 5.0' in lines
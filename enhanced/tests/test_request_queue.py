@@ -0,0 +1,68 @@
+import queue
+
+import pytest
+
+from indextts.request_queue import POLICY_FIFO, POLICY_PRIORITY, POLICY_SJF, InferenceJob, RequestQueue
+
+
+def _job(cost=1, priority="normal", waited=0.0):
+    job = InferenceJob(lambda tts: None, cost=cost, priority=priority)
+    job.enqueue_time -= waited
+    return job
+
+
+def _drain(q):
+    return [q.get() for _ in range(q.qsize())]
+
+
+def test_fifo_keeps_submission_order():
+    q = RequestQueue(maxsize=8, policy=POLICY_FIFO)
+    jobs = [_job(cost=c) for c in (50, 5, 20)]
+    for job in jobs:
+        q.put_nowait(job)
+    assert _drain(q) == jobs
+
+
+def test_sjf_runs_short_jobs_first():
+    q = RequestQueue(maxsize=8, policy=POLICY_SJF, aging=0)
+    long_job, short_job, mid_job = _job(cost=100), _job(cost=5), _job(cost=30)
+    for job in (long_job, short_job, mid_job):
+        q.put_nowait(job)
+    assert _drain(q) == [short_job, mid_job, long_job]
+
+
+def test_sjf_aging_prevents_starvation():
+    q = RequestQueue(maxsize=8, policy=POLICY_SJF, aging=20.0)
+    # 等待了10秒的长请求抵扣200个token，排到新的短请求之前
+    old_long = _job(cost=150, waited=10)
+    new_short = _job(cost=10)
+    q.put_nowait(new_short)
+    q.put_nowait(old_long)
+    assert q.get() is old_long
+
+
+def test_priority_classes_then_fifo():
+    q = RequestQueue(maxsize=8, policy=POLICY_PRIORITY)
+    batch, normal1, interactive, normal2 = (_job(priority=p) for p in ("batch", "normal", "interactive", "normal"))
+    for job in (batch, normal1, interactive, normal2):
+        q.put_nowait(job)
+    assert _drain(q) == [interactive, normal1, normal2, batch]
+
+
+def test_bounded_queue_and_stop_signal_last():
+    q = RequestQueue(maxsize=1, policy=POLICY_SJF)
+    job = _job(cost=3)
+    q.put_nowait(job)
+    with pytest.raises(queue.Full):
+        q.put_nowait(_job())
+    q.put(None)
+    assert q.total_cost() == 3
+    assert q.get() is job
+    assert q.get() is None
+
+
+def test_unknown_policy_and_priority_rejected():
+    with pytest.raises(ValueError):
+        RequestQueue(policy="lifo")
+    with pytest.raises(ValueError):
+        InferenceJob(lambda tts: None, priority="urgent")
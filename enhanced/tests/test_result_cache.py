@@ -0,0 +1,84 @@
+import os
+import time
+
+from indextts.result_cache import REF_SUFFIX, ResultCache, content_digest_of, content_hash
+
+
+def _write(cache_dir, filename, size, age):
+    path = os.path.join(cache_dir, filename)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _make_files(cache_dir):
+    _write(cache_dir, "old.wav", 100, 10000)
+    _write(cache_dir, "mid.wav", 100, 9000)
+    _write(cache_dir, "new.wav", 100, 5)
+
+
+def test_scan_orders_oldest_first(tmp_path):
+    _make_files(str(tmp_path))
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    assert list(cache._index) == ["old.wav", "mid.wav", "new.wav"]
+
+
+def test_quota_evicts_oldest_scanned_files(tmp_path):
+    _make_files(str(tmp_path))
+    cache = ResultCache(str(tmp_path), max_bytes=150)
+    assert cache.enforce_quota() == 2
+    assert sorted(os.listdir(str(tmp_path))) == ["new.wav"]
+    assert cache.stats()["bytes"] == 100
+
+
+def test_max_age_evicts_stale_scanned_files(tmp_path):
+    _make_files(str(tmp_path))
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    assert cache.enforce_quota(max_age=3600) == 2
+    assert sorted(os.listdir(str(tmp_path))) == ["new.wav"]
+
+
+def test_get_refreshes_lru_position(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    cached_path = cache.put("k" * 40, _write(str(tmp_path), "tts_out.wav", 100, 0))
+    ref_name = ResultCache.filename_for("k" * 40) + REF_SUFFIX
+    for filename in (os.path.basename(cached_path), ref_name):
+        mtime = time.time() - 20000
+        os.utime(os.path.join(str(tmp_path), filename), (mtime, mtime))
+    _make_files(str(tmp_path))
+
+    cache = ResultCache(str(tmp_path), max_bytes=300)
+    assert cache.get("k" * 40) == cached_path
+    assert cache.get("x" * 40) is None
+    cache.enforce_quota()
+    assert sorted(os.listdir(str(tmp_path))) == sorted(["new.wav", os.path.basename(cached_path), ref_name])
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_put_names_file_by_content_hash(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    output_path = _write(str(tmp_path), "tts_out.wav", 100, 0)
+    digest = content_hash(output_path)
+
+    cached_path = cache.put("k" * 40, output_path)
+    assert os.path.basename(cached_path) == f"{digest}.wav"
+    assert content_digest_of(os.path.basename(cached_path)) == digest
+    assert not os.path.exists(output_path)
+    assert cache.get("k" * 40) == cached_path
+
+    # 变体保留采样率，按编码结果自己的内容命名
+    variant_name = f"{digest}.16000.mp3"
+    variant_path = cache.store(_write(str(tmp_path), "encoded.tmp", 10, 0), variant_name)
+    assert os.path.basename(variant_path) == f"{content_hash(variant_path)}.16000.mp3"
+    assert cache.lookup(variant_name) == variant_path
+    assert content_digest_of("tts_out.wav") is None
+
+
+def test_evicted_content_file_invalidates_reference(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    cached_path = cache.put("k" * 40, _write(str(tmp_path), "tts_out.wav", 100, 0))
+    os.remove(cached_path)
+    assert cache.get("k" * 40) is None
+    assert os.listdir(str(tmp_path)) == []
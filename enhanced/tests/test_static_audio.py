@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("anyio")
+
+from indextts.static_audio import (CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, cache_control_for, content_disposition,
+                                   etag_matches, file_etag, parse_range)
+
+
+def test_content_disposition_ascii():
+    assert content_disposition("tts_abc.wav") == 'attachment; filename="tts_abc.wav"'
+
+
+def test_content_disposition_non_latin1_is_header_safe():
+    value = content_disposition("tts_旁白_1.mp3")
+    assert value == "attachment; filename*=utf-8''tts_%E6%97%81%E7%99%BD_1.mp3"
+    value.encode("latin-1")
+
+
+def test_content_disposition_escapes_quotes():
+    assert '"a"' not in content_disposition('a".wav')
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (" bytes = 1 - 2 ", (1, 2)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=5-4", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+
+
+def test_file_etag_follows_content(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"one")
+    first = file_etag(str(path), os.stat(path))
+    assert first == file_etag(str(path), os.stat(path))
+
+    path.write_bytes(b"two!")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+    assert file_etag(str(path), os.stat(path)) != first
+
+
+def test_cache_control_is_immutable_only_for_matching_content_hash():
+    digest = "ab" * 32
+    etag = f'"{digest[:32]}"'
+    assert cache_control_for(f"{digest}.wav", etag) == IMMUTABLE_CACHE_CONTROL
+    assert cache_control_for(f"{digest}.16000.mp3", etag) == IMMUTABLE_CACHE_CONTROL
+    assert cache_control_for(f"{digest}.wav", '"0123"') == CACHE_CONTROL
+    assert cache_control_for("tts_job.wav", etag) == CACHE_CONTROL
@@ -0,0 +1,159 @@
+import re
+
+import pytest
+
+from indextts.text_cache import TextFrontendCache, install_tokenizer_cache
+
+
+class ContextTokenizer:
+    """结果依赖整段文本的分词器：模拟中英文规范化路径和SentencePiece的前缀空格"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def tokenize(self, text):
+        self.calls += 1
+        chinese = re.search(r"[一-鿿]", text) is not None
+        text = text.upper() if chinese else text.lower()
+        pieces = re.findall(r"\w+|[^\w\s]", text)
+        return ["▁" + piece if i == 0 or not chinese else piece for i, piece in enumerate(pieces)]
+
+    def split_sentences(self, tokens, max_tokens_per_sentence=120):
+        sentences, current = [], []
+        for token in tokens:
+            current.append(token)
+            if token in ("。", ".", "!", "?", "！", "？") or len(current) >= max_tokens_per_sentence:
+                sentences.append(current)
+                current = []
+        if current:
+            sentences.append(current)
+        return sentences
+
+
+TEXTS = [
+    "Hello world. 你好，世界。Second sentence! 第三句？",
+    "价格是3.14元. Then English only.",
+    "纯中文文本。没有英文！",
+    "Plain English. With two sentences.",
+    "  leading spaces and trailing punctuation...  ",
+    "混合 mixed 文本\n换行后 new line。",
+    "。！？",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_tokenize_matches_tokenizer(text):
+    tokenizer = ContextTokenizer()
+    cache = TextFrontendCache()
+    expected = tokenizer.tokenize(text)
+    assert cache.tokenize(text, tokenizer.tokenize) == expected
+    assert cache.tokenize(text, tokenizer.tokenize) == expected
+
+
+def test_whole_text_is_not_reassembled_from_sentences():
+    tokenizer = ContextTokenizer()
+    cache = TextFrontendCache()
+    # 先缓存单独的英文句子，其分词结果与它在中英混合文本中的分词不同
+    cache.tokenize("Hello world.", tokenizer.tokenize)
+    text = "Hello world. 你好。"
+    assert cache.tokenize(text, tokenizer.tokenize) == tokenizer.tokenize(text)
+
+
+def test_hits_do_not_call_tokenizer_and_results_are_copies():
+    tokenizer = ContextTokenizer()
+    cache = TextFrontendCache()
+    text = TEXTS[0]
+    cache.tokenize(text, tokenizer.tokenize).append("x")
+    tokenizer.calls = 0
+    assert cache.tokenize(text, tokenizer.tokenize) == tokenizer.tokenize(text)
+    tokenizer.calls = 0
+    cache.tokenize(text, tokenizer.tokenize)
+    assert tokenizer.calls == 0
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+
+def test_evicts_least_recently_used_within_budget():
+    tokenizer = ContextTokenizer()
+    probe = TextFrontendCache()
+    probe.tokenize("text 0", tokenizer.tokenize)
+    entry_bytes = probe.stats()["bytes"]
+
+    cache = TextFrontendCache(max_bytes=entry_bytes * 3)
+    for i in range(5):
+        cache.tokenize(f"text {i}", tokenizer.tokenize)
+    assert cache.stats()["bytes"] <= entry_bytes * 3
+    tokenizer.calls = 0
+    cache.tokenize("text 4", tokenizer.tokenize)
+    assert tokenizer.calls == 0
+    cache.tokenize("text 0", tokenizer.tokenize)
+    assert tokenizer.calls == 1
+
+
+def test_installed_cache_wraps_only_this_tokenizer():
+    tokenizer, other = ContextTokenizer(), ContextTokenizer()
+    caches = [None]
+    install_tokenizer_cache(tokenizer, lambda: caches[0])
+    install_tokenizer_cache(tokenizer, lambda: caches[0])
+    text = TEXTS[0]
+
+    # 未设置缓存时直接调用原方法
+    tokenizer.tokenize(text)
+    tokenizer.tokenize(text)
+    assert tokenizer.calls == 2
+
+    caches[0] = TextFrontendCache()
+    tokenizer.calls = 0
+    expected = other.tokenize(text)
+    assert tokenizer.tokenize(text) == expected
+    assert tokenizer.tokenize(text) == expected
+    # 分句仍由分词器完成，token列表来自缓存
+    assert tokenizer.split_sentences(tokenizer.tokenize(text), 5) == other.split_sentences(expected, 5)
+    assert tokenizer.calls == 1
+    assert "tokenize" not in vars(other)
+
+
+def test_generate_tts_internal_hits_cache_on_repeated_text(tmp_path, monkeypatch):
+    """上游 infer 内部的分词经过实例上的缓存，第二次合成同一文本不再调用分词器"""
+    np = pytest.importorskip("numpy")
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("torchaudio")
+    pytest.importorskip("fastapi")
+    import api_server
+    from indextts import synthesis
+
+    class FakeGPT(torch.nn.Module):
+        def inference_speech(self, *args, **kwargs):
+            return torch.zeros(1, 4)
+
+    class FakeIndexTTS:
+        device = "cpu"
+
+        def __init__(self):
+            self.tokenizer = ContextTokenizer()
+            self.normalizer = None
+            self.gpt = FakeGPT()
+            self.bigvgan = torch.nn.Identity()
+            self.cache_cond_mel = torch.zeros(1, 100, 4)
+            self.cache_audio_prompt = "voice.wav"
+
+        def infer(self, audio_prompt, text, output_path, verbose=False, max_text_tokens_per_sentence=120, **kwargs):
+            # 与上游一致：在 infer 内部调用 self.tokenizer.tokenize
+            sentences = self.tokenizer.split_sentences(self.tokenizer.tokenize(text), max_text_tokens_per_sentence)
+            return 24000, np.zeros((2400 * len(sentences), 1), dtype=np.int16)
+
+    tts = synthesis.instrument_engine(FakeIndexTTS())
+    cache = TextFrontendCache()
+    monkeypatch.setattr(synthesis, "_text_cache", cache)
+    monkeypatch.setattr(api_server, "cmd_args", api_server.parse_args([]))
+    monkeypatch.setattr(api_server, "sentence_cache", None)
+    monkeypatch.chdir(tmp_path)
+
+    for _ in range(2):
+        output_path, message, _ = api_server.generate_tts_internal(tts, "voice.wav", TEXTS[0], "普通推理")
+        assert output_path, message
+    assert tts.tokenizer.calls == 1
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from indextts.timings import StageTimings, activate, hook_stage, stage, wrap_stage
+
+
+class FakeModule:
+    """模拟 torch.nn.Module 的前向钩子接口"""
+
+    def __init__(self, seconds=0.0, fail=False):
+        self.seconds = seconds
+        self.fail = fail
+        self._pre_hooks = []
+        self._post_hooks = []
+
+    def register_forward_pre_hook(self, hook):
+        self._pre_hooks.append(hook)
+
+    def register_forward_hook(self, hook, always_call=False):
+        self._post_hooks.append((hook, always_call))
+
+    def __call__(self, *args):
+        for hook in self._pre_hooks:
+            hook(self, args)
+        try:
+            time.sleep(self.seconds)
+            if self.fail:
+                raise RuntimeError("forward失败")
+        except Exception:
+            for hook, always_call in self._post_hooks:
+                if always_call:
+                    hook(self, args, None)
+            raise
+        for hook, _ in self._post_hooks:
+            hook(self, args, None)
+        return args
+
+
+class FakeTokenizer:
+    def __init__(self, normalizer):
+        self.normalizer = normalizer
+
+    def tokenize(self, text):
+        time.sleep(0.01)
+        return list(self.normalizer.normalize(text))
+
+
+class FakeNormalizer:
+    def normalize(self, text):
+        time.sleep(0.02)
+        return text.upper()
+
+
+def test_wrapped_methods_report_nested_stages_separately():
+    normalizer = FakeNormalizer()
+    tokenizer = FakeTokenizer(normalizer)
+    wrap_stage(normalizer, "normalize", "normalize")
+    wrap_stage(tokenizer, "tokenize", "tokenize")
+    wrap_stage(tokenizer, "tokenize", "tokenize")
+    assert tokenizer.tokenize.__wrapped__.__func__ is FakeTokenizer.tokenize
+
+    timings = StageTimings()
+    with activate(timings):
+        assert tokenizer.tokenize("ab") == ["A", "B"]
+    stages = timings.as_dict()
+    assert stages["normalize"] >= 0.02
+    # 分词只计自身耗时，不含其中的规范化
+    assert 0.01 <= stages["tokenize"] < 0.02
+    # 只修改了实例，类和其它实例不受影响
+    assert "tokenize" not in vars(FakeTokenizer(FakeNormalizer()))
+
+
+def test_hooked_modules_time_forward_and_synchronize():
+    gpt, vocoder = FakeModule(0.01), FakeModule(0.02)
+    synchronized = []
+    hook_stage(gpt, "gpt", synchronize=lambda: synchronized.append("gpt"))
+    hook_stage(vocoder, "vocoder")
+    hook_stage(vocoder, "vocoder")
+    assert len(vocoder._pre_hooks) == 1
+
+    gpt("未激活时不计时")
+    assert synchronized == []
+
+    timings = StageTimings()
+    with activate(timings):
+        with stage("tokenize"):
+            gpt()
+        vocoder()
+        vocoder()
+    stages = timings.as_dict()
+    assert stages["gpt"] >= 0.01
+    assert stages["vocoder"] >= 0.04
+    assert stages["tokenize"] < 0.01
+    assert synchronized == ["gpt"]
+    assert list(stages) == ["tokenize", "gpt", "vocoder", "total"]
+
+
+def test_failed_forward_closes_stage():
+    module = FakeModule(fail=True)
+    hook_stage(module, "vocoder")
+    timings = StageTimings()
+    with activate(timings):
+        with pytest.raises(RuntimeError):
+            module()
+        with stage("write"):
+            time.sleep(0.01)
+    stages = timings.as_dict()
+    assert "vocoder" in stages
+    assert stages["write"] >= 0.01
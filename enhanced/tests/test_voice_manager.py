@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+from indextts.voice_manager import VoiceManager, cond_mel_path_for
+
+
+class RecordingCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, audio_path):
+        self.invalidated.append(audio_path)
+
+
+def _source(tmp_path):
+    path = tmp_path / "source.wav"
+    path.write_bytes(b"RIFF" + b"\0" * 64)
+    return str(path)
+
+
+def test_save_and_delete_invalidate_cond_mel_cache(tmp_path):
+    cache = RecordingCache()
+    manager = VoiceManager(str(tmp_path / "voices"), cond_mel_cache=cache)
+    manager._save_cond_mel = lambda audio_path: None
+    assert manager.save_voice(_source(tmp_path), "旁白")["success"]
+    audio_path = manager.get_voice_audio_path("旁白")
+    assert cache.invalidated == [audio_path]
+
+    cond_mel_path = cond_mel_path_for(audio_path)
+    with open(cond_mel_path, "wb") as f:
+        f.write(b"cond")
+
+    # 删除不依赖torch：数据库、音频和条件mel文件一起删除
+    assert manager.delete_voice("旁白")["success"]
+    assert cache.invalidated == [audio_path, audio_path]
+    assert not os.path.exists(audio_path)
+    assert not os.path.exists(cond_mel_path)
+    assert "旁白" not in VoiceManager(str(tmp_path / "voices")).voices_db
+
+
+def test_delete_keeps_files_when_database_save_fails(tmp_path):
+    manager = VoiceManager(str(tmp_path / "voices"))
+    manager._save_cond_mel = lambda audio_path: None
+    manager.save_voice(_source(tmp_path), "旁白")
+    audio_path = manager.get_voice_audio_path("旁白")
+
+    def fail():
+        raise OSError("磁盘已满")
+
+    manager._save_voices_db = fail
+    result = manager.delete_voice("旁白")
+    assert not result["success"]
+    assert os.path.exists(audio_path)
+    assert manager.get_voice("旁白") is not None
+
+
+def test_audio_hash_is_not_persisted_on_request_path(tmp_path):
+    manager = VoiceManager(str(tmp_path / "voices"))
+    manager._save_cond_mel = lambda audio_path: None
+    manager.save_voice(_source(tmp_path), "旁白")
+    # 模拟没有保存哈希的旧数据
+    del manager.voices_db["旁白"]["audio_hash"]
+    manager._save_voices_db()
+    mtime = os.path.getmtime(manager.voices_db_path)
+
+    expected = VoiceManager._file_hash(manager.get_voice_audio_path("旁白"))
+    assert manager.get_voice_audio_hash("旁白") == expected
+    with open(manager.voices_db_path, encoding="utf-8") as f:
+        assert "audio_hash" not in json.load(f)["旁白"]
+    assert os.path.getmtime(manager.voices_db_path) == mtime
+
+    assert manager.ensure_audio_hash("旁白") == expected
+    with open(manager.voices_db_path, encoding="utf-8") as f:
+        assert json.load(f)["旁白"]["audio_hash"] == expected
+
+
+def test_usage_counts_merge_per_process_files(tmp_path):
+    voices_dir = tmp_path / "voices"
+    manager = VoiceManager(str(voices_dir))
+    # 旧版本写入的usage.json和其它工作进程的文件都计入
+    (voices_dir / "usage.json").write_text(json.dumps({"旁白": 2}), encoding="utf-8")
+    (voices_dir / "usage.1.json").write_text(json.dumps({"旁白": 1, "主持人": 4}), encoding="utf-8")
+
+    manager.record_usage("旁白", flush_interval=3600)
+    manager.record_usage("旁白", flush_interval=3600)
+    manager.flush_usage()
+    manager.record_usage("旁白", flush_interval=3600)
+    manager.flush_usage()
+
+    with open(manager._process_usage_path(), encoding="utf-8") as f:
+        assert json.load(f) == {"旁白": 3}
+    assert manager.get_usage_counts() == {"旁白": 6, "主持人": 4}
+    # 另一个进程（同一目录的另一个实例）读到的合并结果相同
+    assert VoiceManager(str(voices_dir)).get_usage_counts() == {"旁白": 6, "主持人": 4}
+
+
+def test_record_usage_flushes_in_background_thread(tmp_path):
+    manager = VoiceManager(str(tmp_path / "voices"))
+    flushed = threading.Event()
+    threads = []
+
+    def flush():
+        threads.append(threading.current_thread())
+        flushed.set()
+
+    manager.flush_usage = flush
+    manager.record_usage("旁白", flush_interval=0)
+    assert flushed.wait(5)
+    assert threads[0] is not threading.main_thread()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -16,14 +17,24 @@ sys.path.append(current_dir)
 sys.path.append(os.path.join(current_dir, "indextts"))
 
 import argparse
-import pandas as pd
 import gradio as gr
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel
 
-from indextts.infer import IndexTTS
 from indextts.voice_manager import VoiceManager
+from indextts.inference_worker import QueueFullError
+from indextts.request_queue import PRIORITY_CLASSES, SCHEDULE_POLICIES, InferenceJob, estimate_cost
+from indextts.engine_pool import EnginePool, create_engines, resolve_devices
+from indextts.batch_scheduler import BatchScheduler
+from indextts.checkpoint_loader import has_checkpoint
+from indextts.audio_encoding import (AUDIO_FORMATS, encode_file, encode_wavs, media_type_for, media_type_for_filename,
+                                     validate_output_format, variant_filename)
+from indextts.synthesis import SAMPLING_RATE, infer_upstream, save_wav, set_cond_mel_cache, set_text_cache
+from indextts.cond_cache import CondMelCache
+from indextts.static_audio import audio_file_response, content_disposition
+from indextts.sentence_preview import SentencePreview
+from indextts.text_cache import TextFrontendCache
 from tools.i18n.i18n import I18nAuto
 import traceback
 
@@ -43,6 +54,9 @@ class TTSRequest(BaseModel):
     repetition_penalty: float = 10.0
     max_mel_tokens: int = 600
     filename: Optional[str] = None  # 自定义文件名（不包含扩展名）
+    priority: str = "normal"  # 优先级类别: interactive / normal / batch（priority调度策略下生效）
+    format: str = "wav"  # 输出格式: wav / flac / ogg-opus / mp3 / pcm16
+    sample_rate: Optional[int] = None  # 输出采样率，如 8000 / 16000 / 24000，默认24000
 
 class TTSResponse(BaseModel):
     success: bool
@@ -57,6 +71,16 @@ parser.add_argument("--port", type=int, default=7860, help="Port to run the web
 parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to run the web UI on")
 parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
 parser.add_argument("--enable_api", action="store_true", default=True, help="Enable API endpoints")
+parser.add_argument("--queue_size", type=int, default=8, help="Max number of pending inference jobs per replica before rejecting with 503")
+parser.add_argument("--pool_size", type=int, default=1, help="Number of IndexTTS replicas in the engine pool")
+parser.add_argument("--devices", type=str, default=None, help="Comma separated devices for the replicas, e.g. cuda:0,cuda:1 or cpu (default: auto)")
+parser.add_argument("--threads_per_replica", type=int, default=None, help="Torch threads per CPU replica (default: cores / CPU replicas)")
+parser.add_argument("--batch_window_ms", type=float, default=0, help="Collect concurrent API requests for this many ms and synthesize them as one batch (0 disables)")
+parser.add_argument("--batch_max_size", type=int, default=8, help="Max number of sentences in one cross-request batch")
+parser.add_argument("--schedule_policy", type=str, default="fifo", choices=SCHEDULE_POLICIES, help="Request scheduling policy: fifo, sjf (shortest job first with aging) or priority")
+parser.add_argument("--sjf_aging", type=float, default=20.0, help="Tokens credited per second of waiting under the sjf policy")
+parser.add_argument("--text_cache_mb", type=int, default=32, help="Memory budget in MB for cached text normalization and tokenization results (0 disables)")
+parser.add_argument("--preview_debounce_ms", type=float, default=300, help="Wait this long after the last edit before re-computing the sentence preview")
 cmd_args = parser.parse_args()
 
 # 检查模型文件
@@ -71,14 +95,27 @@ for file in [
     "config.yaml",
 ]:
     file_path = os.path.join(cmd_args.model_dir, file)
-    if not os.path.exists(file_path):
+    if not has_checkpoint(cmd_args.model_dir, file):
         print(f"Required file {file_path} does not exist. Please download it.")
         sys.exit(1)
 
 # 初始化组件
 i18n = I18nAuto(language="zh_CN")
-tts = IndexTTS(model_dir=cmd_args.model_dir, cfg_path=os.path.join(cmd_args.model_dir, "config.yaml"))
-voice_manager = VoiceManager()
+engines = create_engines(cmd_args.model_dir, resolve_devices(cmd_args.pool_size, cmd_args.devices))
+tts = engines[0]
+cond_mel_cache = CondMelCache()
+voice_manager = VoiceManager(cond_mel_cache=cond_mel_cache)
+set_cond_mel_cache(cond_mel_cache)
+if cmd_args.text_cache_mb > 0:
+    set_text_cache(TextFrontendCache(max_bytes=cmd_args.text_cache_mb * 1024 * 1024))
+engine_pool = EnginePool(engines, max_queue_size=cmd_args.queue_size,
+                         cpu_threads=cmd_args.threads_per_replica,
+                         policy=cmd_args.schedule_policy, aging=cmd_args.sjf_aging)
+batch_scheduler = None
+if cmd_args.batch_window_ms > 0:
+    batch_scheduler = BatchScheduler(engine_pool, window_ms=cmd_args.batch_window_ms,
+                                     max_batch_size=cmd_args.batch_max_size)
+sentence_preview = SentencePreview(tts.tokenizer, debounce=cmd_args.preview_debounce_ms / 1000)
 
 # 创建必要目录
 os.makedirs("outputs/tasks", exist_ok=True)
@@ -96,9 +133,9 @@ with open("tests/cases.jsonl", "r", encoding="utf-8") as f:
         example_cases.append([os.path.join("tests", example.get("prompt_audio", "sample_prompt.wav")),
                               example.get("text"), ["普通推理", "批次推理"][example.get("infer_mode", 0)]])
 
-def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120, 
+def generate_tts_internal(tts, prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120, 
                          sentences_bucket_max_size=4, custom_filename=None, **generation_kwargs):
-    """内部TTS生成函数"""
+    """内部TTS生成函数（在推理工作线程中执行）"""
     if not prompt_audio_path:
         return None, "请提供参考音频"
     
@@ -127,16 +164,10 @@ def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_p
         output_path = os.path.join("outputs", "api", filename)
     
     try:
-        if infer_mode == "普通推理":
-            result = tts.infer(prompt_audio_path, text, output_path, verbose=cmd_args.verbose,
-                              max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                              **generation_kwargs)
-        else:
-            # 批次推理
-            result = tts.infer_fast(prompt_audio_path, text, output_path, verbose=cmd_args.verbose,
-                                   max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                                   sentences_bucket_max_size=int(sentences_bucket_max_size),
-                                   **generation_kwargs)
+        # 条件mel经过分级缓存，合成和写文件由上游 tts.infer / tts.infer_fast 完成
+        result = infer_upstream(tts, prompt_audio_path, text, infer_mode != "普通推理",
+                                max_text_tokens_per_sentence, sentences_bucket_max_size,
+                                output_path=output_path, verbose=cmd_args.verbose, **generation_kwargs)
         
         if result and os.path.exists(output_path):
             return output_path, "生成成功"
@@ -147,6 +178,48 @@ def generate_tts_internal(prompt_audio_path, text, infer_mode, max_text_tokens_p
         tb = traceback.format_exc()
         return None, f"生成失败: {str(e)}\n{tb}"
 
+def synthesize_wavs(tts, prompt_audio_path, text, infer_mode, max_text_tokens_per_sentence=120,
+                    sentences_bucket_max_size=4, **generation_kwargs):
+    """合成波形并留在内存中（在推理工作线程中执行），返回按顺序排列的波形列表"""
+    wav = infer_upstream(tts, prompt_audio_path, text, infer_mode != "普通推理",
+                         max_text_tokens_per_sentence, sentences_bucket_max_size,
+                         verbose=cmd_args.verbose, **generation_kwargs)
+    return [wav] if wav is not None else []
+
+async def generate_tts_batched(prompt_audio_path, text, max_text_tokens_per_sentence=120,
+                              custom_filename=None, cost=1, priority="normal", **generation_kwargs):
+    """跨请求批处理的TTS生成函数（分句与其他并发请求合并成批次推理）"""
+    if not text or not text.strip():
+        return None, "请输入文本内容"
+    
+    if custom_filename:
+        import re
+        safe_filename = re.sub(r'[<>:"/\\|?*]', '_', custom_filename)
+        filename = f"{safe_filename}.wav"
+    else:
+        filename = f"tts_{uuid.uuid4()}.wav"
+    
+    output_path = os.path.join("outputs", "api", filename)
+    if os.path.exists(output_path):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join("outputs", "api", f"{filename.replace('.wav', '')}_{timestamp}.wav")
+    
+    try:
+        future = batch_scheduler.submit(prompt_audio_path, text, max_text_tokens_per_sentence,
+                                        cost=cost, priority=priority, **generation_kwargs)
+        wavs = await asyncio.wrap_future(future)
+        if not wavs:
+            return None, "生成失败"
+        
+        await asyncio.get_running_loop().run_in_executor(None, save_wav, wavs, output_path)
+        return output_path, "生成成功"
+    
+    except QueueFullError:
+        raise
+    except Exception as e:
+        tb = traceback.format_exc()
+        return None, f"生成失败: {str(e)}\n{tb}"
+
 def gen_single(prompt, text, infer_mode, max_text_tokens_per_sentence=120, sentences_bucket_max_size=4,
                *args, progress=gr.Progress()):
     """单个音频生成"""
@@ -154,7 +227,6 @@ def gen_single(prompt, text, infer_mode, max_text_tokens_per_sentence=120, sente
         return gr.update(value=None), "请先上传参考音频"
     
     output_path = os.path.join("outputs", f"spk_{int(time.time())}.wav")
-    tts.gr_progress = progress
     
     do_sample, top_p, top_k, temperature, \
         length_penalty, num_beams, repetition_penalty, max_mel_tokens = args
@@ -170,17 +242,27 @@ def gen_single(prompt, text, infer_mode, max_text_tokens_per_sentence=120, sente
         "max_mel_tokens": int(max_mel_tokens),
     }
     
+    def _job(tts):
+        tts.gr_progress = progress
+        try:
+            if infer_mode == "普通推理":
+                return tts.infer(prompt, text, output_path, verbose=cmd_args.verbose,
+                                 max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
+                                 **kwargs)
+            return tts.infer_fast(prompt, text, output_path, verbose=cmd_args.verbose,
+                                  max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
+                                  sentences_bucket_max_size=int(sentences_bucket_max_size),
+                                  **kwargs)
+        finally:
+            tts.gr_progress = None
+    
     try:
-        if infer_mode == "普通推理":
-            output = tts.infer(prompt, text, output_path, verbose=cmd_args.verbose,
-                              max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                              **kwargs)
-        else:
-            output = tts.infer_fast(prompt, text, output_path, verbose=cmd_args.verbose,
-                                   max_text_tokens_per_sentence=int(max_text_tokens_per_sentence),
-                                   sentences_bucket_max_size=int(sentences_bucket_max_size),
-                                   **kwargs)
+        # 与API共用推理引擎池，每个模型副本只由一个工作线程使用；界面操作按交互式优先级调度
+        job = InferenceJob(_job, cost=len(text or ""), priority="interactive")
+        output = engine_pool.submit_job(job).result()
         return gr.update(value=output, visible=True), "生成成功"
+    except QueueFullError as e:
+        return gr.update(value=None), str(e)
     except Exception as e:
         return gr.update(value=None), f"生成失败: {str(e)}"
 
@@ -254,11 +336,14 @@ def update_prompt_audio():
     """更新音频上传状态"""
     return gr.update(interactive=True)
 
-def on_input_text_change(text, max_tokens_per_sentence):
-    """文本变化时预览分句"""
+def on_input_text_change(text, max_tokens_per_sentence, request: gr.Request = None):
+    """文本变化时预览分句（防抖，只重新分词改动过的段落）"""
     if text and len(text) > 0:
-        text_tokens_list = tts.tokenizer.tokenize(text)
-        sentences = tts.tokenizer.split_sentences(text_tokens_list, max_tokens_per_sentence=int(max_tokens_per_sentence))
+        # 未缓存时等待防抖间隔，期间又有新的输入则放弃本次预览
+        session = request.session_hash if request is not None else ""
+        if not sentence_preview.is_cached(text, max_tokens_per_sentence) and not sentence_preview.wait_latest(session):
+            return gr.update()
+        sentences = sentence_preview.split(text, max_tokens_per_sentence)
         data = []
         for i, s in enumerate(sentences):
             sentence_str = ''.join(s)
@@ -433,10 +518,14 @@ with gr.Blocks(title="IndexTTS Enhanced Demo") as demo:
             "temperature": 1.0,
             "top_p": 0.8,
             "top_k": 30,
+            "format": "mp3",
+            "sample_rate": 16000,
             "return_file": false
         }
         ```
         
+        `format` 可选 wav / flac / ogg-opus / mp3 / pcm16，`sample_rate` 可选 8000-48000（默认24000）
+        
         **方式2: URL参数**
         ```
         POST /api/tts?text=要转换的文本&voice_name=音色名称&return_file=true
@@ -444,7 +533,7 @@ with gr.Blocks(title="IndexTTS Enhanced Demo") as demo:
         
         **响应:**
         - `/api/tts`: JSON格式 `{"success": true, "audio_url": "/api/audio/xxx.wav"}`
-        - `/api/tts/file`: 直接返回wav音频文件
+        - `/api/tts/file`: 直接返回音频文件（格式由 `format` 指定）
         - 或在任意接口中添加 `return_file=true` 参数直接返回音频文件
         
         #### 2. 获取音色列表 API
@@ -512,12 +601,14 @@ with gr.Blocks(title="IndexTTS Enhanced Demo") as demo:
     input_text_single.change(
         on_input_text_change,
         inputs=[input_text_single, max_text_tokens_per_sentence],
-        outputs=[sentences_preview]
+        outputs=[sentences_preview],
+        trigger_mode="always_last"
     )
     max_text_tokens_per_sentence.change(
         on_input_text_change,
         inputs=[input_text_single, max_text_tokens_per_sentence],
-        outputs=[sentences_preview]
+        outputs=[sentences_preview],
+        trigger_mode="always_last"
     )
 
 # 创建FastAPI应用
@@ -525,48 +616,126 @@ if cmd_args.enable_api:
     from fastapi import Request
     app = FastAPI(title="IndexTTS API", description="IndexTTS API for dify workflow integration")
 
+    async def _get_audio_variant(wav_path: str, fmt: str = "wav", sample_rate: Optional[int] = None) -> str:
+        """获取指定格式和采样率的音频文件（在线程池中编码，已编码过的直接复用）"""
+        sample_rate = sample_rate or SAMPLING_RATE
+        if fmt == "wav" and sample_rate == SAMPLING_RATE:
+            return wav_path
+        variant_path = os.path.join(os.path.dirname(wav_path),
+                                    variant_filename(os.path.basename(wav_path), fmt, sample_rate))
+        if not os.path.exists(variant_path):
+            await asyncio.get_running_loop().run_in_executor(None, encode_file, wav_path, variant_path,
+                                                             fmt, sample_rate)
+        return variant_path
+
+    async def _prepare_tts_request(request: TTSRequest):
+        """检查TTS请求参数，返回 (音色音频路径, 请求代价, 生成参数)"""
+        # 检查音色是否存在
+        audio_path = voice_manager.get_voice_audio_path(request.voice_name)
+        if not audio_path:
+            raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+        
+        if request.priority not in PRIORITY_CLASSES:
+            raise HTTPException(status_code=400, detail=f"未知的优先级: {request.priority}")
+        try:
+            validate_output_format(request.format, request.sample_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # 空文本请求不会合成，不计入使用次数
+        if request.text and request.text.strip():
+            voice_manager.record_usage(request.voice_name)
+        
+        # 估算请求代价：sjf策略下使用分词后的token数，其它策略用文本长度近似
+        if cmd_args.schedule_policy == "sjf":
+            cost = await asyncio.get_running_loop().run_in_executor(None, estimate_cost, tts, request.text)
+        else:
+            cost = len(request.text)
+        
+        # 准备生成参数
+        generation_kwargs = {
+            "do_sample": request.do_sample,
+            "top_p": request.top_p,
+            "top_k": request.top_k,
+            "temperature": request.temperature,
+            "length_penalty": request.length_penalty,
+            "num_beams": request.num_beams,
+            "repetition_penalty": request.repetition_penalty,
+            "max_mel_tokens": request.max_mel_tokens,
+        }
+        return audio_path, cost, generation_kwargs
+
+    async def _synthesize_in_memory(request: TTSRequest) -> Response:
+        """生成音频并直接在内存中编码返回，不经过磁盘"""
+        audio_path, cost, generation_kwargs = await _prepare_tts_request(request)
+        if not request.text or not request.text.strip():
+            raise HTTPException(status_code=400, detail="请输入文本内容")
+        
+        if batch_scheduler is not None:
+            future = batch_scheduler.submit(audio_path, request.text, request.max_text_tokens_per_sentence,
+                                            cost=cost, priority=request.priority, **generation_kwargs)
+        else:
+            future = engine_pool.submit_job(InferenceJob(
+                synthesize_wavs,
+                (audio_path, request.text, request.infer_mode,
+                 request.max_text_tokens_per_sentence, request.sentences_bucket_max_size),
+                generation_kwargs,
+                cost=cost,
+                priority=request.priority
+            ))
+        wavs = await asyncio.wrap_future(future)
+        if not wavs:
+            raise HTTPException(status_code=500, detail="生成失败")
+        
+        sample_rate = request.sample_rate or SAMPLING_RATE
+        content = await asyncio.get_running_loop().run_in_executor(
+            None, encode_wavs, wavs, SAMPLING_RATE, request.format, sample_rate)
+        filename = f"tts_{request.voice_name}_{uuid.uuid4()}.{AUDIO_FORMATS[request.format]['extension']}"
+        return Response(
+            content=content,
+            media_type=media_type_for(request.format, sample_rate),
+            headers={"Content-Disposition": content_disposition(filename)}
+        )
+
     async def _process_tts_request(request: TTSRequest):
         """处理TTS请求的共用函数"""
         try:
-            # 检查音色是否存在
-            audio_path = voice_manager.get_voice_audio_path(request.voice_name)
-            if not audio_path:
-                raise HTTPException(status_code=400, detail=f"音色 '{request.voice_name}' 不存在")
+            audio_path, cost, generation_kwargs = await _prepare_tts_request(request)
             
-            # 准备生成参数
-            generation_kwargs = {
-                "do_sample": request.do_sample,
-                "top_p": request.top_p,
-                "top_k": request.top_k,
-                "temperature": request.temperature,
-                "length_penalty": request.length_penalty,
-                "num_beams": request.num_beams,
-                "repetition_penalty": request.repetition_penalty,
-                "max_mel_tokens": request.max_mel_tokens,
-            }
-            
-            # 生成语音
-            output_path, message = generate_tts_internal(
-                audio_path,
-                request.text,
-                request.infer_mode,
-                request.max_text_tokens_per_sentence,
-                request.sentences_bucket_max_size,
-                custom_filename=request.filename,
-                **generation_kwargs
-            )
+            # 提交到推理工作线程，避免阻塞事件循环
+            if batch_scheduler is not None:
+                output_path, message = await generate_tts_batched(
+                    audio_path,
+                    request.text,
+                    request.max_text_tokens_per_sentence,
+                    custom_filename=request.filename,
+                    cost=cost,
+                    priority=request.priority,
+                    **generation_kwargs
+                )
+            else:
+                job = InferenceJob(
+                    generate_tts_internal,
+                    (audio_path, request.text, request.infer_mode,
+                     request.max_text_tokens_per_sentence, request.sentences_bucket_max_size),
+                    dict(generation_kwargs, custom_filename=request.filename),
+                    cost=cost,
+                    priority=request.priority
+                )
+                output_path, message = await asyncio.wrap_future(engine_pool.submit_job(job))
             
             if output_path:
-                # 生成音频URL
-                filename = os.path.basename(output_path)
-                audio_url = f"/api/audio/{filename}"
-                
                 # 正确计算task_id
+                filename = os.path.basename(output_path)
                 if filename.startswith("tts_") and filename.endswith(".wav"):
                     task_id = filename.replace("tts_", "").replace(".wav", "")
                 else:
                     task_id = filename.replace(".wav", "")
                 
+                # 生成音频URL
+                output_path = await _get_audio_variant(output_path, request.format, request.sample_rate)
+                filename = os.path.basename(output_path)
+                audio_url = f"/api/audio/{filename}"
+                
                 return TTSResponse(
                     success=True,
                     message=message,
@@ -576,6 +745,8 @@ if cmd_args.enable_api:
             else:
                 return TTSResponse(success=False, message=message)
                 
+        except QueueFullError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -624,9 +795,16 @@ if cmd_args.enable_api:
                     num_beams=int(params.get("num_beams", 3)),
                     repetition_penalty=float(params.get("repetition_penalty", 10.0)),
                     max_mel_tokens=int(params.get("max_mel_tokens", 600)),
-                    filename=params.get("filename")
+                    filename=params.get("filename"),
+                    priority=params.get("priority", "normal"),
+                    format=params.get("format", "wav"),
+                    sample_rate=int(params["sample_rate"]) if params.get("sample_rate") else None
                 )
             
+            # 直接返回文件且未指定文件名时在内存中编码返回，不写磁盘
+            if return_file and not tts_request.filename:
+                return await _synthesize_in_memory(tts_request)
+            
             # 处理TTS请求
             result = await _process_tts_request(tts_request)
             
@@ -637,8 +815,8 @@ if cmd_args.enable_api:
                 if os.path.exists(file_path):
                     return FileResponse(
                         file_path, 
-                        media_type="audio/wav", 
-                        filename=f"tts_{tts_request.voice_name}_{result.task_id}.wav"
+                        media_type=media_type_for_filename(filename), 
+                        filename=f"tts_{tts_request.voice_name}_{result.task_id}{os.path.splitext(filename)[1]}"
                     )
                 else:
                     raise HTTPException(status_code=404, detail="音频文件未找到")
@@ -646,6 +824,12 @@ if cmd_args.enable_api:
                 # 返回JSON响应
                 return result
             
+        except QueueFullError as e:
+            return JSONResponse(
+                status_code=503,
+                content={"success": False, "message": str(e)},
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except ValueError as e:
             tb = traceback.format_exc()
             return {"success": False, "message": f"参数格式错误: {str(e)}\n{tb}"}
@@ -662,14 +846,14 @@ if cmd_args.enable_api:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    @app.get("/api/audio/{filename}")
-    async def api_get_audio(filename: str):
-        """获取音频文件API"""
+    @app.api_route("/api/audio/{filename}", methods=["GET", "HEAD"])
+    async def api_get_audio(request: Request, filename: str):
+        """获取音频文件API（支持Range断点/拖动和ETag条件请求）"""
         file_path = os.path.join("outputs", "api", filename)
-        if os.path.exists(file_path):
-            return FileResponse(file_path, media_type="audio/wav", filename=filename)
-        else:
+        response = await audio_file_response(request, file_path, filename, media_type_for_filename(filename))
+        if response is None:
             raise HTTPException(status_code=404, detail="音频文件不存在")
+        return response
 
     # 将FastAPI应用挂载到Gradio
     demo = gr.mount_gradio_app(app, demo, path="")
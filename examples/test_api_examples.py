@@ -65,6 +65,36 @@ class IndexTTSClient:
             print(f"文本转语音失败: {e}")
             return None
     
+    def submit_job(self, text: str, voice_name: str) -> Optional[str]:
+        """提交异步任务（长文本推荐，仅独立API服务器支持），返回任务ID"""
+        try:
+            response = requests.post(
+                f"{self.api_base}/jobs",
+                json={"text": text, "voice_name": voice_name},
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json().get('job_id')
+        except Exception as e:
+            print(f"提交任务失败: {e}")
+            return None
+    
+    def wait_for_job(self, job_id: str, poll_interval: float = 2.0, timeout: float = 3600) -> Optional[Dict]:
+        """轮询异步任务直到完成或失败"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                response = requests.get(f"{self.api_base}/jobs/{job_id}", timeout=10)
+                response.raise_for_status()
+                job = response.json()
+                print(f"任务 {job_id}: {job['state']} ({job['progress']}/{job['total']})")
+                if job['state'] in ("done", "failed"):
+                    return job
+            except Exception as e:
+                print(f"查询任务失败: {e}")
+            time.sleep(poll_interval)
+        return None
+    
     def download_audio(self, audio_path: str, output_path: str):
         """下载音频文件"""
         try: